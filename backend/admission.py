@@ -0,0 +1,235 @@
+# backend/admission.py
+"""
+Controle de admissão dos endpoints pesados de relatório.
+
+- Cada requisição tem um custo conforme o tipo de saída
+  (pacote de formatos e PDF multi > PDF > XLSX > CSV > JSON) e o processo
+  tem um orçamento global.
+- Cada usuário pode ter no máximo N exportações pesadas simultâneas.
+- Quem passa do limite espera um pouco na fila; se não houver vaga a tempo,
+  recebe 429 (limite do usuário) ou 503 (servidor cheio) com Retry-After.
+- Só quem de fato gera paga: @admissao apenas classifica a requisição e a
+  reserva (`reserva()`) é feita dentro da geração, que roda só na líder da
+  coalescência. Requisições servidas do cache ou coalescidas não consomem
+  o orçamento nem o limite por usuário.
+- Flask-Limiter (requirements.txt) aplica ainda um limite de taxa por usuário.
+"""
+import os, threading, time
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import wraps
+from flask import g, has_request_context, request, jsonify
+
+try:
+    from flask_limiter import Limiter
+    from flask_limiter.util import get_remote_address
+except ImportError:  # Flask-Limiter é opcional em desenvolvimento
+    Limiter = None
+    get_remote_address = None
+
+# Custos por classe de requisição
+CUSTOS = {
+    "pacote":    int(os.getenv("ADMISSION_COST_PACOTE", "8")),  # vários formatos num ZIP
+    "pdf_multi": int(os.getenv("ADMISSION_COST_PDF_MULTI", "8")),
+    "pdf":       int(os.getenv("ADMISSION_COST_PDF", "4")),
+    "xlsx":      int(os.getenv("ADMISSION_COST_XLSX", "3")),
+    "csv":       int(os.getenv("ADMISSION_COST_CSV", "1")),
+    "json":      int(os.getenv("ADMISSION_COST_JSON", "1")),
+}
+# Classes consideradas pesadas para o limite por usuário
+CLASSES_PESADAS = {"pacote", "pdf_multi", "pdf", "xlsx"}
+
+ADMISSION_BUDGET = int(os.getenv("ADMISSION_BUDGET", "16"))
+ADMISSION_USER_HEAVY = int(os.getenv("ADMISSION_USER_HEAVY", "2"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "5"))
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "10"))
+
+RATE_LIMIT_EXPORTS = os.getenv("RATE_LIMIT_EXPORTS", "30/minute")
+RATELIMIT_STORAGE_URI = os.getenv("RATELIMIT_STORAGE_URI", "memory://")
+
+# Limites dos histogramas de tempo de fila (segundos)
+_BUCKETS_FILA = (0.01, 0.05, 0.1, 0.5, 1.0, 2.0, 5.0, 10.0)
+
+
+class AdmissaoRecusada(Exception):
+    def __init__(self, motivo: str, uid=None):
+        super().__init__(motivo)
+        self.motivo = motivo  # "usuario" | "global"
+        self.uid = uid  # de quem foi a reserva recusada (a líder, se coalescida)
+
+
+class AdmissionController:
+    def __init__(self, orcamento: int, pesados_por_usuario: int, timeout_fila: float):
+        self.orcamento = orcamento
+        self.pesados_por_usuario = pesados_por_usuario
+        self.timeout_fila = timeout_fila
+        self._cond = threading.Condition()
+        self._em_uso = 0
+        self._pesados = defaultdict(int)
+        self._fila = 0
+        self._metricas = {
+            "admitidas": defaultdict(int),
+            "recusadas": defaultdict(int),
+            "fila_total_s": 0.0,
+            "fila_max_s": 0.0,
+            "fila_count": 0,
+            "fila_hist": [0] * (len(_BUCKETS_FILA) + 1),
+        }
+
+    def _cabe(self, uid, classe: str, custo: int):
+        if classe in CLASSES_PESADAS and self._pesados[uid] >= self.pesados_por_usuario:
+            return "usuario"
+        # Um job mais caro que o orçamento inteiro ainda pode rodar sozinho
+        if self._em_uso and self._em_uso + custo > self.orcamento:
+            return "global"
+        return None
+
+    def adquirir(self, uid, classe: str) -> float:
+        """Reserva capacidade; retorna o tempo de fila ou levanta AdmissaoRecusada."""
+        custo = CUSTOS.get(classe, 1)
+        inicio = time.monotonic()
+        prazo = inicio + self.timeout_fila
+        with self._cond:
+            self._fila += 1
+            try:
+                while True:
+                    motivo = self._cabe(uid, classe, custo)
+                    if motivo is None:
+                        break
+                    restante = prazo - time.monotonic()
+                    if restante <= 0:
+                        self._metricas["recusadas"][motivo] += 1
+                        raise AdmissaoRecusada(motivo, uid)
+                    self._cond.wait(restante)
+            finally:
+                self._fila -= 1
+
+            self._em_uso += custo
+            if classe in CLASSES_PESADAS:
+                self._pesados[uid] += 1
+            espera = time.monotonic() - inicio
+            self._registrar_fila(classe, espera)
+            return espera
+
+    def liberar(self, uid, classe: str):
+        custo = CUSTOS.get(classe, 1)
+        with self._cond:
+            self._em_uso -= custo
+            if classe in CLASSES_PESADAS:
+                self._pesados[uid] -= 1
+                if self._pesados[uid] <= 0:
+                    self._pesados.pop(uid, None)
+            self._cond.notify_all()
+
+    def _registrar_fila(self, classe: str, espera: float):
+        m = self._metricas
+        m["admitidas"][classe] += 1
+        m["fila_total_s"] += espera
+        m["fila_count"] += 1
+        m["fila_max_s"] = max(m["fila_max_s"], espera)
+        for i, limite in enumerate(_BUCKETS_FILA):
+            if espera <= limite:
+                m["fila_hist"][i] += 1
+                break
+        else:
+            m["fila_hist"][-1] += 1
+
+    def metricas(self) -> dict:
+        with self._cond:
+            m = self._metricas
+            return {
+                "orcamento": self.orcamento,
+                "em_uso": self._em_uso,
+                "na_fila": self._fila,
+                "pesados_por_usuario": self.pesados_por_usuario,
+                "pesados_em_andamento": dict(self._pesados),
+                "admitidas": dict(m["admitidas"]),
+                "recusadas": dict(m["recusadas"]),
+                "fila": {
+                    "count": m["fila_count"],
+                    "media_s": (m["fila_total_s"] / m["fila_count"]) if m["fila_count"] else 0.0,
+                    "max_s": m["fila_max_s"],
+                    "histograma": {
+                        **{f"le_{limite}": n for limite, n in zip(_BUCKETS_FILA, m["fila_hist"])},
+                        "inf": m["fila_hist"][-1],
+                    },
+                },
+            }
+
+
+controller = AdmissionController(ADMISSION_BUDGET, ADMISSION_USER_HEAVY, ADMISSION_QUEUE_TIMEOUT)
+
+
+@contextmanager
+def reserva():
+    """
+    Reserva a capacidade da requisição atual (classificada por @admissao)
+    enquanto o bloco roda. Deve envolver só a geração em si, dentro da
+    coalescência. Fora de uma requisição com @admissao não reserva nada.
+    """
+    pedido = g.get("admissao") if has_request_context() else None
+    if pedido is None:
+        yield
+        return
+    uid, classe = pedido
+    controller.adquirir(uid, classe)
+    try:
+        yield
+    finally:
+        controller.liberar(uid, classe)
+
+
+def _resposta_recusada(e: AdmissaoRecusada, uid):
+    # recusa da líder repassada a uma coalescida de outro usuário: para esta, é falta de vaga
+    if e.motivo == "usuario" and e.uid == uid:
+        resp = jsonify({"error": "Você já tem exportações em andamento. Aguarde a conclusão."})
+        resp.status_code = 429
+    else:
+        resp = jsonify({"error": "Servidor ocupado gerando relatórios. Tente novamente em instantes."})
+        resp.status_code = 503
+    resp.headers["Retry-After"] = str(ADMISSION_RETRY_AFTER)
+    return resp
+
+
+def admissao(classificar):
+    """
+    Decorator de admissão. `classificar()` devolve a classe da requisição
+    atual ("pacote", "pdf_multi", "pdf", "xlsx", "csv" ou "json"); a
+    reserva é feita por `reserva()` na geração, e a recusa (levantada lá)
+    vira 429/503 aqui. Deve ser aplicado depois de require_auth (usa request.user).
+    """
+    def _decorator(f):
+        @wraps(f)
+        def _wrap(*args, **kwargs):
+            uid = (getattr(request, "user", None) or {}).get("uid")
+            g.admissao = (uid, classificar())
+            try:
+                return f(*args, **kwargs)
+            except AdmissaoRecusada as e:
+                return _resposta_recusada(e, uid)
+        return _wrap
+    return _decorator
+
+
+# -------------------------------------------------------
+#                LIMITE DE TAXA (Flask-Limiter)
+# -------------------------------------------------------
+def _chave_usuario():
+    u = getattr(request, "user", None)
+    if u and u.get("uid") is not None:
+        return f"uid:{u['uid']}"
+    return get_remote_address()
+
+
+limiter = (
+    Limiter(key_func=_chave_usuario, default_limits=[], storage_uri=RATELIMIT_STORAGE_URI,
+            headers_enabled=True)
+    if Limiter else None
+)
+
+
+def limite_exportacao(f):
+    """Aplica RATE_LIMIT_EXPORTS por usuário quando o Flask-Limiter está disponível."""
+    if limiter is None or not RATE_LIMIT_EXPORTS:
+        return f
+    return limiter.limit(RATE_LIMIT_EXPORTS)(f)
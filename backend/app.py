@@ -1,124 +1,239 @@
-# app.py — Flask app com CORS corrigido para funcionamento
+# app.py — factory do Flask (create_app) + blueprints + CORS
 
-from flask import Flask, jsonify, request
+from flask import Flask, g, jsonify, request
 from flask_cors import CORS
-import os
+import importlib, logging, os, time, uuid
+
+import compression, logs
+from lazy import rss_bytes
+
+log = logging.getLogger(__name__)
 
 # ==== Blueprints / módulos ====
-try:
-    from reports import bp as reports_bp
-except Exception as e:
-    reports_bp = None
-    print(f"[app] Aviso: não consegui importar reports.bp -> {e}")
-
-try:
-    from auth import bp as auth_bp
-except Exception:
-    auth_bp = None
-
-try:
-    from users import bp as users_bp
-except Exception:
-    users_bp = None
-
-try:
-    from mural import bp as mural_bp
-except Exception:
-    mural_bp = None
-
-# ==== App / CORS ====
-app = Flask(__name__)
-
-# CORS mais permissivo para desenvolvimento - ADICIONANDO MAIS PORTAS
-CORS(app, 
-     origins=[
-         "http://192.168.0.64:5173", 
-         "http://localhost:5173", 
-         "http://127.0.0.1:5173",
-         "http://192.168.0.64:3000",  # React padrão
-         "http://localhost:3000",     # React padrão
-         "http://127.0.0.1:3000"      # React padrão
-     ],
-     supports_credentials=True,
-     allow_headers=["Content-Type", "Authorization", "Accept"],
-     methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
-     expose_headers=["Content-Disposition"])
-
-# Opcional: responder preflight mais explicitamente
-@app.before_request
-def handle_preflight():
-    if request.method == "OPTIONS":
-        resp = jsonify({'status': 'ok'})
+# (módulo, prefixo de URL opcional, obrigatório?)
+# reports por último: ele importa auth, e assim cada medição fica só com o seu custo
+BLUEPRINTS = [
+    ("auth", None, False),                # /api/auth/...
+    ("users", None, False),
+    ("mural", "/api/mural", False),
+    ("reports", None, True),              # /api/reports/...
+    ("bootstrap", None, False),           # /api/bootstrap (usa auth, reports e mural)
+]
+
+# Tempo de importação e memória de cada blueprint (preenchido no primeiro create_app)
+startup_report = {}
+
+
+def _importar_blueprint(nome: str):
+    """Importa o módulo do blueprint medindo tempo e crescimento de RSS."""
+    ja_importado = nome in startup_report
+    rss_antes = rss_bytes()
+    inicio = time.perf_counter()
+    try:
+        bp = importlib.import_module(nome).bp
+        erro = None
+    except Exception as e:
+        bp, erro = None, e
+    if not ja_importado:
+        rss_depois = rss_bytes()
+        startup_report[nome] = {
+            "import_s": round(time.perf_counter() - inicio, 4),
+            "rss_delta_mb": (
+                round((rss_depois - rss_antes) / 1024 / 1024, 1)
+                if rss_antes is not None and rss_depois is not None else None
+            ),
+            "ok": bp is not None,
+        }
+    return bp, erro
+
+
+# ==== Configuração padrão ====
+DEFAULT_CONFIG = {
+    # Origens liberadas no CORS (frontend dev/preview na rede local)
+    "CORS_ORIGINS": [
+        "http://192.168.0.64:5173",
+        "http://localhost:5173",
+        "http://127.0.0.1:5173",
+        "http://192.168.0.64:3000",  # React padrão
+        "http://localhost:3000",     # React padrão
+        "http://127.0.0.1:3000"      # React padrão
+    ],
+    # Carrega estado somente-leitura compartilhado (estilos, logo, registro de
+    # relatórios) na criação do app. Com gunicorn --preload isso acontece uma
+    # vez no master e é herdado pelos workers.
+    "PRELOAD": os.getenv("PRELOAD", "1") not in ("0", "false", "False"),
+    # Importa pandas/reportlab/openpyxl já na inicialização (por padrão elas
+    # são carregadas só no primeiro relatório). Recomendado junto com
+    # gunicorn --preload; desnecessário em processos só de auth/mural.
+    "WARMUP": os.getenv("WARMUP", "0") in ("1", "true", "True"),
+    # Compressão negociada de JSON/CSV (ver compression.py)
+    **compression.DEFAULTS,
+}
+
+
+def create_app(config: dict | None = None) -> Flask:
+    """Cria e configura a aplicação Flask."""
+    logs.configurar()
+    app = Flask(__name__)
+    app.config.update(DEFAULT_CONFIG)
+    if config:
+        app.config.update(config)
+
+    _configurar_request_id(app)
+    _configurar_cors(app)
+    compression.init_compression(app)
+
+    # Limite de taxa por usuário (Flask-Limiter) para os endpoints de exportação
+    try:
+        from admission import limiter
+        if limiter:
+            limiter.init_app(app)
+    except Exception as e:
+        log.warning("Flask-Limiter não inicializado -> %s", e)
+
+    # ==== Health básico da API ====
+    @app.get("/api/health")
+    def health():
+        return jsonify({"status": "ok", "message": "API funcionando"})
+
+    rss_inicio = rss_bytes()
+    _registrar_blueprints(app)
+
+    if app.config["PRELOAD"]:
+        preload_shared_state()
+    if app.config["WARMUP"]:
+        warmup_render_deps()
+
+    _imprimir_startup_report(rss_inicio)
+    return app
+
+
+# Cabeçalhos aceitos/expostos ao frontend (CORS)
+CORS_ALLOW_HEADERS = ["Content-Type", "Authorization", "Accept", "If-None-Match", "X-Request-Id"]
+CORS_EXPOSE_HEADERS = ["Content-Disposition", "X-Dados-Em", "ETag", "X-Request-Id"]
+
+
+def _configurar_request_id(app: Flask):
+    """Id por requisição (X-Request-Id recebido ou gerado), presente em todo log da requisição."""
+
+    @app.before_request
+    def _inicio_requisicao():
+        g.request_id = (request.headers.get("X-Request-Id") or "")[:64] or uuid.uuid4().hex[:16]
+        g.inicio_requisicao = time.perf_counter()
+        logs.request_id.set(g.request_id)
+
+    @app.after_request
+    def _fim_requisicao(response):
+        response.headers["X-Request-Id"] = g.get("request_id", "")
+        if "inicio_requisicao" in g:
+            log.info("requisição", extra={
+                "metodo": request.method,
+                "rota": request.path,
+                "status": response.status_code,
+                "duracao_ms": round((time.perf_counter() - g.inicio_requisicao) * 1000, 1),
+            })
+        return response
+
+    @app.teardown_request
+    def _limpar_request_id(_exc):
+        logs.request_id.set(None)
+
+
+def _configurar_cors(app: Flask):
+    allowed_origins = app.config["CORS_ORIGINS"]
+
+    CORS(app,
+         origins=allowed_origins,
+         supports_credentials=True,
+         allow_headers=CORS_ALLOW_HEADERS,
+         methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
+         expose_headers=CORS_EXPOSE_HEADERS)
+
+    # Opcional: responder preflight mais explicitamente
+    @app.before_request
+    def handle_preflight():
+        if request.method == "OPTIONS":
+            resp = jsonify({'status': 'ok'})
+            origin = request.headers.get('Origin')
+            if origin in allowed_origins:
+                resp.headers['Access-Control-Allow-Origin'] = origin
+            resp.headers['Access-Control-Allow-Methods'] = 'GET,POST,PUT,PATCH,DELETE,OPTIONS'
+            resp.headers['Access-Control-Allow-Headers'] = ','.join(CORS_ALLOW_HEADERS)
+            resp.headers['Access-Control-Allow-Credentials'] = 'true'
+            resp.headers['Access-Control-Expose-Headers'] = ','.join(CORS_EXPOSE_HEADERS)
+            return resp
+
+    @app.after_request
+    def after_request(response):
         origin = request.headers.get('Origin')
-        allowed_origins = [
-            "http://192.168.0.64:5173", 
-            "http://localhost:5173", 
-            "http://127.0.0.1:5173",
-            "http://192.168.0.64:3000",
-            "http://localhost:3000",
-            "http://127.0.0.1:3000"
-        ]
         if origin in allowed_origins:
-            resp.headers['Access-Control-Allow-Origin'] = origin
-        resp.headers['Access-Control-Allow-Methods'] = 'GET,POST,PUT,PATCH,DELETE,OPTIONS'
-        resp.headers['Access-Control-Allow-Headers'] = 'Content-Type,Authorization,Accept'
-        resp.headers['Access-Control-Allow-Credentials'] = 'true'
-        resp.headers['Access-Control-Expose-Headers'] = 'Content-Disposition'
-        return resp
-
-@app.after_request
-def after_request(response):
-    origin = request.headers.get('Origin')
-    allowed_origins = [
-        "http://192.168.0.64:5173", 
-        "http://localhost:5173", 
-        "http://127.0.0.1:5173",
-        "http://192.168.0.64:3000",
-        "http://localhost:3000",
-        "http://127.0.0.1:3000"
-    ]
-    if origin in allowed_origins:
-        response.headers['Access-Control-Allow-Origin'] = origin
-        response.headers['Access-Control-Allow-Credentials'] = 'true'
-        response.headers['Access-Control-Expose-Headers'] = 'Content-Disposition'
-    return response
-
-# ==== Health básico da API ====
-@app.get("/api/health")
-def health():
-    return jsonify({"status": "ok", "message": "API funcionando"})
-
-# ==== Registro dos blueprints ====
-if reports_bp:
-    app.register_blueprint(reports_bp)   # /api/reports/...
-    print("[app] Blueprint 'reports' registrado com sucesso")
-else:
-    print("[app] ERRO: Blueprint 'reports' não foi carregado!")
-
-if auth_bp:
-    app.register_blueprint(auth_bp)      # /api/auth/...
-    print("[app] Blueprint 'auth' registrado com sucesso")
-
-if users_bp:
-    app.register_blueprint(users_bp)
-    print("[app] Blueprint 'users' registrado com sucesso")
-
-if mural_bp:
-    app.register_blueprint(mural_bp, url_prefix="/api/mural")
-    print("[app] Blueprint 'mural' registrado com sucesso")
+            response.headers['Access-Control-Allow-Origin'] = origin
+            response.headers['Access-Control-Allow-Credentials'] = 'true'
+            response.headers['Access-Control-Expose-Headers'] = ','.join(CORS_EXPOSE_HEADERS)
+        return response
+
+
+def _registrar_blueprints(app: Flask):
+    for nome, prefixo, obrigatorio in BLUEPRINTS:
+        bp, erro = _importar_blueprint(nome)
+        if bp is None:
+            if obrigatorio:
+                log.error("Blueprint '%s' não foi carregado! -> %s", nome, erro)
+            continue
+        if prefixo:
+            app.register_blueprint(bp, url_prefix=prefixo)
+        else:
+            app.register_blueprint(bp)
+        log.info("Blueprint '%s' registrado com sucesso", nome)
+
+
+def preload_shared_state():
+    """Pré-carrega o estado somente-leitura compartilhado pelos relatórios."""
+    try:
+        import reports
+        reports.preload()
+    except Exception as e:
+        log.warning("Falha no preload dos relatórios -> %s", e)
+
+
+def warmup_render_deps():
+    """Gancho de aquecimento: importa as bibliotecas de renderização agora."""
+    try:
+        import reports
+        tempos = reports.warmup()
+        startup_report["warmup"] = {k: round(v, 4) for k, v in tempos.items()}
+    except Exception as e:
+        log.warning("Falha no warmup dos relatórios -> %s", e)
+
+
+def _imprimir_startup_report(rss_inicio):
+    """Resumo de inicialização: tempo de import e RSS por blueprint (um evento estruturado)."""
+    rss = rss_bytes()
+    log.info("Inicialização (import / RSS por blueprint)", extra={
+        "blueprints": {nome: info for nome, info in startup_report.items() if nome != "warmup"},
+        "warmup_s": startup_report.get("warmup"),
+        "rss_total_mb": round(rss / 1024 / 1024, 1) if rss is not None else None,
+        "rss_create_app_mb": (
+            round((rss - rss_inicio) / 1024 / 1024, 1) if rss is not None and rss_inicio is not None else None
+        ),
+    })
+
 
 # ==== Execução direta (desenvolvimento) ====
+# Produção: serve.py (waitress no Windows / gunicorn no Linux)
 if __name__ == "__main__":
+    app = create_app()
+
     # 0.0.0.0 para aceitar chamadas da rede local
     print("Iniciando servidor Flask...")
     print("URLs registradas:")
     for rule in app.url_map.iter_rules():
         print(f"  {rule.rule} -> {rule.endpoint}")
-    
+
     print(f"\nServidor rodando em:")
     print(f"  - Local: http://localhost:5055")
     print(f"  - Rede:  http://192.168.0.64:5055")
     print(f"  - API Health: http://192.168.0.64:5055/api/health")
     print(f"  - Reports Test: http://192.168.0.64:5055/api/reports/test")
-    
-    app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 5055)), debug=True)
\ No newline at end of file
+
+    app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 5055)), debug=True)
@@ -0,0 +1,186 @@
+# backend/audit.py
+"""
+Registro de auditoria (LGPD) dos downloads de relatórios.
+
+O caminho da requisição só enfileira o evento (`registrar_download`) numa
+fila em memória com limite (AUDIT_QUEUE_MAX) e nunca espera pela gravação:
+se a fila estiver cheia o evento é descartado e contado em `metricas()`.
+
+Uma thread de fundo agrupa os eventos e grava no MySQL em lotes
+(INSERT multi-linhas via executemany), a cada AUDIT_BATCH_SIZE eventos ou
+AUDIT_FLUSH_INTERVAL segundos. No desligamento o que restou na fila é gravado.
+
+Tabela: sql/download_audit.sql
+"""
+import datetime as dt
+import json, logging, os, queue, threading, time
+from sqlalchemy import text
+from db import MySQLSession
+from lifecycle import on_shutdown
+
+log = logging.getLogger(__name__)
+
+AUDIT_ENABLED = os.getenv("AUDIT_ENABLED", "1") not in ("0", "false", "False")
+AUDIT_QUEUE_MAX = int(os.getenv("AUDIT_QUEUE_MAX", "10000"))
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "200"))
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", "2"))
+# Tentativas de gravação de um lote antes de descartá-lo
+AUDIT_MAX_RETRIES = int(os.getenv("AUDIT_MAX_RETRIES", "3"))
+
+_INSERT = text("""
+    INSERT INTO download_audit
+        (user_id, report_key, params, formato, linhas, bytes, duracao_ms, ip, criado_em)
+    VALUES
+        (:user_id, :report_key, :params, :formato, :linhas, :bytes, :duracao_ms, :ip, :criado_em)
+""")
+
+
+class AuditWriter:
+    def __init__(self, maxsize: int = AUDIT_QUEUE_MAX, lote: int = AUDIT_BATCH_SIZE,
+                 intervalo: float = AUDIT_FLUSH_INTERVAL):
+        self._fila = queue.Queue(maxsize=maxsize)
+        self.lote = lote
+        self.intervalo = intervalo
+        self._lock = threading.Lock()      # contadores e início da thread
+        self._gravacao = threading.Lock()  # uma gravação por vez (thread x flush)
+        self._thread = None
+        self._thread_pid = None
+        self._m = {
+            "enfileirados": 0,
+            "gravados": 0,
+            "descartados_fila_cheia": 0,
+            "descartados_erro": 0,
+            "lotes": 0,
+            "falhas_gravacao": 0,
+            "fila_max_observada": 0,
+            "ultimo_lote_ms": None,
+            "ultimo_erro": None,
+        }
+
+    # ---------- caminho da requisição ----------
+    def registrar(self, evento: dict) -> bool:
+        """Enfileira sem bloquear. Retorna False se o evento foi descartado."""
+        self._garantir_thread()
+        try:
+            self._fila.put_nowait(evento)
+        except queue.Full:
+            with self._lock:
+                self._m["descartados_fila_cheia"] += 1
+            return False
+        with self._lock:
+            self._m["enfileirados"] += 1
+            tamanho = self._fila.qsize()
+            if tamanho > self._m["fila_max_observada"]:
+                self._m["fila_max_observada"] = tamanho
+        return True
+
+    # ---------- gravação ----------
+    def _garantir_thread(self):
+        # threads não sobrevivem ao fork dos workers: confere o pid
+        if self._thread_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread_pid == os.getpid():
+                return
+            self._thread = threading.Thread(target=self._loop, name="audit-writer", daemon=True)
+            self._thread.start()
+            self._thread_pid = os.getpid()
+
+    def _coletar(self, espera: float | None) -> list:
+        """Retira até `lote` eventos; espera até `espera` segundos pelo primeiro."""
+        try:
+            itens = [self._fila.get(timeout=espera) if espera else self._fila.get_nowait()]
+        except queue.Empty:
+            return []
+        limite = time.monotonic() + (espera or 0)
+        while len(itens) < self.lote:
+            restante = limite - time.monotonic()
+            try:
+                itens.append(self._fila.get(timeout=restante) if restante > 0 else self._fila.get_nowait())
+            except queue.Empty:
+                break
+        return itens
+
+    def _gravar(self, eventos: list):
+        inicio = time.perf_counter()
+        for tentativa in range(1, AUDIT_MAX_RETRIES + 1):
+            try:
+                with MySQLSession() as s:
+                    s.execute(_INSERT, eventos)
+                    s.commit()
+                break
+            except Exception as e:
+                with self._lock:
+                    self._m["falhas_gravacao"] += 1
+                    self._m["ultimo_erro"] = str(e)
+                if tentativa == AUDIT_MAX_RETRIES:
+                    log.error("Lote de %d eventos descartado após %d tentativas: %s", len(eventos), tentativa, e)
+                    with self._lock:
+                        self._m["descartados_erro"] += len(eventos)
+                    return
+                time.sleep(min(2 ** tentativa, 10))
+        with self._lock:
+            self._m["gravados"] += len(eventos)
+            self._m["lotes"] += 1
+            self._m["ultimo_lote_ms"] = round((time.perf_counter() - inicio) * 1000, 1)
+
+    def _loop(self):
+        while True:
+            eventos = self._coletar(self.intervalo)
+            if not eventos:
+                continue
+            try:
+                with self._gravacao:
+                    self._gravar(eventos)
+            except Exception as e:
+                log.exception("Erro inesperado na gravação")
+
+    def flush(self):
+        """Grava tudo o que estiver na fila (usado no desligamento)."""
+        with self._gravacao:
+            while True:
+                eventos = self._coletar(None)
+                if not eventos:
+                    return
+                self._gravar(eventos)
+
+    def metricas(self) -> dict:
+        with self._lock:
+            m = dict(self._m)
+        m["fila_atual"] = self._fila.qsize()
+        m["fila_capacidade"] = self._fila.maxsize
+        m["ocupacao"] = round(m["fila_atual"] / self._fila.maxsize, 3) if self._fila.maxsize else None
+        return m
+
+
+# Instância compartilhada
+writer = AuditWriter()
+on_shutdown(writer.flush)
+
+
+def registrar_download(uid: int, report_key: str, params: dict, formato: str,
+                       linhas: int | None, tamanho: int | None, duracao: float, ip: str | None = None):
+    """
+    Enfileira um evento de download. `duracao` em segundos.
+    Nunca levanta exceção nem bloqueia o atendimento.
+    """
+    if not AUDIT_ENABLED:
+        return
+    try:
+        writer.registrar({
+            "user_id": uid,
+            "report_key": report_key,
+            "params": json.dumps(params, sort_keys=True, ensure_ascii=False, default=str),
+            "formato": formato,
+            "linhas": linhas,
+            "bytes": tamanho,
+            "duracao_ms": int(duracao * 1000),
+            "ip": ip,
+            "criado_em": dt.datetime.now(),
+        })
+    except Exception as e:
+        log.warning("Evento não registrado -> %s", e)
+
+
+def metricas() -> dict:
+    return {"habilitado": AUDIT_ENABLED, **writer.metricas()}
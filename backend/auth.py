@@ -1,10 +1,14 @@
 # backend/auth.py
 from flask import Blueprint, request, jsonify
 from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
-from sqlalchemy import text
+from sqlalchemy import text, bindparam
+from sqlalchemy.exc import IntegrityError
 from db import MySQLSession
-import os, bcrypt
+from permissions import relatorios_do_usuario, invalidar as invalidar_permissoes
+import os, bcrypt, base64, json, hashlib, secrets
+from datetime import datetime, timedelta
 from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
 
 bp = Blueprint("auth", __name__, url_prefix="/api/auth")
 
@@ -12,15 +16,50 @@ bp = Blueprint("auth", __name__, url_prefix="/api/auth")
 SECRET_KEY = os.getenv("SECRET_KEY", "devkey")
 serializer = URLSafeTimedSerializer(SECRET_KEY)
 
+# Token de acesso curto + refresh token longo e revogável (tabela refresh_tokens,
+# ver sql/refresh_tokens.sql). /refresh emite novos tokens de acesso sem bcrypt.
+ACCESS_TOKEN_TTL = int(os.getenv("ACCESS_TOKEN_TTL", "900"))                   # 15 min
+REFRESH_TOKEN_TTL = int(os.getenv("REFRESH_TOKEN_TTL", str(30 * 24 * 3600)))   # 30 dias
+refresh_serializer = URLSafeTimedSerializer(SECRET_KEY, salt="refresh")
+
 def make_token(payload: dict) -> str:
     return serializer.dumps(payload)
 
-def verify_token(token: str, max_age=3600 * 8):
+def verify_token(token: str, max_age=ACCESS_TOKEN_TTL):
     try:
         return serializer.loads(token, max_age=max_age)
     except (BadSignature, SignatureExpired):
         return None
 
+def _refresh_hash(refresh_token: str) -> str:
+    # só o hash fica no banco
+    return hashlib.sha256(refresh_token.encode("utf-8")).hexdigest()
+
+def make_refresh_token(s, uid: int) -> str:
+    """Cria um refresh token para o usuário e grava seu hash (sem commit)."""
+    refresh_token = refresh_serializer.dumps({"uid": uid, "jti": secrets.token_urlsafe(16)})
+    s.execute(text("""
+        INSERT INTO refresh_tokens (user_id, token_hash, expires_at, user_agent)
+        VALUES (:uid, :h, NOW() + INTERVAL :ttl SECOND, :ua)
+    """), {
+        "uid": uid,
+        "h": _refresh_hash(refresh_token),
+        "ttl": REFRESH_TOKEN_TTL,
+        "ua": (request.headers.get("User-Agent") or "")[:255],
+    })
+    return refresh_token
+
+def revogar_refresh_tokens(s, uids) -> None:
+    """Revoga todos os refresh tokens ativos dos usuários (sem commit)."""
+    uids = list(uids)
+    if not uids:
+        return
+    s.execute(
+        text("UPDATE refresh_tokens SET revoked_at = NOW() WHERE user_id IN :uids AND revoked_at IS NULL")
+        .bindparams(bindparam("uids", expanding=True)),
+        {"uids": uids},
+    )
+
 # --- Helpers / decorators ----------------------------------------------------
 def json_error(msg, code=400):
     return jsonify({"error": msg}), code
@@ -79,20 +118,17 @@ def login():
         if not bcrypt.checkpw(password, u["password_hash"].encode("utf-8")):
             return json_error("Credenciais inválidas", 401)
 
-        # Relatórios permitidos ao usuário
-        rows = s.execute(text("""
-            SELECT r.report_key AS `key`, r.module, r.label
-            FROM reports r
-            JOIN report_permissions rp ON rp.report_id = r.id
-            WHERE rp.user_id = :uid
-            ORDER BY r.module, r.label
-        """), {"uid": u["id"]}).mappings().all()
+        refresh_token = make_refresh_token(s, u["id"])
+        s.commit()
 
-        rows = [dict(r) for r in rows]
+    # Relatórios permitidos ao usuário (cache de permissões)
+    rows = relatorios_do_usuario(u["id"])
 
     token = make_token({"uid": u["id"], "email": u["email"], "role": u["role"]})
     return jsonify({
         "token": token,
+        "refresh_token": refresh_token,
+        "expires_in": ACCESS_TOKEN_TTL,
         "user": {
             "id": u["id"],
             "name": u["name"],
@@ -103,6 +139,54 @@ def login():
         "reports": rows
     })
 
+@bp.post("/refresh")
+def refresh():
+    """
+    Emite um novo token de acesso a partir do refresh token.
+    Verifica a assinatura (HMAC) e, numa consulta indexada, se o token não foi
+    revogado/expirado e o usuário continua ativo — sem bcrypt.
+    O papel vem do banco, então mudanças de papel valem a partir do próximo refresh.
+    """
+    data = request.get_json(silent=True) or {}
+    refresh_token = data.get("refresh_token") or ""
+    try:
+        payload = refresh_serializer.loads(refresh_token, max_age=REFRESH_TOKEN_TTL)
+    except (BadSignature, SignatureExpired):
+        return json_error("Refresh token inválido", 401)
+
+    with MySQLSession() as s:
+        u = s.execute(text("""
+            SELECT u.id, u.email, u.active, COALESCE(r.name, 'user') AS role
+            FROM refresh_tokens rt
+            JOIN users u ON u.id = rt.user_id
+            LEFT JOIN user_roles ur ON ur.user_id = u.id
+            LEFT JOIN roles r ON r.id = ur.role_id
+            WHERE rt.token_hash = :h
+              AND rt.revoked_at IS NULL
+              AND rt.expires_at > NOW()
+            LIMIT 1
+        """), {"h": _refresh_hash(refresh_token)}).mappings().first()
+
+    if not u or not int(u["active"]) or u["id"] != payload.get("uid"):
+        return json_error("Refresh token inválido ou revogado", 401)
+
+    token = make_token({"uid": u["id"], "email": u["email"], "role": u["role"]})
+    return jsonify({"token": token, "expires_in": ACCESS_TOKEN_TTL})
+
+@bp.post("/logout")
+def logout():
+    """Revoga o refresh token informado (o token de acesso expira sozinho)."""
+    data = request.get_json(silent=True) or {}
+    refresh_token = data.get("refresh_token") or ""
+    if refresh_token:
+        with MySQLSession() as s:
+            s.execute(text("""
+                UPDATE refresh_tokens SET revoked_at = NOW()
+                WHERE token_hash = :h AND revoked_at IS NULL
+            """), {"h": _refresh_hash(refresh_token)})
+            s.commit()
+    return jsonify({"ok": True})
+
 @bp.get("/me")
 @require_auth
 def me():
@@ -168,31 +252,467 @@ def register():
     
     return jsonify({"user": user_dict, "assigned_role": role_name}), 201
 
+# --- Listagem paginada de usuários -------------------------------------------
+USERS_PAGE_DEFAULT = 50
+USERS_PAGE_MAX = 200
+
+# Papel do usuário sem GROUP BY: um único papel por usuário (o de menor id)
+_ROLE_SUBQUERY = """
+    COALESCE((
+        SELECT r.name FROM user_roles ur
+        JOIN roles r ON r.id = ur.role_id
+        WHERE ur.user_id = u.id
+        ORDER BY r.id
+        LIMIT 1
+    ), 'user')
+"""
+
+def _encode_cursor(created_at, user_id: int) -> str:
+    bruto = json.dumps([created_at.isoformat() if created_at else None, user_id])
+    return base64.urlsafe_b64encode(bruto.encode("utf-8")).decode("ascii").rstrip("=")
+
+def _decode_cursor(cursor: str):
+    """Retorna (created_at, id) ou levanta ValueError."""
+    pad = "=" * (-len(cursor) % 4)
+    created_at, user_id = json.loads(base64.urlsafe_b64decode(cursor + pad).decode("utf-8"))
+    return (datetime.fromisoformat(created_at) if created_at else None), int(user_id)
+
+def _parse_date(valor: str | None):
+    if not valor:
+        return None
+    return datetime.fromisoformat(valor.strip())
+
+def _like_prefix(valor: str) -> str:
+    """Escapa curingas do LIKE e monta a busca por prefixo (usa índice)."""
+    escapado = valor.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escapado + "%"
+
 @bp.get("/users")
 @require_admin
 def list_users():
+    """
+    Lista usuários com paginação por keyset (created_at DESC, id DESC).
+
+    Query params:
+    - limit: tamanho da página (padrão 50, máx. 200)
+    - cursor: valor de `next_cursor` da página anterior
+    - q: busca por prefixo em nome ou e-mail
+    - role: nome do papel (ex.: admin, tecnico, user)
+    - active: 0/1
+    - created_from / created_to: datas ISO (YYYY-MM-DD[THH:MM:SS]); created_to
+      só com a data inclui o dia inteiro
+
+    `total` (com os mesmos filtros) só é calculado na primeira página.
+    """
+    args = request.args
+    try:
+        limit = min(max(int(args.get("limit", USERS_PAGE_DEFAULT)), 1), USERS_PAGE_MAX)
+        cursor = _decode_cursor(args["cursor"]) if args.get("cursor") else None
+        created_from = _parse_date(args.get("created_from"))
+        created_to = _parse_date(args.get("created_to"))
+        # só a data (YYYY-MM-DD): o dia inteiro entra no filtro
+        created_to_dia = created_to is not None and "T" not in args["created_to"] and " " not in args["created_to"].strip()
+    except (ValueError, TypeError):
+        return json_error("parâmetros de paginação/filtro inválidos", 400)
+
+    filtros = []
+    params = {}
+
+    q = (args.get("q") or "").strip().lower()
+    if q:
+        filtros.append("(u.name LIKE :q OR u.email LIKE :q)")
+        params["q"] = _like_prefix(q)
+
+    role = (args.get("role") or "").strip().lower()
+    if role:
+        cond_role = """EXISTS (
+            SELECT 1 FROM user_roles ur JOIN roles r ON r.id = ur.role_id
+            WHERE ur.user_id = u.id AND r.name = :role
+        )"""
+        if role == "user":
+            cond_role = f"({cond_role} OR NOT EXISTS (SELECT 1 FROM user_roles ur WHERE ur.user_id = u.id))"
+        filtros.append(cond_role)
+        params["role"] = role
+
+    active = args.get("active")
+    if active not in (None, ""):
+        filtros.append("u.active = :active")
+        params["active"] = 1 if str(active) in ("1", "true", "True") else 0
+
+    if created_from:
+        filtros.append("u.created_at >= :created_from")
+        params["created_from"] = created_from
+    if created_to:
+        if created_to_dia:
+            filtros.append("u.created_at < :created_to")
+            params["created_to"] = created_to + timedelta(days=1)
+        else:
+            filtros.append("u.created_at <= :created_to")
+            params["created_to"] = created_to
+
+    where_filtros = " AND ".join(filtros) if filtros else "1 = 1"
+
+    where_pagina = where_filtros
+    if cursor:
+        where_pagina += " AND (u.created_at < :c_at OR (u.created_at = :c_at AND u.id < :c_id))"
+        params["c_at"], params["c_id"] = cursor
+
     with MySQLSession() as s:
-        rows = s.execute(text("""
-            SELECT 
-                u.id, u.name, u.email, u.password_hash, u.active,
-                u.created_at,
-                COALESCE(r.name, 'user') AS role
+        rows = s.execute(text(f"""
+            SELECT u.id, u.name, u.email, u.active, u.created_at,
+                   {_ROLE_SUBQUERY} AS role
             FROM users u
-            LEFT JOIN user_roles ur ON ur.user_id = u.id
-            LEFT JOIN roles r ON r.id = ur.role_id
-            GROUP BY u.id, u.name, u.email, u.password_hash, u.active, u.created_at
-            ORDER BY u.created_at DESC
-        """)).mappings().all()
-        
-        # Converter para lista de dicts e formatar created_at
-        users_list = []
-        for row in rows:
-            user_dict = dict(row)
-            if user_dict.get("created_at"):
-                user_dict["created_at"] = user_dict["created_at"].isoformat()
-            users_list.append(user_dict)
-    
-    return jsonify({"users": users_list})
+            WHERE {where_pagina}
+            ORDER BY u.created_at DESC, u.id DESC
+            LIMIT :lim
+        """), {**params, "lim": limit + 1}).mappings().all()
+
+        total = None
+        if not cursor:
+            total = s.execute(text(f"SELECT COUNT(*) FROM users u WHERE {where_filtros}"),
+                              params).scalar()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    # Converter para lista de dicts e formatar created_at
+    users_list = []
+    for row in rows:
+        user_dict = dict(row)
+        if user_dict.get("created_at"):
+            user_dict["created_at"] = user_dict["created_at"].isoformat()
+        users_list.append(user_dict)
+
+    next_cursor = _encode_cursor(rows[-1]["created_at"], rows[-1]["id"]) if has_more else None
+
+    return jsonify({
+        "users": users_list,
+        "next_cursor": next_cursor,
+        "limit": limit,
+        "total": total,
+    })
+
+# --- Provisionamento em lote --------------------------------------------------
+BULK_MAX_USERS = int(os.getenv("BULK_MAX_USERS", "1000"))
+BULK_HASH_WORKERS = int(os.getenv("BULK_HASH_WORKERS", str(os.cpu_count() or 4)))
+
+def _hash_password(password: str) -> str:
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=12)).decode("utf-8")
+
+def _campo_texto(item: dict, campo: str, erros: list) -> str:
+    """Valor de texto da linha ("" se ausente); tipo errado vira erro da linha."""
+    valor = item.get(campo)
+    if valor is None:
+        return ""
+    if not isinstance(valor, str):
+        erros.append(f"{campo} deve ser texto")
+        return ""
+    return valor
+
+def _validar_lote(itens: list, existentes: dict, reports_validos: dict) -> list:
+    """
+    Valida todas as linhas antes de gravar. Retorna a lista de resultados por
+    linha ({index, email, op, errors}); op = "create" | "update".
+    """
+    resultados = []
+    vistos = set()
+    for i, item in enumerate(itens):
+        erros = []
+        if not isinstance(item, dict):
+            erros.append("cada usuário deve ser um objeto")
+            item = {}
+        email = _campo_texto(item, "email", erros).strip().lower()
+        name = _campo_texto(item, "name", erros).strip()
+        password = _campo_texto(item, "password", erros)
+        _campo_texto(item, "role", erros)
+        reports_req = item.get("reports") or []
+        op = "update" if email in existentes else "create"
+
+        if not email or "@" not in email or "." not in email:
+            erros.append("email inválido")
+        elif email in vistos:
+            erros.append("email repetido no lote")
+        vistos.add(email)
+
+        if op == "create":
+            if not name:
+                erros.append("name é obrigatório para novos usuários")
+            if len(password) < 8:
+                erros.append("password (mín. 8 caracteres) é obrigatório para novos usuários")
+        elif password and len(password) < 8:
+            erros.append("password deve ter pelo menos 8 caracteres")
+
+        if not isinstance(reports_req, list) or not all(isinstance(k, str) for k in reports_req):
+            erros.append("reports deve ser uma lista de chaves (texto)")
+        else:
+            desconhecidos = [k for k in reports_req if k not in reports_validos]
+            if desconhecidos:
+                erros.append(f"relatórios desconhecidos: {', '.join(desconhecidos)}")
+
+        resultados.append({"index": i, "email": email, "op": op, "errors": erros})
+    return resultados
+
+@bp.post("/users/bulk")
+@require_admin
+def bulk_users():
+    """
+    Cria/atualiza usuários em lote numa única transação.
+
+    body: { "users": [ { "email", "name", "password", "role", "active", "reports": [keys] } ] }
+    - email existente => atualização (campos ausentes não mudam)
+    - email novo => criação (name e password obrigatórios)
+    - reports: permissões de relatório concedidas (aditivas)
+
+    Tudo é validado antes de gravar; havendo qualquer erro nada é gravado e a
+    resposta (400) traz os erros por linha.
+    """
+    data = request.get_json(silent=True) or {}
+    itens = data.get("users")
+    if not isinstance(itens, list) or not itens:
+        return json_error("users deve ser uma lista não vazia", 400)
+    if len(itens) > BULK_MAX_USERS:
+        return json_error(f"máximo de {BULK_MAX_USERS} usuários por lote", 400)
+
+    emails = list({i["email"].strip().lower() for i in itens
+                   if isinstance(i, dict) and isinstance(i.get("email"), str)})
+    chaves_reports = list({k for i in itens if isinstance(i, dict) and isinstance(i.get("reports"), list)
+                           for k in i["reports"] if isinstance(k, str)})
+
+    # sessão curta só para as consultas; validação e bcrypt acontecem sem conexão presa
+    with MySQLSession() as s:
+        existentes = {}
+        if emails:
+            existentes = {r["email"]: r["id"] for r in s.execute(
+                text("SELECT id, email FROM users WHERE email IN :emails")
+                .bindparams(bindparam("emails", expanding=True)),
+                {"emails": emails}
+            ).mappings()}
+        reports_validos = {}
+        if chaves_reports:
+            reports_validos = {r["report_key"]: r["id"] for r in s.execute(
+                text("SELECT id, report_key FROM reports WHERE report_key IN :keys")
+                .bindparams(bindparam("keys", expanding=True)),
+                {"keys": chaves_reports}
+            ).mappings()}
+
+    resultados = _validar_lote(itens, existentes, reports_validos)
+    if any(r["errors"] for r in resultados):
+        for r in resultados:
+            r["status"] = "error" if r["errors"] else "skipped"
+        return jsonify({"ok": False, "results": resultados}), 400
+
+    # bcrypt libera o GIL: hashes em paralelo
+    senhas = [(i, (item.get("password") or "")) for i, item in enumerate(itens) if item.get("password")]
+    with ThreadPoolExecutor(max_workers=max(1, BULK_HASH_WORKERS)) as ex:
+        hashes = dict(zip([i for i, _ in senhas], ex.map(_hash_password, [p for _, p in senhas])))
+
+    def _active(item):
+        if "active" not in item or item["active"] is None:
+            return None
+        return 1 if str(item["active"]) in ("1", "true", "True") else 0
+
+    with MySQLSession() as s:
+        # ---- usuários novos (um INSERT multi-linha) ----
+        novos = [{
+            "n": item["name"].strip(), "e": r["email"], "h": hashes[r["index"]],
+            "a": 1 if _active(item) is None else _active(item),
+        } for item, r in zip(itens, resultados) if r["op"] == "create"]
+        if novos:
+            try:
+                s.execute(text("""
+                    INSERT INTO users (name, email, password_hash, active)
+                    VALUES (:n, :e, :h, :a)
+                """), novos)
+            except IntegrityError:
+                # outro cadastro criou um desses emails depois da validação
+                s.rollback()
+                return json_error("email já cadastrado (lote concorrente); reenvie o lote", 409)
+            ids_novos = s.execute(
+                text("SELECT id, email FROM users WHERE email IN :emails")
+                .bindparams(bindparam("emails", expanding=True)),
+                {"emails": [n["e"] for n in novos]}
+            ).mappings()
+            existentes.update({r["email"]: r["id"] for r in ids_novos})
+
+        # ---- usuários existentes (campos ausentes ficam como estão) ----
+        atualizacoes = [{
+            "uid": existentes[r["email"]],
+            "name": (item.get("name") or "").strip() or None,
+            "active": _active(item),
+            "h": hashes.get(r["index"]),
+        } for item, r in zip(itens, resultados) if r["op"] == "update"]
+        if atualizacoes:
+            s.execute(text("""
+                UPDATE users
+                SET name = COALESCE(:name, name),
+                    active = COALESCE(:active, active),
+                    password_hash = COALESCE(:h, password_hash)
+                WHERE id = :uid
+            """), atualizacoes)
+            # senha trocada ou usuário desativado => sessões existentes caem
+            revogar_refresh_tokens(s, {a["uid"] for a in atualizacoes if a["h"] or a["active"] == 0})
+
+        # ---- papéis (cria os que faltam e substitui o papel de cada usuário) ----
+        com_role = [(existentes[r["email"]], (item.get("role") or "").strip().lower())
+                    for item, r in zip(itens, resultados)
+                    if (item.get("role") or "").strip() or r["op"] == "create"]
+        com_role = [(uid, role or "user") for uid, role in com_role]
+        if com_role:
+            nomes_roles = list({role for _, role in com_role})
+            roles = {r["name"]: r["id"] for r in s.execute(
+                text("SELECT id, name FROM roles WHERE name IN :names")
+                .bindparams(bindparam("names", expanding=True)),
+                {"names": nomes_roles}
+            ).mappings()}
+            faltando = [{"r": n} for n in nomes_roles if n not in roles]
+            if faltando:
+                s.execute(text("INSERT INTO roles (name) VALUES (:r)"), faltando)
+                roles.update({r["name"]: r["id"] for r in s.execute(
+                    text("SELECT id, name FROM roles WHERE name IN :names")
+                    .bindparams(bindparam("names", expanding=True)),
+                    {"names": [f["r"] for f in faltando]}
+                ).mappings()})
+            s.execute(
+                text("DELETE FROM user_roles WHERE user_id IN :uids")
+                .bindparams(bindparam("uids", expanding=True)),
+                {"uids": [uid for uid, _ in com_role]}
+            )
+            s.execute(text("INSERT INTO user_roles (user_id, role_id) VALUES (:uid, :rid)"),
+                      [{"uid": uid, "rid": roles[role]} for uid, role in com_role])
+
+        # ---- permissões de relatório iniciais (aditivas) ----
+        permissoes = list({(existentes[r["email"]], reports_validos[k])
+                           for item, r in zip(itens, resultados)
+                           for k in (item.get("reports") or [])})
+        if permissoes:
+            s.execute(text("""
+                INSERT IGNORE INTO report_permissions (user_id, report_id)
+                VALUES (:uid, :rid)
+            """), [{"uid": uid, "rid": rid} for uid, rid in permissoes])
+
+        s.commit()
+
+    if permissoes:
+        invalidar_permissoes({uid for uid, _ in permissoes})
+
+    for r in resultados:
+        r["id"] = existentes.get(r["email"])
+        r["status"] = "created" if r["op"] == "create" else "updated"
+    return jsonify({"ok": True, "results": resultados}), 200
+
+# --- Permissões de relatório em lote -----------------------------------------
+def _alvo_permissoes():
+    """
+    Lê {reports, users, roles, preview} do body e monta a condição SQL dos
+    usuários-alvo (ids explícitos e/ou membros dos papéis informados).
+    """
+    data = request.get_json(silent=True) or {}
+    keys = [k for k in (data.get("reports") or []) if isinstance(k, str)]
+    try:
+        uids = [int(u) for u in (data.get("users") or [])]
+    except (TypeError, ValueError):
+        uids = None
+    roles = [str(r).strip().lower() for r in (data.get("roles") or []) if str(r).strip()]
+    preview = str(data.get("preview", "0")) in ("1", "true", "True")
+
+    if uids is None:
+        return None, "users deve ser uma lista de ids"
+    if not keys:
+        return None, "reports deve ser uma lista não vazia de chaves"
+    if not uids and not roles:
+        return None, "informe users e/ou roles"
+
+    cond = """(
+        u.id IN :uids
+        OR EXISTS (
+            SELECT 1 FROM user_roles ur JOIN roles ro ON ro.id = ur.role_id
+            WHERE ur.user_id = u.id AND ro.name IN :roles
+        )
+    )"""
+    params = {"keys": keys, "uids": uids, "roles": roles}
+    binds = [bindparam(n, expanding=True) for n in ("keys", "uids", "roles")]
+    return {"cond": cond, "params": params, "binds": binds, "preview": preview}, None
+
+def _aplicar_permissoes(acao: str):
+    alvo, erro = _alvo_permissoes()
+    if erro:
+        return json_error(erro, 400)
+
+    if acao == "grant":
+        # pares (usuário, relatório) que ainda não existem
+        diff_sql = f"""
+            SELECT u.id AS user_id, r.id AS report_id, r.report_key
+            FROM users u
+            JOIN reports r ON r.report_key IN :keys
+            WHERE {alvo["cond"]}
+              AND NOT EXISTS (
+                  SELECT 1 FROM report_permissions rp
+                  WHERE rp.user_id = u.id AND rp.report_id = r.id
+              )
+        """
+        apply_sql = f"""
+            INSERT INTO report_permissions (user_id, report_id)
+            SELECT u.id, r.id
+            FROM users u
+            JOIN reports r ON r.report_key IN :keys
+            WHERE {alvo["cond"]}
+              AND NOT EXISTS (
+                  SELECT 1 FROM report_permissions rp
+                  WHERE rp.user_id = u.id AND rp.report_id = r.id
+              )
+        """
+    else:
+        # pares (usuário, relatório) existentes que serão removidos
+        diff_sql = f"""
+            SELECT u.id AS user_id, r.id AS report_id, r.report_key
+            FROM report_permissions rp
+            JOIN users u ON u.id = rp.user_id
+            JOIN reports r ON r.id = rp.report_id
+            WHERE r.report_key IN :keys AND {alvo["cond"]}
+        """
+        apply_sql = f"""
+            DELETE rp FROM report_permissions rp
+            JOIN users u ON u.id = rp.user_id
+            JOIN reports r ON r.id = rp.report_id
+            WHERE r.report_key IN :keys AND {alvo["cond"]}
+        """
+
+    with MySQLSession() as s:
+        diff = s.execute(text(diff_sql).bindparams(*alvo["binds"]), alvo["params"]).mappings().all()
+        if not alvo["preview"] and diff:
+            s.execute(text(apply_sql).bindparams(*alvo["binds"]), alvo["params"])
+            s.commit()
+
+    afetados = sorted({r["user_id"] for r in diff})
+    if not alvo["preview"] and afetados:
+        invalidar_permissoes(afetados)
+
+    return jsonify({
+        "action": acao,
+        "applied": not alvo["preview"],
+        "count": len(diff),
+        "users_affected": afetados,
+        "changes": [{"user_id": r["user_id"], "report_key": r["report_key"]} for r in diff],
+    })
+
+@bp.post("/permissions/grant")
+@require_admin
+def grant_permissions():
+    """
+    Concede relatórios a usuários e/ou papéis num único INSERT ... SELECT.
+    body: { "reports": [keys], "users": [ids], "roles": [nomes], "preview": bool }
+    Com preview=true apenas retorna o diff (pares que seriam criados).
+    """
+    return _aplicar_permissoes("grant")
+
+@bp.post("/permissions/revoke")
+@require_admin
+def revoke_permissions():
+    """
+    Revoga relatórios de usuários e/ou papéis num único DELETE.
+    Mesmo body de /permissions/grant; preview=true retorna só o diff.
+    """
+    return _aplicar_permissoes("revoke")
 
 @bp.patch("/users/<int:user_id>")
 @require_admin
@@ -216,6 +736,9 @@ def update_user(user_id: int):
 
         if updates:
             s.execute(text(f"UPDATE users SET {', '.join(updates)} WHERE id = :uid"), params)
+            if active is not None and int(active) == 0:
+                # desativado: refresh tokens revogados (o acesso atual expira em ACCESS_TOKEN_TTL)
+                revogar_refresh_tokens(s, [user_id])
             s.commit()  # Commit após UPDATE users
 
         # atualiza role (tabela roles/user_roles)
@@ -276,9 +799,10 @@ def admin_reset_password(user_id: int):
         if not row:
             return jsonify({"error": "Usuário não encontrado"}), 404
 
-        # atualiza a senha
+        # atualiza a senha e encerra as sessões existentes
         s.execute(text("UPDATE users SET password_hash = :h WHERE id = :uid"),
                   {"h": pw_hash, "uid": user_id})
+        revogar_refresh_tokens(s, [user_id])
         s.commit()
 
     return jsonify({"ok": True, "user_id": user_id})
@@ -313,9 +837,11 @@ def change_password():
         # gera novo hash
         pw_hash = bcrypt.hashpw(new_password.encode("utf-8"), bcrypt.gensalt(rounds=12)).decode("utf-8")
 
-        # atualiza
+        # atualiza, encerra as outras sessões e emite um novo refresh token para esta
         s.execute(text("UPDATE users SET password_hash = :h WHERE id = :uid"),
                   {"h": pw_hash, "uid": user["id"]})
+        revogar_refresh_tokens(s, [user["id"]])
+        refresh_token = make_refresh_token(s, user["id"])
         s.commit()
 
-    return jsonify({"ok": True, "user_id": u["uid"]})
\ No newline at end of file
+    return jsonify({"ok": True, "user_id": u["uid"], "refresh_token": refresh_token})
\ No newline at end of file
@@ -0,0 +1,133 @@
+# backend/bench_pdf.py — custo por documento da renderização de PDF
+#
+#   python bench_pdf.py [--docs 30] [--linhas 200] [--repeticoes 3] [--orientacao paisagem]
+#
+# Simula o modo=multi (um PDF por subseção) com dados sintéticos e compara:
+# - preparo: o que cada _pdf_from_df refazia antes (getSampleStyleSheet,
+#   estilos, procura da logo, dicionários de colunas, TableStyle) contra o
+#   contexto do processo (pdf_context.contexto() + seleção de colunas);
+# - documentos: _pdf_from_df com o contexto reconstruído a cada documento
+#   (como era) contra o contexto reutilizado (como é). Nas duas rodadas a
+#   moldura já é um form XObject; o ganho de não redesenhar a logo a cada
+#   página não entra nesta diferença (aparece no tamanho e no tempo de PDFs
+#   com muitas páginas).
+# Não acessa banco; precisa de pandas e reportlab.
+import argparse, os, statistics, time
+
+CAMPOS = ["OAB", "Nome", "CPF/CNPJ", "Situacao", "Email", "Subsecao"]
+
+
+def _preparo_legado(orientacao: str):
+    """Reprodução do preparo por documento anterior ao pdf_context."""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import TableStyle
+    from reportlab.lib.units import mm
+
+    page_size = A4 if orientacao == "retrato" else landscape(A4)
+    styles = getSampleStyleSheet()
+    styles.add(ParagraphStyle(name="Tiny", fontSize=8, leading=10))
+    styles.add(ParagraphStyle(name="TitleCenter", parent=styles["Heading1"], alignment=1))
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    candidatos = [
+        os.path.join(base_dir, "static", "logos", "logo_oabms.png"),
+        os.path.join(base_dir, "static", "logos", "logo-oab.png"),
+        os.path.join(base_dir, "static", "logo_oabms.png"),
+        os.path.join(base_dir, "static", "logo-oab.png"),
+    ]
+    next((p for p in candidatos if os.path.exists(p)), None)
+    larguras = (16, 65, 27, 20, 22, 25, 25, 62, 27) if orientacao != "retrato" else (20, 80, 30, 25, 28, 28, 32, 65, 35)
+    nomes = ["OAB", "Nome", "CPF/CNPJ", "Situacao", "DataNascimento", "DataCompromisso", "TelefoneCelular", "Email", "Subsecao"]
+    campo_config = {n: {"col": n, "width": w * mm, "display": n} for n, w in zip(nomes, larguras)}
+    [campo_config[c] for c in CAMPOS]
+    TableStyle([
+        ("BACKGROUND", (0,0), (-1,0), colors.HexColor("#23364B")),
+        ("TEXTCOLOR",  (0,0), (-1,0), colors.white),
+        ("FONTNAME",   (0,0), (-1,0), "Helvetica-Bold"),
+        ("ROWBACKGROUNDS", (0,1), (-1,-1), [colors.whitesmoke, colors.HexColor("#F7F9FC")]),
+        ("GRID", (0,0), (-1,-1), 0.25, colors.HexColor("#B6C2CF")),
+    ])
+    return page_size, styles
+
+
+def _preparo_contexto(orientacao: str, colunas_df):
+    import pdf_context
+    layout = pdf_context.contexto().layout(orientacao)
+    return layout.colunas(CAMPOS, colunas_df)
+
+
+def _limpar_contexto():
+    import pdf_context
+    pdf_context.contexto.cache_clear()
+    pdf_context.caminho_logo.cache_clear()
+    pdf_context._selecao.cache_clear()
+
+
+def _dados(docs: int, linhas: int):
+    import pandas as pd
+    return [
+        pd.DataFrame({
+            "OAB": [f"{i:06d}" for i in range(linhas)],
+            "Nome": [f"Advogado(a) {d}-{i}" for i in range(linhas)],
+            "CPFCNPJ": ["000.000.000-00"] * linhas,
+            "Situacao": ["Regular"] * linhas,
+            "Email": [f"adv{i}@exemplo.com.br" for i in range(linhas)],
+            "Subsecao": [f"Subseção {d}"] * linhas,
+        })
+        for d in range(docs)
+    ]
+
+
+def _medir(fn, repeticoes: int) -> float:
+    """Mediana (s) de `repeticoes` execuções de fn()."""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        fn()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Custo por documento da renderização de PDF")
+    parser.add_argument("--docs", type=int, default=30, help="PDFs por rodada (subseções no modo=multi)")
+    parser.add_argument("--linhas", type=int, default=200, help="linhas por PDF")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--orientacao", choices=["paisagem", "retrato"], default="paisagem")
+    args = parser.parse_args()
+
+    from reports import _pdf_from_df
+
+    dfs = _dados(args.docs, args.linhas)
+    colunas_df = tuple(dfs[0].columns)
+
+    # ---- preparo por documento ----
+    n = 1000
+    _preparo_contexto(args.orientacao, colunas_df)  # monta o contexto fora da medição
+    legado = _medir(lambda: [_preparo_legado(args.orientacao) for _ in range(n)], args.repeticoes) / n
+    reuso = _medir(lambda: [_preparo_contexto(args.orientacao, colunas_df) for _ in range(n)], args.repeticoes) / n
+    print(f"preparo por documento: antes {legado * 1e3:.3f} ms | contexto {reuso * 1e3:.4f} ms")
+
+    # ---- documentos completos ----
+    def rodada(reconstruir: bool):
+        tamanho = 0
+        for i, df in enumerate(dfs):
+            if reconstruir:
+                _limpar_contexto()
+            pdf = _pdf_from_df(df, "Lista Simples", f"Subseção {i}", CAMPOS, args.orientacao)
+            tamanho += len(pdf.getvalue())
+        return tamanho
+
+    rodada(False)  # aquece imports e fontes
+    bytes_total = rodada(False)
+    sem = _medir(lambda: rodada(True), args.repeticoes)
+    com = _medir(lambda: rodada(False), args.repeticoes)
+    print(f"{args.docs} PDFs x {args.linhas} linhas ({bytes_total / 1024:.0f} KiB):")
+    print(f"  contexto reconstruído por documento: {sem:.3f} s ({sem / args.docs * 1e3:.1f} ms/PDF)")
+    print(f"  contexto reutilizado:                {com:.3f} s ({com / args.docs * 1e3:.1f} ms/PDF)")
+    print(f"  economia: {(sem - com) / args.docs * 1e3:.1f} ms/PDF ({(1 - com / sem) * 100:.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+# backend/bootstrap.py
+"""
+/api/bootstrap — dados iniciais do frontend numa única requisição.
+
+Depois do login o frontend chamava /api/auth/me, /api/reports/list,
+/api/reports/subsecoes e /api/mural/: um preflight CORS, uma verificação de
+token e uma ida ao banco por chamada, o que pesa nos links das subseções.
+Aqui o token é verificado uma vez e as seções são montadas em paralelo
+(MySQL e SQL Server ao mesmo tempo), reaproveitando o cache de cada uma
+(permissões, subseções).
+
+Cada seção traz a sua ETag. O cliente informa as que já tem em
+`?have=secao:etag,...` e as seções inalteradas voltam sem `data`
+("nao_modificado": true). A resposta inteira também tem ETag
+(If-None-Match -> 304). Uma seção que falha (ou passa de BOOTSTRAP_TIMEOUT)
+volta com "error", sem derrubar as demais.
+
+"me" sai do próprio token e é montada na thread da requisição. As demais
+vão para o executor do processo, com no máximo BOOTSTRAP_MAX_POR_SECAO
+tarefas em andamento por seção: se o banco de uma seção travar, as tarefas
+presas dela não ocupam as threads das outras; acima do limite a seção volta
+com "error": "ocupado" em vez de entrar na fila.
+"""
+import hashlib, json, logging, os, threading, time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as PrazoEsgotado
+
+from flask import Blueprint, Response, jsonify, request
+
+from auth import require_auth
+import mural, reports
+
+log = logging.getLogger(__name__)
+
+BOOTSTRAP_TIMEOUT = float(os.getenv("BOOTSTRAP_TIMEOUT", "10"))
+# Tarefas simultâneas por seção (o executor tem esse número de threads por seção)
+BOOTSTRAP_MAX_POR_SECAO = int(os.getenv("BOOTSTRAP_MAX_POR_SECAO", "4"))
+
+bp = Blueprint("bootstrap", __name__)
+
+# seção -> função(usuário do token) -> dados (os mesmos dos endpoints individuais)
+SECOES = {
+    "me": lambda u: {"user": u},
+    "reports": lambda u: reports.relatorios_agrupados(u["uid"]),
+    "subsecoes": lambda u: {"items": reports.listar_subsecoes()},
+    "mural": lambda u: mural.avisos_ordenados(),
+}
+# seções sem E/S, montadas na thread da requisição
+_NA_REQUISICAO = {"me"}
+
+_lock = threading.Lock()
+_executor = None
+_executor_pid = None
+_em_andamento = {}  # seção -> futuros ainda não concluídos (deste processo)
+
+
+def _pool() -> ThreadPoolExecutor:
+    """Executor do processo; threads não sobrevivem ao fork dos workers, por isso o pid."""
+    global _executor, _executor_pid
+    if _executor_pid != os.getpid():
+        with _lock:
+            if _executor_pid != os.getpid():
+                no_executor = len(SECOES) - len(_NA_REQUISICAO)
+                _executor = ThreadPoolExecutor(max_workers=max(1, BOOTSTRAP_MAX_POR_SECAO) * no_executor,
+                                               thread_name_prefix="bootstrap")
+                _em_andamento.clear()
+                _executor_pid = os.getpid()
+    return _executor
+
+
+def _submeter(secao: str, usuario):
+    """Agenda a seção no executor; None se ela já tem BOOTSTRAP_MAX_POR_SECAO tarefas em andamento."""
+    pool = _pool()
+    with _lock:
+        ativos = _em_andamento.setdefault(secao, set())
+        if len(ativos) >= max(1, BOOTSTRAP_MAX_POR_SECAO):
+            return None
+        futuro = pool.submit(SECOES[secao], usuario)
+        ativos.add(futuro)
+    futuro.add_done_callback(lambda f: _concluir(secao, f))
+    return futuro
+
+
+def _concluir(secao: str, futuro):
+    with _lock:
+        _em_andamento.get(secao, set()).discard(futuro)
+
+
+def _etag(dados) -> str:
+    bruto = json.dumps(dados, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(bruto.encode("utf-8")).hexdigest()[:16]
+
+
+def _etags_do_cliente(valor: str) -> dict:
+    """`secao:etag,secao:etag` -> {secao: etag}"""
+    conhecidas = {}
+    for item in (valor or "").split(","):
+        secao, _, etag = item.strip().partition(":")
+        if secao and etag:
+            conhecidas[secao] = etag
+    return conhecidas
+
+
+@bp.get("/api/bootstrap")
+@require_auth
+def bootstrap():
+    """
+    Query params:
+      - secoes: subconjunto de me,reports,subsecoes,mural (padrão: todas)
+      - have:   ETags já conhecidas pelo cliente (secao:etag,...)
+    """
+    pedidas = [s.strip() for s in (request.args.get("secoes") or ",".join(SECOES)).split(",") if s.strip()]
+    invalidas = [s for s in pedidas if s not in SECOES]
+    if invalidas:
+        return jsonify({"error": f"Seção inválida: {', '.join(invalidas)}. Use: {', '.join(SECOES)}"}), 400
+    conhecidas = _etags_do_cliente(request.args.get("have"))
+    usuario = request.user
+
+    inicio = time.perf_counter()
+    futuros = {secao: _submeter(secao, usuario) for secao in pedidas if secao not in _NA_REQUISICAO}
+    prazo = time.monotonic() + BOOTSTRAP_TIMEOUT
+
+    secoes = {}
+    for secao in pedidas:
+        futuro = futuros.get(secao)
+        if secao in futuros and futuro is None:
+            log.warning("Seção %s ocupada (%d tarefas em andamento)", secao, BOOTSTRAP_MAX_POR_SECAO)
+            secoes[secao] = {"error": "ocupado"}
+            continue
+        try:
+            if futuro is None:
+                dados = SECOES[secao](usuario)
+            else:
+                dados = futuro.result(timeout=max(0.0, prazo - time.monotonic()))
+        except PrazoEsgotado:
+            secoes[secao] = {"error": "tempo esgotado"}
+            continue
+        except Exception as e:
+            log.exception("Erro na seção %s", secao)
+            secoes[secao] = {"error": f"Erro ao carregar {secao}"}
+            continue
+        etag = _etag(dados)
+        if conhecidas.get(secao) == etag:
+            secoes[secao] = {"etag": etag, "nao_modificado": True}
+        else:
+            secoes[secao] = {"etag": etag, "data": dados}
+
+    etag_geral = _etag({s: v.get("etag") or v.get("error") for s, v in secoes.items()})
+    if request.if_none_match.contains(etag_geral) and not any("error" in v for v in secoes.values()):
+        resp = Response(status=304)
+        resp.set_etag(etag_geral)
+        return resp
+
+    resp = jsonify({"secoes": secoes, "duracao_ms": round((time.perf_counter() - inicio) * 1000, 1)})
+    resp.set_etag(etag_geral)
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
@@ -0,0 +1,165 @@
+# backend/cancellation.py
+"""
+Cancelamento cooperativo e tempo limite por relatório.
+
+Cada geração de relatório recebe um CancelToken com prazo. O token é
+cancelado quando o prazo vence ou quando o cliente desconecta (detectado via
+`waitress.client_disconnected`, disponível com channel_request_lookahead > 0).
+Ao ser cancelado, o token:
+- dispara os callbacks registrados (ex.: pyodbc Cursor.cancel(), que aborta
+  a instrução em execução no SQL Server);
+- faz `token.check()` levantar Cancelado nos laços de busca/renderização.
+"""
+import logging, os, threading, time
+
+log = logging.getLogger(__name__)
+
+REPORT_TIMEOUT_DEFAULT = int(os.getenv("REPORT_TIMEOUT_DEFAULT", "300"))
+
+# Tempo limite (s) por relatório; sobrescreva com REPORT_TIMEOUT_<CHAVE>
+# (ex.: REPORT_TIMEOUT_LISTA_SIMPLES=600)
+REPORT_TIMEOUTS = {
+    "lista_simples": 300,
+    "fin_inadimplencia_resumo": 60,
+    "adm_usuarios": 30,
+}
+
+# Intervalo (s) da verificação de prazos e desconexões
+CANCEL_POLL_INTERVAL = float(os.getenv("CANCEL_POLL_INTERVAL", "0.5"))
+
+
+def timeout_relatorio(report_key: str) -> int:
+    env = os.getenv(f"REPORT_TIMEOUT_{report_key.upper()}")
+    if env:
+        return int(env)
+    return REPORT_TIMEOUTS.get(report_key, REPORT_TIMEOUT_DEFAULT)
+
+
+class Cancelado(Exception):
+    def __init__(self, motivo: str):
+        super().__init__(motivo)
+        self.motivo = motivo  # "timeout" | "desconectado" | "orcamento_cpu" (prewarm)
+
+
+class CancelToken:
+    def __init__(self, timeout: float | None = None):
+        self._evento = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self.prazo = time.monotonic() + timeout if timeout else None
+        self.motivo = None
+
+    @property
+    def cancelado(self) -> bool:
+        if not self._evento.is_set() and self.prazo is not None and time.monotonic() >= self.prazo:
+            self.cancel("timeout")
+        return self._evento.is_set()
+
+    def cancel(self, motivo: str):
+        with self._lock:
+            if self._evento.is_set():
+                return
+            self.motivo = motivo
+            self._evento.set()
+            callbacks = list(self._callbacks)
+        for cb in callbacks:
+            try:
+                cb()
+            except Exception as e:
+                log.warning("Erro ao cancelar: %s", e)
+
+    def check(self):
+        """Levanta Cancelado se o token foi cancelado (ou o prazo venceu)."""
+        if self.cancelado:
+            raise Cancelado(self.motivo)
+
+    def restante(self) -> float | None:
+        if self.prazo is None:
+            return None
+        return max(0.0, self.prazo - time.monotonic())
+
+    def on_cancel(self, cb):
+        """Registra `cb` para o cancelamento; retorna função que desfaz o registro."""
+        with self._lock:
+            if not self._evento.is_set():
+                self._callbacks.append(cb)
+                registrado = True
+            else:
+                registrado = False
+        if not registrado:
+            cb()
+            return lambda: None
+
+        def _remover():
+            with self._lock:
+                if cb in self._callbacks:
+                    self._callbacks.remove(cb)
+        return _remover
+
+
+# -------------------------------------------------------
+#        VIGIA: PRAZOS E CLIENTES DESCONECTADOS
+# -------------------------------------------------------
+class _Vigia:
+    """Thread única que verifica periodicamente os tokens em andamento."""
+
+    def __init__(self, intervalo: float):
+        self.intervalo = intervalo
+        self._lock = threading.Lock()
+        self._itens = {}
+        self._thread = None
+
+    def _garantir_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._loop, name="cancel-watchdog", daemon=True)
+            self._thread.start()
+
+    def registrar(self, token: CancelToken, desconectado=None):
+        with self._lock:
+            self._itens[id(token)] = (token, desconectado)
+            self._garantir_thread()
+
+    def remover(self, token: CancelToken):
+        with self._lock:
+            self._itens.pop(id(token), None)
+
+    def _loop(self):
+        while True:
+            time.sleep(self.intervalo)
+            with self._lock:
+                itens = list(self._itens.values())
+            for token, desconectado in itens:
+                if token.cancelado:  # também dispara o timeout
+                    continue
+                try:
+                    if desconectado is not None and desconectado():
+                        token.cancel("desconectado")
+                except Exception:
+                    pass
+
+
+_vigia = _Vigia(CANCEL_POLL_INTERVAL)
+
+
+class monitorar:
+    """
+    Context manager que acompanha um token enquanto a requisição é atendida.
+    `desconectado()` deve retornar True quando o trabalho puder ser abandonado.
+    """
+
+    def __init__(self, token: CancelToken, desconectado=None):
+        self.token = token
+        self.desconectado = desconectado
+
+    def __enter__(self):
+        _vigia.registrar(self.token, self.desconectado)
+        return self.token
+
+    def __exit__(self, *exc):
+        _vigia.remover(self.token)
+        return False
+
+
+def cliente_desconectado(environ):
+    """Função de detecção de desconexão do servidor WSGI (None se indisponível)."""
+    return environ.get("waitress.client_disconnected")
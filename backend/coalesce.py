@@ -0,0 +1,233 @@
+# backend/coalesce.py
+"""
+Coalescência ("single-flight") de requisições idênticas e concorrentes.
+
+Quando várias pessoas pedem o mesmo relatório com os mesmos parâmetros ao
+mesmo tempo, apenas a primeira requisição (a "líder") executa a consulta e a
+renderização; as demais aguardam e recebem o mesmo resultado.
+
+Modos (variável de ambiente COALESCE_MODE):
+- "process" (padrão): coalescência entre threads do mesmo processo.
+- "file": além do processo, usa lock em arquivo para coalescer entre workers
+  (gunicorn/waitress com vários processos na mesma máquina). O resultado da
+  líder é gravado em disco para que os outros processos o reaproveitem.
+  O diretório (COALESCE_DIR) precisa ser privado do usuário do processo
+  (private_dir.py); se não for, o modo cai para a coalescência por processo.
+- "off": desativa (cada requisição executa sozinha).
+"""
+import hashlib, json, logging, os, pickle, tempfile, threading, time
+from contextlib import contextmanager
+
+import private_dir
+
+log = logging.getLogger(__name__)
+
+COALESCE_MODE = os.getenv("COALESCE_MODE", "process").strip().lower()
+COALESCE_DIR = os.getenv("COALESCE_DIR") or os.path.join(tempfile.gettempdir(), "relatorios_coalesce")
+# Resultados gravados em disco só servem para quem já estava esperando;
+# depois desse tempo (segundos) são apagados.
+COALESCE_RESULT_TTL = int(os.getenv("COALESCE_RESULT_TTL", "120"))
+
+
+def chave_normalizada(namespace: str, params: dict) -> str:
+    """Gera uma chave estável (sha1) para um conjunto de parâmetros já normalizados."""
+    bruto = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+    return f"{namespace}-" + hashlib.sha1(bruto.encode("utf-8")).hexdigest()
+
+
+# -------------------------------------------------------
+#                 COALESCÊNCIA POR PROCESSO
+# -------------------------------------------------------
+class _Voo:
+    __slots__ = ("evento", "resultado", "erro", "seguidores")
+
+    def __init__(self):
+        self.evento = threading.Event()
+        self.resultado = None
+        self.erro = None
+        self.seguidores = 0
+
+
+class SingleFlight:
+    """Executa `fn` uma única vez por chave enquanto houver uma execução em andamento."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._voos = {}
+        self.stats = {"lideres": 0, "coalescidas": 0}
+
+    def seguidores(self, chave: str) -> int:
+        """Quantas requisições aguardam a execução em andamento desta chave."""
+        with self._lock:
+            voo = self._voos.get(chave)
+            return voo.seguidores if voo else 0
+
+    def do(self, chave: str, fn):
+        """
+        Retorna (resultado, compartilhado). `compartilhado` é True quando o
+        resultado veio de uma execução iniciada por outra requisição.
+        Exceções da líder são repassadas a todas as requisições em espera.
+        """
+        with self._lock:
+            voo = self._voos.get(chave)
+            lider = voo is None
+            if lider:
+                voo = _Voo()
+                self._voos[chave] = voo
+                self.stats["lideres"] += 1
+            else:
+                voo.seguidores += 1
+                self.stats["coalescidas"] += 1
+
+        if not lider:
+            voo.evento.wait()
+            if voo.erro is not None:
+                raise voo.erro
+            return voo.resultado, True
+
+        try:
+            voo.resultado = fn()
+        except BaseException as e:
+            voo.erro = e
+            raise
+        finally:
+            with self._lock:
+                self._voos.pop(chave, None)
+            voo.evento.set()
+        return voo.resultado, False
+
+
+# -------------------------------------------------------
+#           COALESCÊNCIA ENTRE PROCESSOS (ARQUIVO)
+# -------------------------------------------------------
+@contextmanager
+def file_lock(path: str, bloqueante: bool = True):
+    """
+    Lock exclusivo em arquivo (fcntl no Linux, msvcrt no Windows).
+    Com bloqueante=False levanta BlockingIOError se outro processo já o detém.
+    """
+    fh = open(path, "a+b")
+    try:
+        if os.name == "nt":
+            import msvcrt
+            fh.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(fh.fileno(), msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    if not bloqueante:
+                        raise BlockingIOError(path)
+                    time.sleep(0.05)
+            try:
+                yield
+            finally:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX | (0 if bloqueante else fcntl.LOCK_NB))
+            try:
+                yield
+            finally:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+    finally:
+        fh.close()
+
+
+class FileLockSingleFlight:
+    """
+    Variante entre processos: threads do mesmo processo são coalescidas em
+    memória e, entre processos, um lock em arquivo garante que só um worker
+    calcula. Quem esperou pelo lock reaproveita o resultado gravado pela líder
+    desde que ele tenha sido produzido depois da sua chegada.
+    """
+
+    def __init__(self, diretorio: str = COALESCE_DIR, ttl: int = COALESCE_RESULT_TTL):
+        self.diretorio = diretorio
+        self.ttl = ttl
+        self._local = SingleFlight()
+        self.stats = self._local.stats
+
+    def seguidores(self, chave: str) -> int:
+        # só enxerga as requisições deste processo
+        return self._local.seguidores(chave)
+
+    def do(self, chave: str, fn):
+        chegada = time.time()
+        origem = {"compartilhado": False}
+
+        def _executar():
+            resultado, compartilhado = self._do_arquivo(chave, fn, chegada)
+            origem["compartilhado"] = compartilhado
+            return resultado
+
+        resultado, compartilhado_local = self._local.do(chave, _executar)
+        return resultado, compartilhado_local or origem["compartilhado"]
+
+    def _do_arquivo(self, chave: str, fn, chegada: float):
+        try:
+            # a cada uso: o diretório pode ter sido apagado (limpeza do /tmp) e recriado por outro usuário
+            private_dir.garantir(self.diretorio)
+        except OSError as e:
+            log.warning("Coalescência entre processos desativada nesta chamada -> %s", e)
+            return fn(), False
+        lock_path = os.path.join(self.diretorio, f"{chave}.lock")
+        result_path = os.path.join(self.diretorio, f"{chave}.pkl")
+
+        with file_lock(lock_path):
+            try:
+                if os.path.getmtime(result_path) >= chegada:
+                    with open(result_path, "rb") as fh:
+                        self.stats["coalescidas"] += 1
+                        return pickle.load(fh), True
+            except (OSError, EOFError, pickle.UnpicklingError):
+                pass
+
+            resultado = fn()
+            tmp = f"{result_path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as fh:
+                pickle.dump(resultado, fh, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, result_path)
+
+        self._limpar_antigos()
+        return resultado, False
+
+    def _limpar_antigos(self):
+        """Remove resultados gravados há mais de `ttl` segundos."""
+        limite = time.time() - self.ttl
+        try:
+            nomes = os.listdir(self.diretorio)
+        except OSError:
+            return
+        for nome in nomes:
+            if not nome.endswith(".pkl"):
+                continue
+            path = os.path.join(self.diretorio, nome)
+            try:
+                if os.path.getmtime(path) < limite:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+class _SemCoalescencia:
+    stats = {"lideres": 0, "coalescidas": 0}
+
+    def seguidores(self, chave: str) -> int:
+        return 0
+
+    def do(self, chave: str, fn):
+        return fn(), False
+
+
+def criar_single_flight(modo: str = COALESCE_MODE):
+    if modo == "off":
+        return _SemCoalescencia()
+    if modo == "file":
+        return FileLockSingleFlight()
+    return SingleFlight()
+
+
+# Instância compartilhada pelos blueprints
+single_flight = criar_single_flight()
@@ -0,0 +1,147 @@
+# backend/compression.py
+"""
+Compressão negociada (Accept-Encoding) das respostas textuais.
+
+- JSON, CSV e outros tipos texto acima de COMPRESS_MIN_SIZE bytes.
+- Algoritmos em ordem de preferência do servidor (COMPRESS_ALGORITHMS),
+  limitados aos que o cliente aceita: zstd, br (brotli) e gzip.
+  brotli/zstandard são opcionais; sem eles fica só o gzip.
+- Respostas em streaming (geradores, send_file) são comprimidas em fluxo.
+- PDF, ZIP e XLSX já são comprimidos e nunca passam por aqui.
+"""
+import os, zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESS_MIMETYPES = {
+    "application/json",
+    "text/csv",
+    "text/plain",
+    "text/html",
+    "text/css",
+    "application/javascript",
+    "application/xml",
+}
+
+DEFAULTS = {
+    "COMPRESS_ALGORITHMS": os.getenv("COMPRESS_ALGORITHMS", "zstd,br,gzip"),
+    "COMPRESS_MIN_SIZE": int(os.getenv("COMPRESS_MIN_SIZE", "1024")),
+    # Nível único aplicado a todos os algoritmos (vazio = padrão de cada um)
+    "COMPRESS_LEVEL": os.getenv("COMPRESS_LEVEL", ""),
+}
+
+# Níveis padrão: bom equilíbrio entre CPU e tamanho para respostas dinâmicas
+_NIVEL_PADRAO = {"gzip": 6, "br": 5, "zstd": 3}
+
+
+def _disponivel(alg: str) -> bool:
+    if alg == "br":
+        return brotli is not None
+    if alg == "zstd":
+        return zstandard is not None
+    return alg == "gzip"
+
+
+class _Compressor:
+    def __init__(self, alg: str, nivel: int):
+        self.alg = alg
+        if alg == "gzip":
+            self._c = zlib.compressobj(nivel, zlib.DEFLATED, 31)  # 31 = cabeçalho gzip
+        elif alg == "br":
+            self._c = brotli.Compressor(quality=nivel)
+        else:
+            self._c = zstandard.ZstdCompressor(level=nivel).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        if self.alg == "br":
+            return self._c.process(data)
+        return self._c.compress(data)
+
+    def flush(self) -> bytes:
+        if self.alg == "br":
+            return self._c.finish()
+        return self._c.flush()
+
+
+def _comprimir_stream(iteravel, comp: _Compressor):
+    try:
+        for chunk in iteravel:
+            if not chunk:
+                continue
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            saida = comp.compress(chunk)
+            if saida:
+                yield saida
+        yield comp.flush()
+    finally:
+        if hasattr(iteravel, "close"):
+            iteravel.close()
+
+
+def escolher_algoritmo(accept_encodings, preferencia: list) -> str | None:
+    """Primeiro algoritmo da preferência do servidor que o cliente aceita (q > 0)."""
+    for alg in preferencia:
+        if _disponivel(alg) and accept_encodings[alg] > 0:
+            return alg
+    return None
+
+
+def init_compression(app):
+    preferencia = [a.strip() for a in str(app.config.get("COMPRESS_ALGORITHMS", DEFAULTS["COMPRESS_ALGORITHMS"])).split(",") if a.strip()]
+    min_size = int(app.config.get("COMPRESS_MIN_SIZE", DEFAULTS["COMPRESS_MIN_SIZE"]))
+    nivel_cfg = str(app.config.get("COMPRESS_LEVEL", DEFAULTS["COMPRESS_LEVEL"]) or "")
+
+    def _nivel(alg: str) -> int:
+        return int(nivel_cfg) if nivel_cfg else _NIVEL_PADRAO[alg]
+
+    from flask import request
+
+    @app.after_request
+    def _comprimir(response):
+        if (
+            request.method == "HEAD"
+            or response.status_code != 200
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESS_MIMETYPES
+            or "no-transform" in (response.headers.get("Cache-Control") or "")
+        ):
+            return response
+
+        alg = escolher_algoritmo(request.accept_encodings, preferencia)
+        if alg is None:
+            return response
+
+        tamanho = response.content_length
+        if tamanho is not None and tamanho < min_size:
+            return response
+
+        comp = _Compressor(alg, _nivel(alg))
+        if response.direct_passthrough or response.is_streamed:
+            # Corpo em streaming: comprime em fluxo, sem Content-Length
+            response.response = _comprimir_stream(response.response, comp)
+            response.direct_passthrough = False
+            response.headers.pop("Content-Length", None)
+        else:
+            dados = response.get_data()
+            if len(dados) < min_size:
+                return response
+            response.set_data(comp.compress(dados) + comp.flush())
+
+        response.headers["Content-Encoding"] = alg
+        response.vary.add("Accept-Encoding")
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            # A representação mudou: o ETag forte deixa de valer byte a byte
+            response.set_etag(etag, weak=True)
+        return response
+
+    return app
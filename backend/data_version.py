@@ -0,0 +1,191 @@
+# backend/data_version.py
+"""
+Versão dos dados de Pessoa por subseção, para invalidar caches.
+
+Uma consulta leve no SQL Server devolve, por subseção, COUNT e
+CHECKSUM_AGG(BINARY_CHECKSUM(...)) das colunas usadas pelos relatórios,
+combinado com o nome da subseção e o checksum da tabela Situacao: renomear
+uma subseção ou uma situação também muda a assinatura.
+O resultado fica memorizado por DATA_VERSION_TTL segundos (uma única
+consulta por vez, mesmo com várias requisições simultâneas).
+
+`versao_subsecoes(subsecao)` transforma as assinaturas das subseções
+atingidas pelo filtro em um token curto. Incluído na chave do cache, faz a
+entrada valer exatamente até alguma linha daquela(s) subseção(ões) mudar.
+Quando os dados vêm do snapshot local, o token é a versão do snapshot.
+
+Os relatórios registram aqui a função de versão de cada namespace
+(`registrar`); `chave_cache()` é usada pelo pipeline e pelo pré-aquecimento.
+"""
+import hashlib, logging, os, threading, time
+
+from cancellation import CancelToken
+from db import mssql_query
+
+log = logging.getLogger(__name__)
+
+DATA_VERSION_TTL = float(os.getenv("DATA_VERSION_TTL", "30"))
+DATA_VERSION_TIMEOUT = int(os.getenv("DATA_VERSION_TIMEOUT", "10"))
+
+_SQL_ASSINATURAS = """
+    SELECT p.SubUnidadeAtual AS sub_id,
+           suc.NomeSubUnidade AS subsecao,
+           COUNT_BIG(*) AS linhas,
+           BINARY_CHECKSUM(
+               CHECKSUM_AGG(BINARY_CHECKSUM(
+                   p.ID, p.RegistroConselhoAtual, p.Nome, p.CPFCNPJ, p.SituacaoAtual, p.TipoCategoria,
+                   p.DataNascimentoFundacao, p.DataCompromisso, p.TelefoneCelular,
+                   p.EmailCorreio, p.EmailComercial
+               )),
+               suc.NomeSubUnidade,
+               sit.situacoes
+           ) AS assinatura
+    FROM Pessoa p
+    LEFT JOIN SubUnidadeConselho suc ON p.SubUnidadeAtual = suc.ID
+    CROSS JOIN (SELECT CHECKSUM_AGG(BINARY_CHECKSUM(ID, Descricao)) AS situacoes FROM Situacao) sit
+    GROUP BY p.SubUnidadeAtual, suc.NomeSubUnidade, sit.situacoes
+"""
+
+_SQL_SUBSECOES_LIKE = "SELECT ID AS sub_id FROM SubUnidadeConselho WHERE NomeSubUnidade LIKE :sub"
+
+# Padrões de subseção distintos memorizados (filtro livre do usuário)
+_MAX_FILTROS = 256
+
+_lock = threading.Lock()
+_memo = {"em": 0.0, "assinaturas": None}
+_filtros = {}  # subsecao_like -> (monotonic, frozenset de sub_id)
+_filtros_lock = threading.Lock()
+_stats = {"consultas": 0, "memorizadas": 0, "falhas": 0, "ultima_duracao_ms": None}
+
+
+def assinaturas(max_idade: float = DATA_VERSION_TTL) -> list | None:
+    """
+    [{sub_id, subsecao, linhas, assinatura}, ...] de no máximo `max_idade`
+    segundos atrás. None se a consulta falhar.
+    """
+    if _memo["assinaturas"] is not None and time.monotonic() - _memo["em"] < max_idade:
+        _stats["memorizadas"] += 1
+        return _memo["assinaturas"]
+    with _lock:
+        # outra thread pode ter atualizado enquanto esperávamos o lock
+        if _memo["assinaturas"] is not None and time.monotonic() - _memo["em"] < max_idade:
+            _stats["memorizadas"] += 1
+            return _memo["assinaturas"]
+        inicio = time.perf_counter()
+        try:
+            rows = mssql_query(_SQL_ASSINATURAS, token=CancelToken(DATA_VERSION_TIMEOUT))
+        except Exception as e:  # inclui Cancelado (prazo da sonda)
+            _stats["falhas"] += 1
+            log.warning("Sonda de versão falhou -> %s", e)
+            return None
+        _memo["assinaturas"] = [
+            {"sub_id": r["sub_id"], "subsecao": r["subsecao"], "linhas": int(r["linhas"]), "assinatura": r["assinatura"]}
+            for r in rows
+        ]
+        _memo["em"] = time.monotonic()
+        _stats["consultas"] += 1
+        _stats["ultima_duracao_ms"] = round((time.perf_counter() - inicio) * 1000, 1)
+        return _memo["assinaturas"]
+
+
+def _token(partes: list) -> str:
+    bruto = "|".join(f"{p['sub_id']}:{p['linhas']}:{p['assinatura']}" for p in partes)
+    return hashlib.sha1(bruto.encode("utf-8")).hexdigest()[:16]
+
+
+def _sub_ids(subsecao_like: str) -> frozenset | None:
+    """
+    IDs das subseções atingidas pelo filtro, resolvidos pelo próprio SQL
+    Server com o mesmo predicado da lista simples (LIKE '%...%'): a collation
+    CI/AI e os curingas % e _ valem igual aos da consulta. Memorizado por
+    DATA_VERSION_TTL segundos; None se a consulta falhar.
+    """
+    agora = time.monotonic()
+    memo = _filtros.get(subsecao_like)
+    if memo is not None and agora - memo[0] < DATA_VERSION_TTL:
+        return memo[1]
+    try:
+        rows = mssql_query(_SQL_SUBSECOES_LIKE, {"sub": f"%{subsecao_like}%"},
+                           token=CancelToken(DATA_VERSION_TIMEOUT))
+    except Exception as e:
+        log.warning("Subseções do filtro %r indisponíveis -> %s", subsecao_like, e)
+        return None
+    ids = frozenset(r["sub_id"] for r in rows)
+    with _filtros_lock:
+        if len(_filtros) >= _MAX_FILTROS:
+            _filtros.clear()
+        _filtros[subsecao_like] = (agora, ids)
+    return ids
+
+
+def versao_subsecoes(subsecao_like: str | None) -> str | None:
+    """
+    Token das subseções atingidas pelo filtro `subsecao_like` (todas, se
+    vazio). None quando não há versão confiável (sonda indisponível ou filtro
+    sem nenhuma subseção): o resultado então não é versionado.
+    """
+    todas = assinaturas()
+    if todas is None:
+        return None
+    if subsecao_like:
+        ids = _sub_ids(subsecao_like)
+        if not ids:
+            return None
+        todas = [a for a in todas if a["sub_id"] in ids]
+        if not todas:
+            return None
+    return _token(sorted(todas, key=lambda a: (a["sub_id"] is None, a["sub_id"] or 0)))
+
+
+def linhas_subsecoes(subsecao_like: str | None) -> int | None:
+    """
+    Soma de `linhas` das subseções do filtro, só com o que já está
+    memorizado (não consulta o SQL Server; qualquer idade). Conta toda a
+    Pessoa da subseção, então é um limite superior da lista simples.
+    None se ainda não houver sonda ou o filtro ainda não tiver sido resolvido.
+    """
+    todas = _memo["assinaturas"]
+    if todas is None:
+        return None
+    if subsecao_like:
+        memo = _filtros.get(subsecao_like)
+        if memo is None:
+            return None
+        todas = [a for a in todas if a["sub_id"] in memo[1]]
+    return sum(a["linhas"] for a in todas)
+
+
+# -------------------------------------------------------
+#            VERSÃO POR NAMESPACE / CHAVE DE CACHE
+# -------------------------------------------------------
+_versionadores = {}  # namespace -> função(params) -> str | None
+
+
+def registrar(namespace: str, fn):
+    _versionadores[namespace] = fn
+
+
+def versao(namespace: str, params: dict) -> str | None:
+    fn = _versionadores.get(namespace)
+    if fn is None:
+        return None
+    try:
+        return fn(params)
+    except Exception as e:
+        log.warning("Versão de %s indisponível -> %s", namespace, e)
+        return None
+
+
+def chave_cache(namespace: str, chave: str, params: dict):
+    """Retorna (chave_versionada, versao). Sem versão, a chave fica como está."""
+    v = versao(namespace, params)
+    return (f"{chave}-v{v}" if v else chave), v
+
+
+def metricas() -> dict:
+    return {
+        **_stats,
+        "ttl_s": DATA_VERSION_TTL,
+        "idade_s": round(time.monotonic() - _memo["em"], 1) if _memo["assinaturas"] is not None else None,
+        "subsecoes": len(_memo["assinaturas"] or []),
+    }
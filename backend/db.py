@@ -1,9 +1,12 @@
+import math
 import urllib.parse
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, text, event
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
 import os
 
+from cancellation import Cancelado
+
 load_dotenv()
 
 # =========================
@@ -20,7 +23,18 @@ _mysql_url = (
     f"{urllib.parse.quote_plus(MYSQL_PW)}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DB}"
 )
 
-mysql_engine = create_engine(_mysql_url, pool_pre_ping=True)
+# Pool por processo: dimensione para o nº de threads do servidor (WEB_THREADS)
+MYSQL_POOL_SIZE     = int(os.getenv("MYSQL_POOL_SIZE", "5"))
+MYSQL_MAX_OVERFLOW  = int(os.getenv("MYSQL_MAX_OVERFLOW", "10"))
+MYSQL_POOL_RECYCLE  = int(os.getenv("MYSQL_POOL_RECYCLE", "1800"))
+
+mysql_engine = create_engine(
+    _mysql_url,
+    pool_pre_ping=True,
+    pool_size=MYSQL_POOL_SIZE,
+    max_overflow=MYSQL_MAX_OVERFLOW,
+    pool_recycle=MYSQL_POOL_RECYCLE,
+)
 MySQLSession = sessionmaker(bind=mysql_engine, autoflush=False, autocommit=False)
 
 def ping_mysql():
@@ -36,6 +50,9 @@ def ping_mysql():
 # SQL Server (dados dos relatórios)
 # =========================
 MSSQL_DSN = os.getenv("MSSQL_DSN", "").strip()
+MSSQL_POOL_SIZE     = int(os.getenv("MSSQL_POOL_SIZE", "5"))
+MSSQL_MAX_OVERFLOW  = int(os.getenv("MSSQL_MAX_OVERFLOW", "5"))
+MSSQL_POOL_RECYCLE  = int(os.getenv("MSSQL_POOL_RECYCLE", "1800"))
 
 _mssql_url = None
 mssql_engine = None
@@ -46,7 +63,13 @@ if MSSQL_DSN:
     try:
         # urlencode completo do DSN para o dialect pyodbc
         _mssql_url = f"mssql+pyodbc:///?odbc_connect={urllib.parse.quote_plus(MSSQL_DSN)}"
-        mssql_engine = create_engine(_mssql_url, pool_pre_ping=True)
+        mssql_engine = create_engine(
+            _mssql_url,
+            pool_pre_ping=True,
+            pool_size=MSSQL_POOL_SIZE,
+            max_overflow=MSSQL_MAX_OVERFLOW,
+            pool_recycle=MSSQL_POOL_RECYCLE,
+        )
         MSSQLSession = sessionmaker(bind=mssql_engine, autoflush=False, autocommit=False)
     except Exception as e:
         # Não derruba o app caso o SQL Server esteja inacessível agora
@@ -54,6 +77,65 @@ if MSSQL_DSN:
         mssql_engine = None
         MSSQLSession = None
 
+# Cancelamento: o cursor pyodbc de cada execução é ligado ao CancelToken da
+# conexão (conn.info["cancel_token"]), para que Cursor.cancel() aborte a
+# instrução no servidor quando o cliente desconecta ou o prazo vence.
+def _ligar_cursor_ao_token(conn, cursor, statement, parameters, context, executemany):
+    token = conn.info.get("cancel_token")
+    if token is not None and hasattr(cursor, "cancel"):
+        conn.info["cancel_unregister"] = token.on_cancel(cursor.cancel)
+
+if mssql_engine is not None:
+    event.listen(mssql_engine, "before_cursor_execute", _ligar_cursor_ao_token)
+
+MSSQL_FETCH_CHUNK = int(os.getenv("MSSQL_FETCH_CHUNK", "5000"))
+
+def mssql_query(sql: str, params: dict | None = None, token=None, chunk: int = MSSQL_FETCH_CHUNK) -> list:
+    """
+    Executa uma consulta no SQL Server e retorna as linhas (mappings).
+    Com `token`, aplica o tempo restante como timeout da instrução ODBC,
+    cancela o cursor se o token for cancelado e verifica o token entre os
+    blocos de `chunk` linhas. Levanta Cancelado nesses casos.
+    """
+    if mssql_engine is None:
+        raise RuntimeError(_mssql_engine_error or "Engine MSSQL não inicializado")
+    with mssql_engine.connect() as c:
+        raw = c.connection
+        dbapi = getattr(raw, "dbapi_connection", None) or raw.connection
+        if token is not None:
+            c.info["cancel_token"] = token
+            restante = token.restante()
+            if restante is not None:
+                # pyodbc: SQL_ATTR_QUERY_TIMEOUT das próximas instruções
+                dbapi.timeout = max(1, math.ceil(restante))
+        try:
+            result = c.execute(text(sql), params or {}).mappings()
+            rows = []
+            while True:
+                if token is not None:
+                    token.check()
+                parte = result.fetchmany(chunk)
+                if not parte:
+                    break
+                rows.extend(parte)
+            return rows
+        except Cancelado:
+            c.invalidate()
+            raise
+        except Exception as e:
+            if token is not None and token.cancelado:
+                # instrução abortada pelo cancelamento/timeout: conexão não volta ao pool
+                c.invalidate()
+                raise Cancelado(token.motivo) from e
+            raise
+        finally:
+            c.info.pop("cancel_token", None)
+            desfazer = c.info.pop("cancel_unregister", None)
+            if desfazer:
+                desfazer()
+            if token is not None and not c.invalidated:
+                dbapi.timeout = 0
+
 def ping_mssql():
     """
     Retorna dict com diagnóstico do SQL Server.
@@ -71,6 +153,15 @@ def ping_mssql():
     except Exception as e:
         return {"ok": False, "error": str(e)}
 
+def dispose_engines():
+    """
+    Descarta as conexões herdadas do processo pai. Deve ser chamado no worker
+    logo após o fork (gunicorn --preload), para que cada processo abra as suas.
+    """
+    mysql_engine.dispose(close=False)
+    if mssql_engine is not None:
+        mssql_engine.dispose(close=False)
+
 # Helpers opcionais (úteis para relatórios)
 def mssql_scalar(sql: str):
     """Executa uma query que retorna apenas um escalar."""
@@ -0,0 +1,228 @@
+# backend/download_spool.py
+"""
+Exportações grandes em arquivo temporário, baixadas por uma URL assinada.
+
+Até aqui todo arquivo voltava de um BytesIO: sem Content-Length antes do
+fim, sem retomada e sem o caminho sendfile do sistema operacional. Quando um
+ZIP de centenas de MB caía no meio (links instáveis das subseções), o
+usuário precisava gerar tudo de novo.
+
+Acima de DOWNLOAD_SPOOL_THRESHOLD_MB o resultado é gravado em
+DOWNLOAD_SPOOL_DIR (visível para todos os workers; privado do usuário do
+processo, ver private_dir.py) e a requisição recebe uma URL
+/api/reports/download/<token>:
+- o arquivo é nomeado pelo sha256 do conteúdo: o mesmo relatório pedido de
+  novo (ex.: resultado do cache) reaproveita o arquivo já gravado, que só
+  tem a validade renovada, em vez de gravar outra cópia;
+- o token é assinado com SECRET_KEY (itsdangerous, como os tokens do
+  auth.py) e vale DOWNLOAD_URL_TTL segundos; a URL dispensa o cabeçalho
+  Authorization, para o navegador baixar (e retomar) sozinho;
+- o arquivo é servido por caminho (send_file conditional): Content-Length,
+  Range/If-Range (206), ETag/If-None-Match e Last-Modified (304) e
+  wsgi.file_wrapper (sendfile no gunicorn);
+- uma thread de limpeza remove os arquivos vencidos.
+
+Limite: só a entrega é em fluxo. A renderização continua produzindo o
+arquivo inteiro em memória (bytes), porque é esse resultado que o cache de
+saída e a coalescência compartilham; `gravar` apenas o copia para o disco.
+O pico de memória da geração não muda; o que sai da memória é a resposta
+(antes um BytesIO por requisição enquanto durava a transferência).
+
+Atenção (LGPD): a URL é uma credencial ao portador. Quem a tiver baixa o
+arquivo, com dados pessoais, sem login até ela vencer; nada no disco ou no
+token identifica o usuário (quem gerou fica na auditoria, audit.py). Por
+isso a validade é curta e a URL não deve ser compartilhada nem registrada
+em logs de proxy.
+"""
+import hashlib, json, logging, os, tempfile, threading, time
+
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+
+import private_dir
+from auth import SECRET_KEY
+
+log = logging.getLogger(__name__)
+
+# Tamanho (MB) a partir do qual a exportação vai para disco e é entregue por URL; 0 = nunca
+DOWNLOAD_SPOOL_THRESHOLD_MB = float(os.getenv("DOWNLOAD_SPOOL_THRESHOLD_MB", "20"))
+DOWNLOAD_SPOOL_DIR = os.getenv("DOWNLOAD_SPOOL_DIR") or os.path.join(tempfile.gettempdir(), "relatorios_downloads")
+# Validade (s) da URL; o arquivo sai na limpeza seguinte ao vencimento
+DOWNLOAD_URL_TTL = int(os.getenv("DOWNLOAD_URL_TTL", "900"))
+DOWNLOAD_SPOOL_CLEAN_INTERVAL = int(os.getenv("DOWNLOAD_SPOOL_CLEAN_INTERVAL", "60"))
+
+# Folga antes de remover um arquivo vencido: transferências em curso terminam
+_FOLGA_REMOCAO = 300
+
+_serializer = URLSafeTimedSerializer(SECRET_KEY, salt="download")
+
+_lock = threading.Lock()
+_stats = {"gravados": 0, "bytes_gravados": 0, "reaproveitados": 0, "downloads": 0, "recusados": 0, "removidos": 0}
+_thread_pid = None
+
+
+class DownloadIndisponivel(Exception):
+    def __init__(self, motivo: str):
+        super().__init__(motivo)
+        self.motivo = motivo  # "invalido" | "expirado"
+
+
+def deve_gravar(tamanho: int) -> bool:
+    return DOWNLOAD_SPOOL_THRESHOLD_MB > 0 and tamanho >= DOWNLOAD_SPOOL_THRESHOLD_MB * 2**20
+
+
+def _caminhos(id_: str) -> tuple:
+    base = os.path.join(DOWNLOAD_SPOOL_DIR, id_)
+    return f"{base}.bin", f"{base}.json"
+
+
+def gravar(conteudo: bytes, download_name: str, mimetype: str, dados_em: str | None = None) -> dict:
+    """
+    Grava o arquivo (ou reaproveita o de mesmo conteúdo) e devolve
+    {"token", "expira_em", "tamanho"}. Nome, tipo e data dos dados vão no
+    token: o mesmo arquivo pode ser baixado com nomes diferentes.
+    Grava em .tmp e renomeia: um download nunca vê o arquivo pela metade.
+    """
+    _garantir_thread()
+    private_dir.garantir(DOWNLOAD_SPOOL_DIR)
+    id_ = hashlib.sha256(conteudo).hexdigest()
+    dados, meta = _caminhos(id_)
+    if _renovar(dados, meta):
+        with _lock:
+            _stats["reaproveitados"] += 1
+    else:
+        # .json por último: é ele que marca o arquivo como completo (e a validade)
+        for destino, bruto in (
+            (dados, conteudo),
+            (meta, json.dumps({"criado_em": time.time()}).encode("utf-8")),
+        ):
+            tmp = f"{destino}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(bruto)
+            os.replace(tmp, destino)
+        with _lock:
+            _stats["gravados"] += 1
+            _stats["bytes_gravados"] += len(conteudo)
+
+    return {
+        "token": _serializer.dumps({"id": id_, "nome": download_name, "tipo": mimetype, "dados_em": dados_em}),
+        "expira_em": int(time.time()) + DOWNLOAD_URL_TTL,
+        "tamanho": len(conteudo),
+    }
+
+
+def _renovar(dados: str, meta: str) -> bool:
+    """
+    Se o arquivo já existe, renova a validade (mtime do .json; o .bin fica
+    intacto, então ETag/Last-Modified e as retomadas em curso continuam valendo).
+    """
+    if not os.path.exists(dados):
+        return False
+    try:
+        os.utime(meta)
+        return os.path.exists(dados)  # a limpeza pode ter passado entre as duas chamadas
+    except OSError:
+        return False
+
+
+def abrir(token: str) -> tuple:
+    """(caminho do arquivo, {download_name, mimetype, dados_em, criado_em}) ou DownloadIndisponivel."""
+    _garantir_thread()
+    try:
+        dados_token = _serializer.loads(token, max_age=DOWNLOAD_URL_TTL)
+    except SignatureExpired:
+        _recusar()
+        raise DownloadIndisponivel("expirado")
+    except BadSignature:
+        _recusar()
+        raise DownloadIndisponivel("invalido")
+
+    try:
+        private_dir.garantir(DOWNLOAD_SPOOL_DIR)
+        path, meta_path = _caminhos(dados_token["id"])
+        with open(meta_path, encoding="utf-8") as f:
+            criado_em = json.load(f)["criado_em"]
+    except (OSError, ValueError, KeyError):
+        # já removido pela limpeza (ou diretório inseguro)
+        _recusar()
+        raise DownloadIndisponivel("expirado")
+    if not os.path.exists(path):
+        _recusar()
+        raise DownloadIndisponivel("expirado")
+    with _lock:
+        _stats["downloads"] += 1
+    return path, {
+        "download_name": dados_token["nome"],
+        "mimetype": dados_token["tipo"],
+        "dados_em": dados_token.get("dados_em"),
+        "criado_em": criado_em,
+    }
+
+
+def _recusar():
+    with _lock:
+        _stats["recusados"] += 1
+
+
+def limpar() -> int:
+    """
+    Remove os arquivos cuja validade (mtime do .json) passou da URL + folga,
+    e .tmp esquecidos; retorna quantos arquivos saíram.
+    """
+    limite = time.time() - DOWNLOAD_URL_TTL - _FOLGA_REMOCAO
+    removidos = 0
+    try:
+        nomes = os.listdir(DOWNLOAD_SPOOL_DIR)
+    except OSError:
+        return 0
+    for nome in nomes:
+        path = os.path.join(DOWNLOAD_SPOOL_DIR, nome)
+        if nome.endswith(".json"):
+            alvos = (path[:-len(".json")] + ".bin", path)  # .bin antes: sem .json ele não é reaproveitado
+        elif nome.endswith(".tmp") or (nome.endswith(".bin") and not os.path.exists(path[:-len(".bin")] + ".json")):
+            alvos = (path,)
+        else:
+            continue
+        try:
+            if os.path.getmtime(path) >= limite:
+                continue
+            for alvo in alvos:
+                if os.path.exists(alvo):
+                    os.remove(alvo)
+                    removidos += 1
+        except OSError:
+            pass  # Windows: ainda aberto por um download; sai na próxima passada
+    if removidos:
+        with _lock:
+            _stats["removidos"] += removidos
+        log.info("%d arquivos de download vencidos removidos", removidos)
+    return removidos
+
+
+def _loop():
+    while True:
+        try:
+            limpar()
+        except Exception:
+            log.exception("Erro na limpeza dos downloads")
+        time.sleep(DOWNLOAD_SPOOL_CLEAN_INTERVAL)
+
+
+def _garantir_thread():
+    """Inicia (sob demanda) a limpeza periódica; threads não sobrevivem ao fork."""
+    global _thread_pid
+    if _thread_pid == os.getpid():
+        return
+    with _lock:
+        if _thread_pid == os.getpid():
+            return
+        threading.Thread(target=_loop, name="download-spool-janitor", daemon=True).start()
+        _thread_pid = os.getpid()
+
+
+def metricas() -> dict:
+    with _lock:
+        return {
+            **_stats,
+            "limite_mb": DOWNLOAD_SPOOL_THRESHOLD_MB,
+            "ttl_s": DOWNLOAD_URL_TTL,
+        }
@@ -0,0 +1,41 @@
+# backend/gunicorn.conf.py — servidor de produção em Linux
+#
+#   gunicorn -c gunicorn.conf.py "app:create_app()"
+#
+# Todos os valores podem ser ajustados por variáveis de ambiente (.env).
+import os
+import multiprocessing
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '5055')}"
+
+# Processos x threads: relatórios são I/O (MSSQL) + CPU (pandas/reportlab)
+workers = int(os.getenv("WEB_WORKERS", str(min(4, multiprocessing.cpu_count()))))
+threads = int(os.getenv("WEB_THREADS", "8"))
+worker_class = "gthread"
+
+# Carrega o app (estilos, logo, registro de relatórios) uma vez no master
+preload_app = os.getenv("PRELOAD", "1") not in ("0", "false", "False")
+
+# Recicla o worker depois de N requisições para conter o crescimento de
+# memória do pandas/reportlab; o jitter evita que todos reiniciem juntos.
+max_requests = int(os.getenv("WEB_MAX_REQUESTS", "500"))
+max_requests_jitter = int(os.getenv("WEB_MAX_REQUESTS_JITTER", "50"))
+
+# Exportações grandes podem demorar; desligamento espera as requisições em curso
+timeout = int(os.getenv("WEB_TIMEOUT", "300"))
+graceful_timeout = int(os.getenv("WEB_GRACEFUL_TIMEOUT", "60"))
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
+
+
+def post_fork(server, worker):
+    # Conexões abertas no master (preload) não podem ser compartilhadas
+    from db import dispose_engines
+    dispose_engines()
+
+
+def worker_exit(server, worker):
+    from lifecycle import run_shutdown_hooks
+    run_shutdown_hooks()
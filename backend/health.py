@@ -0,0 +1,158 @@
+# backend/health.py
+"""
+Verificação de saúde dos bancos em segundo plano.
+
+Em vez de abrir conexões a cada chamada de /api/reports/health/db, uma thread
+por processo executa ping_mysql() e ping_mssql() a cada HEALTH_PROBE_INTERVAL
+segundos, cada um numa thread própria com prazo (HEALTH_PROBE_TIMEOUT): um SQL
+Server travado não atrasa o MySQL nem o endpoint. Um ping que ainda não
+terminou não é disparado de novo (conta como falha por timeout).
+
+O endpoint devolve o último estado conhecido, a idade da amostra, as falhas
+e um histograma de latência das últimas HEALTH_WINDOW amostras.
+"""
+import logging, os, threading, time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as PrazoEsgotado
+
+from db import ping_mysql, ping_mssql
+
+log = logging.getLogger(__name__)
+
+HEALTH_PROBE_INTERVAL = float(os.getenv("HEALTH_PROBE_INTERVAL", "10"))
+HEALTH_PROBE_TIMEOUT = float(os.getenv("HEALTH_PROBE_TIMEOUT", "3"))
+HEALTH_WINDOW = int(os.getenv("HEALTH_WINDOW", "360"))  # amostras por banco (~1 h com 10 s)
+
+# Limites superiores (ms) das faixas do histograma; a última faixa é "> 1000"
+FAIXAS_MS = (5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+class _Sonda:
+    def __init__(self, nome: str, ping):
+        self.nome = nome
+        self.ping = ping
+        self.amostras = deque(maxlen=HEALTH_WINDOW)  # (latencia_ms, ok)
+        self.ultimo = None        # resultado do último ping
+        self.ultimo_em = None     # time.time() da última amostra
+        self.falhas_total = 0
+        self.falhas_consecutivas = 0
+        self.timeouts = 0
+        self.em_andamento = None  # Future do ping ainda não concluído
+
+    def registrar(self, resultado: dict, latencia_ms: float | None):
+        self.ultimo = resultado
+        self.ultimo_em = time.time()
+        self.amostras.append((latencia_ms, resultado.get("ok", False)))
+        if resultado.get("ok"):
+            self.falhas_consecutivas = 0
+        else:
+            self.falhas_total += 1
+            self.falhas_consecutivas += 1
+
+    def estado(self) -> dict:
+        if self.ultimo is None:
+            return {"ok": False, "error": "sem amostra ainda"}
+        latencias = sorted(l for l, ok in self.amostras if ok and l is not None)
+        histograma = {f"<={f}ms": 0 for f in FAIXAS_MS}
+        histograma[f">{FAIXAS_MS[-1]}ms"] = 0
+        for l in latencias:
+            faixa = next((f"<={f}ms" for f in FAIXAS_MS if l <= f), f">{FAIXAS_MS[-1]}ms")
+            histograma[faixa] += 1
+
+        def _pct(p):
+            return round(latencias[min(len(latencias) - 1, int(p * len(latencias)))], 1) if latencias else None
+
+        idade = time.time() - self.ultimo_em
+        return {
+            **self.ultimo,
+            "idade_s": round(idade, 1),
+            "desatualizado": idade > 3 * HEALTH_PROBE_INTERVAL + HEALTH_PROBE_TIMEOUT,
+            "falhas_consecutivas": self.falhas_consecutivas,
+            "falhas_total": self.falhas_total,
+            "timeouts": self.timeouts,
+            "janela": {
+                "amostras": len(self.amostras),
+                "falhas": sum(1 for _, ok in self.amostras if not ok),
+                "p50_ms": _pct(0.50),
+                "p95_ms": _pct(0.95),
+                "max_ms": round(latencias[-1], 1) if latencias else None,
+                "histograma": histograma,
+            },
+        }
+
+
+class HealthProber:
+    def __init__(self, sondas: dict, intervalo: float = HEALTH_PROBE_INTERVAL,
+                 timeout: float = HEALTH_PROBE_TIMEOUT):
+        self.sondas = {nome: _Sonda(nome, ping) for nome, ping in sondas.items()}
+        self.intervalo = intervalo
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._primeira_rodada = threading.Event()
+        self._thread = None
+        self._thread_pid = None
+        self._executor = None
+
+    def _garantir_thread(self):
+        # threads não sobrevivem ao fork dos workers: confere o pid
+        if self._thread_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread_pid == os.getpid():
+                return
+            # um worker por sonda + folga para pings travados
+            self._executor = ThreadPoolExecutor(max_workers=2 * len(self.sondas), thread_name_prefix="health-ping")
+            self._thread = threading.Thread(target=self._loop, name="health-prober", daemon=True)
+            self._thread.start()
+            self._thread_pid = os.getpid()
+
+    def _medir(self, sonda: _Sonda):
+        inicio = time.perf_counter()
+        resultado = sonda.ping()
+        return resultado, (time.perf_counter() - inicio) * 1000
+
+    def _rodada(self):
+        pendentes = {}
+        for sonda in self.sondas.values():
+            if sonda.em_andamento is not None and not sonda.em_andamento.done():
+                # ping anterior ainda travado: não empilha outro
+                with self._lock:
+                    sonda.timeouts += 1
+                    sonda.registrar({"ok": False, "error": "ping anterior ainda sem resposta"}, None)
+                continue
+            sonda.em_andamento = self._executor.submit(self._medir, sonda)
+            pendentes[sonda.nome] = sonda
+
+        prazo = time.monotonic() + self.timeout
+        for sonda in pendentes.values():
+            try:
+                resultado, latencia = sonda.em_andamento.result(timeout=max(0.0, prazo - time.monotonic()))
+            except PrazoEsgotado:
+                with self._lock:
+                    sonda.timeouts += 1
+                    sonda.registrar({"ok": False, "error": f"timeout ({self.timeout:g}s)"}, None)
+                continue
+            except Exception as e:
+                resultado, latencia = {"ok": False, "error": str(e)}, None
+            with self._lock:
+                sonda.registrar(resultado, round(latencia, 2) if latencia is not None else None)
+        self._primeira_rodada.set()
+
+    def _loop(self):
+        while True:
+            inicio = time.monotonic()
+            try:
+                self._rodada()
+            except Exception as e:
+                log.exception("Erro na verificação")
+            time.sleep(max(0.0, self.intervalo - (time.monotonic() - inicio)))
+
+    def estado(self) -> dict:
+        """Último estado conhecido (espera a primeira rodada só logo após o início)."""
+        self._garantir_thread()
+        self._primeira_rodada.wait(self.timeout + 0.5)
+        with self._lock:
+            return {nome: sonda.estado() for nome, sonda in self.sondas.items()}
+
+
+prober = HealthProber({"mysql": ping_mysql, "mssql": ping_mssql})
@@ -0,0 +1,75 @@
+# backend/lazy.py
+"""
+Importação preguiçosa de dependências pesadas (pandas, reportlab, openpyxl).
+
+`pd = lazy_import("pandas")` devolve um proxy: o módulo real só é importado
+no primeiro acesso a um atributo. Assim um processo que atende apenas
+/api/auth e /api/mural não paga o tempo de importação nem a memória dessas
+bibliotecas, e uma dependência ausente só afeta o relatório que a usa.
+"""
+import importlib, os, sys, threading, time
+
+# Tempo (s) gasto em cada importação preguiçosa já realizada
+import_times = {}
+_lock = threading.Lock()
+
+
+class LazyModule:
+    def __init__(self, nome: str):
+        self.__dict__["_nome"] = nome
+        self.__dict__["_modulo"] = None
+
+    def _carregar(self):
+        modulo = self.__dict__["_modulo"]
+        if modulo is None:
+            with _lock:
+                modulo = self.__dict__["_modulo"]
+                if modulo is None:
+                    nome = self.__dict__["_nome"]
+                    inicio = time.perf_counter()
+                    modulo = importlib.import_module(nome)
+                    import_times[nome] = time.perf_counter() - inicio
+                    self.__dict__["_modulo"] = modulo
+        return modulo
+
+    def __getattr__(self, attr):
+        return getattr(self._carregar(), attr)
+
+    def __setattr__(self, attr, valor):
+        setattr(self._carregar(), attr, valor)
+
+    def __repr__(self):
+        estado = "carregado" if self.__dict__["_modulo"] is not None else "não carregado"
+        return f"<LazyModule {self.__dict__['_nome']} ({estado})>"
+
+
+def lazy_import(nome: str) -> LazyModule:
+    return LazyModule(nome)
+
+
+def warm(*nomes: str) -> dict:
+    """Importa os módulos indicados agora; retorna o tempo de cada um."""
+    tempos = {}
+    for nome in nomes:
+        inicio = time.perf_counter()
+        importlib.import_module(nome)
+        tempos[nome] = time.perf_counter() - inicio
+    return tempos
+
+
+def rss_bytes() -> int | None:
+    """Memória residente atual do processo (None se não for possível medir)."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def is_loaded(nome: str) -> bool:
+    return nome in sys.modules
@@ -0,0 +1,40 @@
+# backend/lifecycle.py
+"""
+Ganchos de ciclo de vida do processo (desligamento gracioso).
+
+Módulos com threads de fundo ou buffers registram aqui o que precisa ser
+executado antes do processo terminar. Os ganchos rodam uma única vez, seja
+pelo servidor (gunicorn worker_exit / serve.py) ou pelo atexit.
+"""
+import atexit, logging, threading
+
+log = logging.getLogger(__name__)
+
+_ganchos = []
+_lock = threading.Lock()
+_executado = False
+
+
+def on_shutdown(fn):
+    """Registra `fn` para rodar no desligamento. Pode ser usado como decorator."""
+    with _lock:
+        _ganchos.append(fn)
+    return fn
+
+
+def run_shutdown_hooks():
+    """Executa os ganchos na ordem inversa do registro (uma única vez)."""
+    global _executado
+    with _lock:
+        if _executado:
+            return
+        _executado = True
+        ganchos = list(reversed(_ganchos))
+    for fn in ganchos:
+        try:
+            fn()
+        except Exception as e:
+            log.exception("Erro no gancho de desligamento %s", getattr(fn, '__name__', fn))
+
+
+atexit.register(run_shutdown_hooks)
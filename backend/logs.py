@@ -0,0 +1,165 @@
+# backend/logs.py
+"""
+Log estruturado (JSON) sem I/O na thread da requisição.
+
+Todos os loggers escrevem num QueueHandler que só enfileira (put_nowait);
+uma thread QueueListener formata e grava no destino (stderr ou LOG_FILE).
+No Windows, escrever no console ou num stdout redirecionado pelo NSSM
+(logs/backend_err.log) pode bloquear; isso agora acontece fora da requisição.
+
+- Cada linha é um objeto JSON: ts, nivel, logger, msg, request_id, campos
+  extras (log.info("...", extra={"linhas": 10})) e exc (traceback).
+- request_id: vem do cabeçalho X-Request-Id ou é gerado por requisição
+  (app.py) e volta no mesmo cabeçalho.
+- Níveis por logger: LOG_LEVEL (raiz) e LOG_LEVELS="reports=DEBUG,db=WARNING".
+- Amostragem de DEBUG: LOG_DEBUG_SAMPLE=N grava 1 a cada N eventos DEBUG de
+  cada linha do código (INFO e acima nunca são amostrados).
+- Fila cheia (LOG_QUEUE_MAX): o evento é descartado e contado; nunca espera.
+"""
+import contextvars, json, logging, logging.handlers, os, queue, sys, threading
+import datetime as dt
+
+from lifecycle import on_shutdown
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").strip().upper()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").strip().lower()  # json | texto
+LOG_FILE = os.getenv("LOG_FILE", "").strip()
+LOG_FILE_MAX_MB = int(os.getenv("LOG_FILE_MAX_MB", "50"))
+LOG_QUEUE_MAX = int(os.getenv("LOG_QUEUE_MAX", "10000"))
+LOG_DEBUG_SAMPLE = max(1, int(os.getenv("LOG_DEBUG_SAMPLE", "1")))
+
+# Id da requisição em curso (definido em app.py); "-" fora de requisições
+request_id = contextvars.ContextVar("request_id", default=None)
+
+_ATRIBUTOS_PADRAO = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+_lock = threading.Lock()
+_stats = {"descartados": 0}
+_handler = None      # QueueHandler instalado na raiz
+_destinos = []       # handlers reais, usados pelo listener
+_listener = None
+_listener_pid = None
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        dados = {
+            "ts": dt.datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if record.request_id != "-":
+            dados["request_id"] = record.request_id
+        for chave, valor in record.__dict__.items():
+            if chave not in _ATRIBUTOS_PADRAO and not chave.startswith("_"):
+                dados[chave] = valor
+        if record.exc_info:
+            dados["exc"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            dados["stack"] = record.stack_info
+        return json.dumps(dados, ensure_ascii=False, default=str)
+
+
+class _Contexto(logging.Filter):
+    """Roda na thread de origem: anota o request_id e amostra os eventos DEBUG."""
+
+    def __init__(self, amostra: int):
+        super().__init__()
+        self.amostra = amostra
+        self._contadores = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get() or "-"
+        if record.levelno > logging.DEBUG or self.amostra <= 1:
+            return True
+        chave = (record.pathname, record.lineno)
+        n = self._contadores.get(chave, 0)
+        self._contadores[chave] = n + 1  # corrida entre threads só altera a amostra
+        return n % self.amostra == 0
+
+
+class _FilaNaoBloqueante(logging.handlers.QueueHandler):
+    def emit(self, record: logging.LogRecord):
+        _garantir_listener()
+        super().emit(record)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Listener no mesmo processo: o registro segue como está e a
+        # formatação (mensagem, traceback, JSON) fica para a thread do listener
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _stats["descartados"] += 1
+
+
+def _garantir_listener():
+    """Inicia (sob demanda) o listener; threads não sobrevivem ao fork dos workers."""
+    global _listener, _listener_pid
+    if _listener_pid == os.getpid():
+        return
+    with _lock:
+        if _listener_pid == os.getpid():
+            return
+        fila = queue.Queue(maxsize=LOG_QUEUE_MAX)
+        _handler.queue = fila
+        _listener = logging.handlers.QueueListener(fila, *_destinos, respect_handler_level=True)
+        _listener.start()
+        _listener_pid = os.getpid()
+
+
+def _parar():
+    """Esvazia a fila e encerra o listener (desligamento)."""
+    global _listener_pid
+    with _lock:
+        if _listener is not None and _listener_pid == os.getpid():
+            _listener.stop()
+            _listener_pid = None
+    if _stats["descartados"]:
+        sys.stderr.write(f"[logs] {_stats['descartados']} eventos descartados (fila cheia)\n")
+
+
+def _niveis_por_logger(valor: str) -> dict:
+    """"reports=DEBUG,db=WARNING" -> {"reports": "DEBUG", "db": "WARNING"}"""
+    niveis = {}
+    for item in valor.split(","):
+        nome, _, nivel = item.strip().partition("=")
+        if nome and nivel:
+            niveis[nome.strip()] = nivel.strip().upper()
+    return niveis
+
+
+def configurar():
+    """Instala o handler em fila na raiz (idempotente)."""
+    global _handler
+    with _lock:
+        if _handler is not None:
+            return
+        if LOG_FILE:
+            os.makedirs(os.path.dirname(os.path.abspath(LOG_FILE)), exist_ok=True)
+            destino = logging.handlers.RotatingFileHandler(
+                LOG_FILE, maxBytes=LOG_FILE_MAX_MB * 1024 * 1024, backupCount=5, encoding="utf-8"
+            )
+        else:
+            destino = logging.StreamHandler(sys.stderr)
+        if LOG_FORMAT == "texto":
+            destino.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(request_id)s %(message)s"))
+        else:
+            destino.setFormatter(JsonFormatter())
+        _destinos.append(destino)
+
+        _handler = _FilaNaoBloqueante(queue.Queue(maxsize=LOG_QUEUE_MAX))
+        _handler.addFilter(_Contexto(LOG_DEBUG_SAMPLE))
+
+        raiz = logging.getLogger()
+        for h in list(raiz.handlers):
+            raiz.removeHandler(h)
+        raiz.addHandler(_handler)
+        raiz.setLevel(LOG_LEVEL)
+        for nome, nivel in _niveis_por_logger(LOG_LEVELS).items():
+            logging.getLogger(nome).setLevel(nivel)
+    on_shutdown(_parar)
@@ -0,0 +1,265 @@
+# backend/memory_budget.py
+"""
+Contabilidade de memória por requisição e limite de tamanho das exportações.
+
+- `medir(formato, linhas, colunas)` registra o pico de memória durante a
+  renderização (RSS do processo ou tracemalloc, amostrados por uma thread) e
+  o número de linhas/colunas. Com MEMORY_ACCOUNTING=tracemalloc cada
+  medição atualiza (média móvel) a estimativa de bytes por célula daquele
+  formato. O delta de RSS não serve para isso: o alocador reaproveita
+  páginas já liberadas e o delta fica perto de zero, o que derrubaria a
+  estimativa. Em qualquer modo a estimativa nunca fica abaixo do valor
+  inicial (BYTES_POR_CELULA_INICIAL).
+- `planejar(formato, linhas, colunas)` compara a estimativa com
+  EXPORT_MEMORY_BUDGET_MB antes de renderizar: se não couber, troca para a
+  variante em streaming (quando existe, ex.: xlsx -> xlsx_streaming) ou
+  recusa a exportação.
+- As mesmas medições alimentam o tamanho do arquivo e o tempo de
+  renderização por célula, e `registrar_consulta` o tempo de busca por
+  linha; `previsao()` usa tudo isso na prévia da lista simples.
+
+Observação: o pico é do processo inteiro; com várias renderizações
+simultâneas cada uma enxerga também a memória das outras, o que tende a
+superestimar (erra para o lado seguro).
+"""
+import logging, os, threading, time
+from collections import deque
+
+from lazy import rss_bytes
+
+log = logging.getLogger(__name__)
+
+# rss (padrão) | tracemalloc (mais preciso, com custo de CPU) | off
+MEMORY_ACCOUNTING = os.getenv("MEMORY_ACCOUNTING", "rss").strip().lower()
+# Memória adicional máxima (MB) que uma exportação pode usar; 0 = sem limite
+EXPORT_MEMORY_BUDGET_MB = int(os.getenv("EXPORT_MEMORY_BUDGET_MB", "1024"))
+MEMORY_SAMPLE_INTERVAL = float(os.getenv("MEMORY_SAMPLE_INTERVAL", "0.05"))
+
+# Estimativas iniciais (bytes por célula) até haver medições reais
+BYTES_POR_CELULA_INICIAL = {
+    "pdf": 700,
+    "xlsx": 2500,
+    "xlsx_streaming": 250,
+    "csv": 150,
+    "json": 400,
+}
+# Tamanho do arquivo gerado (bytes por célula) e tempo de renderização (s por célula)
+SAIDA_BYTES_POR_CELULA_INICIAL = {"pdf": 25, "xlsx": 15, "xlsx_streaming": 12, "csv": 12, "json": 40}
+SEGUNDOS_POR_CELULA_INICIAL = {"pdf": 2e-5, "xlsx": 3e-5, "xlsx_streaming": 1e-5, "csv": 1e-6, "json": 1e-6}
+# Tempo de busca no SQL Server (s por linha)
+SEGUNDOS_POR_LINHA_CONSULTA_INICIAL = 2e-5
+# Variante em streaming usada quando o formato não cabe no orçamento
+STREAMING = {"xlsx": "xlsx_streaming"}
+
+_EWMA_ALPHA = 0.2
+# Medições pequenas são dominadas por ruído; não entram na estimativa
+_MIN_CELULAS_APRENDIZADO = 5000
+
+
+def _memoria_atual() -> int | None:
+    if MEMORY_ACCOUNTING == "tracemalloc":
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        return tracemalloc.get_traced_memory()[0]
+    return rss_bytes()
+
+
+class Medicao:
+    def __init__(self, formato: str, linhas: int | None, colunas: int | None):
+        self.formato = formato
+        self.linhas = linhas
+        self.colunas = colunas
+        self.inicio = None
+        self.pico = None
+        self.duracao = None
+        self.saida_bytes = None  # tamanho do arquivo gerado (preenchido pelo chamador)
+
+    @property
+    def pico_delta(self) -> int | None:
+        if self.inicio is None or self.pico is None:
+            return None
+        return max(0, self.pico - self.inicio)
+
+    def _amostrar(self, valor: int | None):
+        if valor is not None and (self.pico is None or valor > self.pico):
+            self.pico = valor
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        if MEMORY_ACCOUNTING == "off":
+            return self
+        self.inicio = _memoria_atual()
+        self.pico = self.inicio
+        _amostrador.adicionar(self)
+        return self
+
+    def __exit__(self, *exc):
+        if MEMORY_ACCOUNTING != "off":
+            _amostrador.remover(self)
+            self._amostrar(_memoria_atual())
+        self.duracao = time.perf_counter() - self._t0
+        _registrar(self, ok=exc[0] is None)
+        return False
+
+
+class _Amostrador:
+    """Thread única que amostra a memória enquanto houver medições ativas."""
+
+    def __init__(self, intervalo: float):
+        self.intervalo = intervalo
+        self._lock = threading.Lock()
+        self._ativas = set()
+        self._tem_ativas = threading.Event()
+        self._thread = None
+
+    def adicionar(self, m: Medicao):
+        with self._lock:
+            self._ativas.add(m)
+            self._tem_ativas.set()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="memory-sampler", daemon=True)
+                self._thread.start()
+
+    def remover(self, m: Medicao):
+        with self._lock:
+            self._ativas.discard(m)
+            if not self._ativas:
+                self._tem_ativas.clear()
+
+    def _loop(self):
+        while True:
+            self._tem_ativas.wait()
+            valor = _memoria_atual()
+            with self._lock:
+                ativas = list(self._ativas)
+            for m in ativas:
+                m._amostrar(valor)
+            time.sleep(self.intervalo)
+
+
+_amostrador = _Amostrador(MEMORY_SAMPLE_INTERVAL)
+
+_lock = threading.Lock()
+_bytes_por_celula = dict(BYTES_POR_CELULA_INICIAL)
+_saida_por_celula = dict(SAIDA_BYTES_POR_CELULA_INICIAL)
+_segundos_por_celula = dict(SEGUNDOS_POR_CELULA_INICIAL)
+_consulta_por_linha = SEGUNDOS_POR_LINHA_CONSULTA_INICIAL
+_historico = deque(maxlen=200)
+_contadores = {"medicoes": 0, "trocas_streaming": 0, "recusas": 0}
+
+
+def _ewma(tabela: dict, chave: str, observado: float):
+    anterior = tabela.get(chave, observado)
+    tabela[chave] = (1 - _EWMA_ALPHA) * anterior + _EWMA_ALPHA * observado
+
+
+def _registrar(m: Medicao, ok: bool):
+    celulas = (m.linhas or 0) * max(m.colunas or 1, 1)
+    registro = {
+        "formato": m.formato,
+        "linhas": m.linhas,
+        "colunas": m.colunas,
+        "pico_bytes": m.pico_delta,
+        "saida_bytes": m.saida_bytes,
+        "duracao_s": round(m.duracao, 3),
+        "ok": ok,
+        "em": time.time(),
+    }
+    with _lock:
+        _contadores["medicoes"] += 1
+        _historico.append(registro)
+        if not ok or celulas < _MIN_CELULAS_APRENDIZADO:
+            return
+        if m.pico_delta and MEMORY_ACCOUNTING == "tracemalloc":
+            _ewma(_bytes_por_celula, m.formato, m.pico_delta / celulas)
+        if m.saida_bytes:
+            _ewma(_saida_por_celula, m.formato, m.saida_bytes / celulas)
+        _ewma(_segundos_por_celula, m.formato, m.duracao / celulas)
+
+
+def registrar_consulta(linhas: int, segundos: float):
+    """Tempo de uma busca completa no SQL Server (alimenta a previsão)."""
+    global _consulta_por_linha
+    if linhas < _MIN_CELULAS_APRENDIZADO // 10:
+        return
+    with _lock:
+        _consulta_por_linha = (1 - _EWMA_ALPHA) * _consulta_por_linha + _EWMA_ALPHA * (segundos / linhas)
+
+
+def medir(formato: str, linhas: int | None = None, colunas: int | None = None) -> Medicao:
+    """Context manager; `linhas`/`colunas` podem ser preenchidos depois (m.linhas = ...)."""
+    return Medicao(formato, linhas, colunas)
+
+
+def estimar(formato: str, linhas: int, colunas: int) -> int:
+    """Memória estimada (bytes) para renderizar `linhas` x `colunas` no formato."""
+    with _lock:
+        bpc = _bytes_por_celula.get(formato, max(_bytes_por_celula.values()))
+    # piso: medições baixas (memória já reservada pelo processo) não tornam a estimativa otimista
+    bpc = max(bpc, BYTES_POR_CELULA_INICIAL.get(formato, 0))
+    return int(bpc * linhas * max(colunas, 1))
+
+
+def _planejar_sem_contar(formato: str, linhas: int, colunas: int):
+    estimativa = estimar(formato, linhas, colunas)
+    if EXPORT_MEMORY_BUDGET_MB <= 0:
+        return formato, estimativa
+    limite = EXPORT_MEMORY_BUDGET_MB * 1024 * 1024
+    if estimativa <= limite:
+        return formato, estimativa
+
+    alternativa = STREAMING.get(formato)
+    if alternativa:
+        estimativa_alt = estimar(alternativa, linhas, colunas)
+        if estimativa_alt <= limite:
+            return alternativa, estimativa_alt
+    return None, estimativa
+
+
+def planejar(formato: str, linhas: int, colunas: int):
+    """
+    Decide como renderizar antes de começar.
+    Retorna (formato_efetivo, estimativa_bytes); formato_efetivo None = recusar.
+    """
+    plano, estimativa = _planejar_sem_contar(formato, linhas, colunas)
+    if plano != formato:
+        with _lock:
+            _contadores["trocas_streaming" if plano else "recusas"] += 1
+        if plano:
+            log.info("%s com %dx%d excede o orçamento; usando %s", formato, linhas, colunas, plano)
+    return plano, estimativa
+
+
+def previsao(formato: str, linhas: int, colunas: int) -> dict:
+    """
+    Previsão para exportar `linhas` x `colunas`: caminho que seria usado
+    (None = recusado), memória, tamanho do arquivo e tempo (busca + renderização).
+    """
+    plano, memoria = _planejar_sem_contar(formato, linhas, colunas)
+    efetivo = plano or formato
+    celulas = linhas * max(colunas, 1)
+    with _lock:
+        saida = _saida_por_celula.get(efetivo, SAIDA_BYTES_POR_CELULA_INICIAL.get(formato, 20))
+        render = _segundos_por_celula.get(efetivo, SEGUNDOS_POR_CELULA_INICIAL.get(formato, 1e-5))
+        consulta = _consulta_por_linha
+    return {
+        "plano": plano,
+        "memoria_bytes": memoria,
+        "tamanho_bytes": int(saida * celulas),
+        "tempo_s": round(consulta * linhas + render * celulas, 2),
+    }
+
+
+def metricas() -> dict:
+    with _lock:
+        return {
+            "modo": MEMORY_ACCOUNTING,
+            "orcamento_mb": EXPORT_MEMORY_BUDGET_MB,
+            "bytes_por_celula": {k: round(v, 1) for k, v in _bytes_por_celula.items()},
+            "saida_bytes_por_celula": {k: round(v, 1) for k, v in _saida_por_celula.items()},
+            "segundos_por_celula": {k: float(f"{v:.3g}") for k, v in _segundos_por_celula.items()},
+            "consulta_segundos_por_linha": float(f"{_consulta_por_linha:.3g}"),
+            **_contadores,
+            "recentes": list(_historico)[-50:],
+        }
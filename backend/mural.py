@@ -70,6 +70,14 @@ def validate_aviso_data(data):
     
     return errors
 
+def avisos_ordenados():
+    """Avisos ordenados por criado_em decrescente (mais recentes primeiro)"""
+    return sorted(
+        MOCK_AVISOS, 
+        key=lambda x: x.get("criado_em", ""), 
+        reverse=True
+    )
+
 # ===== ROTAS PÚBLICAS (listar avisos) =====
 
 @bp.route("", methods=["GET"])
@@ -80,13 +88,7 @@ def listar_avisos():
     Não requer autenticação - avisos são públicos.
     """
     try:
-        # Ordena por criado_em decrescente (mais recentes primeiro)
-        avisos_ordenados = sorted(
-            MOCK_AVISOS, 
-            key=lambda x: x.get("criado_em", ""), 
-            reverse=True
-        )
-        return jsonify(avisos_ordenados), 200
+        return jsonify(avisos_ordenados()), 200
     except Exception as e:
         return jsonify({"error": f"Erro interno: {str(e)}"}), 500
 
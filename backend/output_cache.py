@@ -0,0 +1,189 @@
+# backend/output_cache.py
+"""
+Cache em disco dos resultados renderizados (lista_simples / run).
+
+Cada entrada é um arquivo pickle com o resultado, a validade e a origem
+("prewarm" ou "sob_demanda"). Fica num caminho fixo (OUTPUT_CACHE_DIR,
+por padrão no diretório temporário), então é compartilhado pelos workers da
+mesma máquina; o diretório precisa ser privado do usuário do processo
+(private_dir.py), senão o cache fica desligado.
+
+Gerações sob demanda só são guardadas quando a chave inclui a versão dos
+dados (data_version.py) — a entrada vale até os dados mudarem, limitada a
+OUTPUT_CACHE_VERSIONED_TTL. Sem versão, só o pré-aquecimento (prewarm.py)
+grava entradas, a menos que OUTPUT_CACHE_TTL > 0.
+
+Uma thread de limpeza (iniciada no primeiro uso, uma por processo) remove
+as entradas vencidas a cada OUTPUT_CACHE_CLEAN_INTERVAL segundos e, acima
+de OUTPUT_CACHE_MAX_MB, as gravadas há mais tempo.
+"""
+import logging, os, pickle, tempfile, threading, time
+
+import private_dir
+
+log = logging.getLogger(__name__)
+
+OUTPUT_CACHE_DIR = os.getenv("OUTPUT_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "relatorios_cache")
+# Validade (s) das gerações sob demanda sem versão dos dados; 0 = não guardar
+OUTPUT_CACHE_TTL = int(os.getenv("OUTPUT_CACHE_TTL", "0"))
+# Validade máxima (s) das gerações sob demanda com versão dos dados na chave
+OUTPUT_CACHE_VERSIONED_TTL = int(os.getenv("OUTPUT_CACHE_VERSIONED_TTL", str(24 * 3600)))
+# Tamanho máximo (MB) do diretório; acima dele saem as entradas mais antigas. 0 = sem limite
+OUTPUT_CACHE_MAX_MB = float(os.getenv("OUTPUT_CACHE_MAX_MB", "2048"))
+OUTPUT_CACHE_CLEAN_INTERVAL = int(os.getenv("OUTPUT_CACHE_CLEAN_INTERVAL", "60"))
+
+# .tmp de gravações interrompidas (worker morto no meio) saem depois disso
+_TMP_ABANDONADO = 3600
+
+_lock = threading.Lock()
+_thread_pid = None
+
+
+def ttl_sob_demanda(versionada: bool) -> int:
+    return OUTPUT_CACHE_VERSIONED_TTL if versionada else OUTPUT_CACHE_TTL
+
+
+def _path(chave: str) -> str:
+    return os.path.join(OUTPUT_CACHE_DIR, f"{chave}.pkl")
+
+
+def _diretorio_ok() -> bool:
+    try:
+        private_dir.garantir(OUTPUT_CACHE_DIR)
+        return True
+    except OSError as e:
+        log.warning("Cache de relatórios desligado -> %s", e)
+        return False
+
+
+def get(chave: str):
+    """Retorna (resultado, origem) se houver entrada válida, senão (None, None)."""
+    _garantir_thread()
+    if not _diretorio_ok():
+        return None, None
+    path = _path(chave)
+    try:
+        if os.path.getmtime(path) < time.time():
+            return None, None
+        with open(path, "rb") as fh:
+            entrada = pickle.load(fh)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None, None
+    if entrada["expira_em"] < time.time():
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None, None
+    return entrada["resultado"], entrada["origem"]
+
+
+def put(chave: str, resultado, ttl: int, origem: str = "sob_demanda"):
+    """Grava a entrada de forma atômica (arquivo temporário + os.replace)."""
+    if ttl <= 0:
+        return
+    _garantir_thread()
+    if not _diretorio_ok():
+        return
+    path = _path(chave)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as fh:
+        pickle.dump(
+            {"resultado": resultado, "expira_em": time.time() + ttl, "origem": origem, "criado_em": time.time()},
+            fh,
+            protocol=pickle.HIGHEST_PROTOCOL,
+        )
+    os.replace(tmp, path)
+    # mtime = validade, atime = gravação: permite limpar sem abrir os arquivos
+    expira_em = time.time() + ttl
+    os.utime(path, (time.time(), expira_em))
+
+
+def _entradas() -> list:
+    """[(path, os.stat_result), ...] das entradas e dos .tmp do diretório."""
+    try:
+        nomes = os.listdir(OUTPUT_CACHE_DIR)
+    except OSError:
+        return []
+    entradas = []
+    for nome in nomes:
+        if not (nome.endswith(".pkl") or nome.endswith(".tmp")):
+            continue
+        path = os.path.join(OUTPUT_CACHE_DIR, nome)
+        try:
+            entradas.append((path, os.stat(path)))
+        except OSError:
+            pass
+    return entradas
+
+
+def _remover(path: str) -> bool:
+    try:
+        os.remove(path)
+        return True
+    except OSError:
+        return False
+
+
+def limpar_expirados() -> int:
+    """Remove entradas vencidas (e .tmp abandonados); retorna quantas foram removidas."""
+    agora = time.time()
+    removidas = 0
+    for path, st in _entradas():
+        if path.endswith(".tmp"):
+            vencida = st.st_mtime < agora - _TMP_ABANDONADO
+        else:
+            vencida = st.st_mtime < agora
+        if vencida and _remover(path):
+            removidas += 1
+    return removidas
+
+
+def limitar_tamanho() -> int:
+    """
+    Acima de OUTPUT_CACHE_MAX_MB remove as entradas gravadas há mais tempo
+    até voltar ao limite; retorna quantas foram removidas.
+    """
+    if OUTPUT_CACHE_MAX_MB <= 0:
+        return 0
+    limite = OUTPUT_CACHE_MAX_MB * 2**20
+    entradas = [(path, st) for path, st in _entradas() if path.endswith(".pkl")]
+    total = sum(st.st_size for _, st in entradas)
+    removidas = 0
+    for path, st in sorted(entradas, key=lambda e: e[1].st_atime):
+        if total <= limite:
+            break
+        if _remover(path):
+            total -= st.st_size
+            removidas += 1
+    return removidas
+
+
+def limpar() -> int:
+    if not _diretorio_ok():
+        return 0
+    removidas = limpar_expirados() + limitar_tamanho()
+    if removidas:
+        log.info("%d entradas do cache de relatórios removidas", removidas)
+    return removidas
+
+
+def _loop():
+    while True:
+        try:
+            limpar()
+        except Exception:
+            log.exception("Erro na limpeza do cache de relatórios")
+        time.sleep(OUTPUT_CACHE_CLEAN_INTERVAL)
+
+
+def _garantir_thread():
+    """Inicia (sob demanda) a limpeza periódica; threads não sobrevivem ao fork."""
+    global _thread_pid
+    if _thread_pid == os.getpid():
+        return
+    with _lock:
+        if _thread_pid == os.getpid():
+            return
+        threading.Thread(target=_loop, name="output-cache-janitor", daemon=True).start()
+        _thread_pid = os.getpid()
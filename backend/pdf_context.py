@@ -0,0 +1,242 @@
+# backend/pdf_context.py
+"""
+Contexto de renderização de PDF, montado uma vez por processo.
+
+Antes, cada _pdf_from_df refazia getSampleStyleSheet(), os ParagraphStyles,
+a procura da logo (4 os.path.exists), os dicionários de colunas e o
+TableStyle, e desenhava a logo a partir do arquivo em cada página. No
+modo=multi isso se repetia por subseção (30+ vezes por requisição).
+
+Aqui ficam, somente leitura e compartilhados entre threads:
+- estilos (Tiny, TitleCenter) e o TableStyle da tabela;
+- a logo já lida, reduzida à resolução de impressão e decodificada;
+- o layout de cada orientação: página, margens e colunas (largura/rótulo),
+  e a seleção de colunas memorizada por (orientação, campos, colunas do df).
+
+Por documento, cabeçalho e rodapé (logo, título, subseção/data e aviso
+LGPD) são desenhados uma única vez num form XObject (`moldura`), que cada
+página só referencia: a imagem entra uma vez no PDF e as páginas seguintes
+não refazem nada.
+"""
+import logging, os
+from functools import lru_cache
+
+log = logging.getLogger(__name__)
+
+ORIENTACOES = ("paisagem", "retrato")
+
+# campo selecionável -> (coluna no DataFrame, rótulo no cabeçalho da tabela)
+CAMPOS = {
+    "OAB": ("OAB", "OAB"),
+    "Nome": ("Nome", "Nome"),
+    "CPF/CNPJ": ("CPFCNPJ", "CPF/CNPJ"),
+    "Situacao": ("Situacao", "Situação"),
+    "DataNascimento": ("DataNascimento", "Data Nasc."),
+    "DataCompromisso": ("DataCompromisso", "Compromisso"),
+    "TelefoneCelular": ("TelefoneCelular", "Celular"),
+    "Email": ("Email", "E-mail"),
+    "Subsecao": ("Subsecao", "Subseção"),
+}
+
+# Larguras (mm) por orientação, na ordem de CAMPOS
+_LARGURAS_MM = {
+    "retrato": (20, 80, 30, 25, 28, 28, 32, 65, 35),
+    "paisagem": (16, 65, 27, 20, 22, 25, 25, 62, 27),
+}
+
+# Margens (mm): esquerda, direita, topo, base
+_MARGENS_MM = {
+    "retrato": (20, 20, 30, 25),
+    "paisagem": (12, 12, 24, 20),
+}
+
+LGPD_TEXTO = (
+    "LGPD – Aviso: Este relatório contém dados pessoais destinados exclusivamente às atividades "
+    "institucionais da OAB/MS. É vedado o uso para fins distintos, devendo o destinatário adotar "
+    "medidas de segurança compatíveis com a Lei nº 13.709/2018."
+)
+
+_FORM_MOLDURA = "moldura"
+
+# Caixa da logo no cabeçalho (mm) e resolução com que ela é embutida
+LOGO_MM = (28, 14)
+LOGO_DPI = int(os.getenv("PDF_LOGO_DPI", "300"))
+
+
+@lru_cache(maxsize=1)
+def caminho_logo() -> str | None:
+    # tenta 2 nomes de arquivo para a logo
+    base_dir = os.path.dirname(__file__)
+    logo_candidates = [
+        os.path.join(base_dir, "static", "logos", "logo_oabms.png"),
+        os.path.join(base_dir, "static", "logos", "logo-oab.png"),
+        os.path.join(base_dir, "static", "logo_oabms.png"),
+        os.path.join(base_dir, "static", "logo-oab.png"),
+    ]
+    return next((p for p in logo_candidates if os.path.exists(p)), None)
+
+
+class Layout:
+    """Página, margens e colunas de uma orientação."""
+
+    def __init__(self, orientacao: str):
+        from reportlab.lib.pagesizes import A4, landscape
+        from reportlab.lib.units import mm
+
+        self.orientacao = orientacao
+        self.page_size = A4 if orientacao == "retrato" else landscape(A4)
+        esquerda, direita, topo, base = (m * mm for m in _MARGENS_MM[orientacao])
+        self.left_margin, self.right_margin = esquerda, direita
+        self.top_margin, self.bottom_margin = topo, base
+        self.largura_util = self.page_size[0] - esquerda - direita
+        # campo -> (coluna, largura em pontos, rótulo)
+        self.campos = {
+            campo: (col, largura * mm, rotulo)
+            for (campo, (col, rotulo)), largura in zip(CAMPOS.items(), _LARGURAS_MM[orientacao])
+        }
+        self.padrao = (
+            tuple(rotulo for _, _, rotulo in self.campos.values()),
+            tuple(largura for _, largura, _ in self.campos.values()),
+        )
+
+    def colunas(self, campos_selecionados, colunas_df) -> tuple:
+        """
+        (rótulos, larguras, colunas do df) para os campos selecionados que
+        existem no DataFrame; colunas do df None = usar o df como está
+        (sem campos selecionados: layout padrão).
+        """
+        if not campos_selecionados:
+            return (*self.padrao, None)
+        return _selecao(self.orientacao, tuple(campos_selecionados), tuple(colunas_df))
+
+
+@lru_cache(maxsize=256)
+def _selecao(orientacao: str, campos: tuple, colunas_df: tuple) -> tuple:
+    layout = contexto().layouts[orientacao]
+    presentes = set(colunas_df)
+    escolhidos = [layout.campos[c] for c in campos if c in layout.campos and layout.campos[c][0] in presentes]
+    rotulos = tuple(rotulo for _, _, rotulo in escolhidos)
+    larguras = tuple(largura for _, largura, _ in escolhidos)
+    cols = tuple(col for col, _, _ in escolhidos)
+    return rotulos, larguras, (cols or None)
+
+
+class ContextoPDF:
+    """Estilos, logo e layouts compartilhados por todas as renderizações do processo."""
+
+    def __init__(self):
+        from reportlab.lib import colors
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        from reportlab.platypus import TableStyle
+
+        styles = getSampleStyleSheet()
+        styles.add(ParagraphStyle(name="Tiny", fontSize=8, leading=10))
+        styles.add(ParagraphStyle(name="TitleCenter", parent=styles["Heading1"], alignment=1))
+        self.estilos = styles
+        self.estilo_celula = styles["Tiny"]
+
+        self.estilo_tabela = TableStyle([
+            ("BACKGROUND", (0,0), (-1,0), colors.HexColor("#23364B")),
+            ("TEXTCOLOR",  (0,0), (-1,0), colors.white),
+            ("ALIGN",      (0,0), (-1,0), "CENTER"),
+            ("FONTNAME",   (0,0), (-1,0), "Helvetica-Bold"),
+            ("FONTSIZE",   (0,0), (-1,0), 9),
+            ("BOTTOMPADDING", (0,0), (-1,0), 6),
+
+            ("FONTNAME", (0,1), (-1,-1), "Helvetica"),
+            ("FONTSIZE", (0,1), (-1,-1), 8),
+            ("VALIGN",   (0,1), (-1,-1), "TOP"),
+            ("ROWBACKGROUNDS", (0,1), (-1,-1), [colors.whitesmoke, colors.HexColor("#F7F9FC")]),
+            ("GRID", (0,0), (-1,-1), 0.25, colors.HexColor("#B6C2CF")),
+        ])
+
+        self.layouts = {o: Layout(o) for o in ORIENTACOES}
+        self.logo = self._carregar_logo()
+
+    @staticmethod
+    def _carregar_logo():
+        """
+        ImageReader da logo, reduzida a LOGO_DPI no tamanho em que é desenhada
+        e já decodificada (leituras concorrentes não o alteram), ou None.
+        O reportlab comprime a imagem de novo em cada documento; com a logo
+        original (640x360 RGBA) isso custava ~50 ms e ~90 KB por PDF.
+        """
+        path = caminho_logo()
+        if not path:
+            return None
+        try:
+            from PIL import Image
+            from reportlab.lib.utils import ImageReader
+            img = Image.open(path)
+            img.load()
+            # preserveAspectRatio: a logo cabe na caixa LOGO_MM
+            escala = min(LOGO_MM[0] / img.width, LOGO_MM[1] / img.height) / 25.4 * LOGO_DPI
+            if escala < 1:
+                img = img.resize((max(1, round(img.width * escala)), max(1, round(img.height * escala))), Image.LANCZOS)
+            logo = ImageReader(img)
+            logo.getSize()
+            logo.getRGBData()
+            return logo
+        except Exception as e:
+            log.warning("Logo ignorada (%s) -> %s", path, e)
+            return None
+
+    def layout(self, orientacao: str) -> Layout:
+        return self.layouts.get(orientacao) or self.layouts["paisagem"]
+
+    def moldura(self, canv, layout: Layout, titulo: str, info: str):
+        """
+        Cabeçalho + rodapé da página. Na primeira página do documento são
+        desenhados num form XObject; as demais só o referenciam (doForm).
+        """
+        if not canv.hasForm(_FORM_MOLDURA):
+            canv.beginForm(_FORM_MOLDURA)
+            self._desenhar_moldura(canv, layout, titulo, info)
+            canv.endForm()
+        canv.doForm(_FORM_MOLDURA)
+
+    def _desenhar_moldura(self, canv, layout: Layout, titulo: str, info: str):
+        from reportlab.lib.units import mm
+        from reportlab.platypus import Paragraph
+
+        canv.saveState()
+        W, H = layout.page_size
+
+        # --- Cabeçalho ---
+        # Logo à esquerda
+        if self.logo is not None:
+            try:
+                img_w, img_h = LOGO_MM[0]*mm, LOGO_MM[1]*mm
+                canv.drawImage(
+                    self.logo,
+                    layout.left_margin,
+                    H - img_h - 6*mm,
+                    width=img_w,
+                    height=img_h,
+                    preserveAspectRatio=True,
+                    mask='auto'
+                )
+            except Exception:
+                pass
+
+        # Título centralizado
+        canv.setFont("Helvetica-Bold", 14)
+        canv.drawCentredString(W/2, H - 12*mm, titulo)
+
+        # Texto à direita: Subseção + data
+        canv.setFont("Helvetica", 9)
+        canv.drawRightString(W - layout.right_margin, H - 17*mm, info)
+
+        # --- Rodapé (LGPD) em TODAS as páginas ---
+        # (Paragraph é criado por documento: flowables não são seguros entre threads)
+        p = Paragraph(LGPD_TEXTO, self.estilo_celula)
+        w, h = p.wrap(layout.largura_util, 30*mm)
+        p.drawOn(canv, layout.left_margin, layout.bottom_margin - h + 2)
+
+        canv.restoreState()
+
+
+@lru_cache(maxsize=1)
+def contexto() -> ContextoPDF:
+    """Contexto do processo (criado na primeira renderização, ou no warmup)."""
+    return ContextoPDF()
@@ -0,0 +1,139 @@
+# backend/permissions.py
+"""
+Cache das permissões de relatório por usuário (report_permissions).
+
+login, /api/reports/list e user_has_report consultam este cache em vez de
+ir ao MySQL a cada requisição. Quando permissões mudam, `invalidar(uids)`
+remove as entradas locais e avança a "geração" compartilhada (um arquivo num
+diretório privado do usuário do processo, ver private_dir.py), o que faz os
+outros workers da máquina descartarem o cache na próxima consulta. Se o
+diretório não puder ser privado, o cache fica desligado (toda consulta vai
+ao MySQL): um arquivo alheio não pode segurar permissões revogadas.
+
+Uma carga só é guardada se nenhuma invalidação (local ou de outro worker)
+aconteceu enquanto ela consultava o MySQL; senão ela devolve o que leu, mas
+a próxima consulta lê de novo.
+"""
+import logging, os, tempfile, threading, time
+from sqlalchemy import text
+from db import MySQLSession
+import private_dir
+
+log = logging.getLogger(__name__)
+
+PERMISSIONS_CACHE_TTL = int(os.getenv("PERMISSIONS_CACHE_TTL", "300"))
+# O diretório do arquivo é criado/validado como privado (0700)
+PERMISSIONS_GENERATION_FILE = os.getenv("PERMISSIONS_GENERATION_FILE") or os.path.join(
+    tempfile.gettempdir(), "relatorios_permissions", "geracao"
+)
+
+_lock = threading.Lock()
+_cache = {}          # uid -> (expira_em, [ {key, module, label}, ... ])
+_geracao_vista = None
+_versao_local = 0    # avança a cada invalidação vista por este processo
+_diretorio_inseguro = False
+
+
+def _diretorio_ok() -> bool:
+    global _diretorio_inseguro
+    try:
+        private_dir.garantir(os.path.dirname(PERMISSIONS_GENERATION_FILE))
+        _diretorio_inseguro = False
+        return True
+    except OSError as e:
+        if not _diretorio_inseguro:
+            log.warning("Cache de permissões desligado -> %s", e)
+        _diretorio_inseguro = True
+        return False
+
+
+def _geracao_atual() -> int:
+    try:
+        return os.stat(PERMISSIONS_GENERATION_FILE).st_mtime_ns
+    except OSError:
+        return 0
+
+
+def _verificar_geracao() -> int | None:
+    """
+    Descarta o cache local se outro processo invalidou permissões. Retorna a
+    geração vista, ou None se o diretório da geração não for confiável.
+    """
+    global _geracao_vista, _versao_local
+    if not _diretorio_ok():
+        with _lock:
+            _cache.clear()
+            _versao_local += 1
+        return None
+    geracao = _geracao_atual()
+    if geracao != _geracao_vista:
+        with _lock:
+            if geracao != _geracao_vista:
+                _cache.clear()
+                _versao_local += 1
+                _geracao_vista = geracao
+    return geracao
+
+
+def _carregar(uid: int) -> list:
+    with MySQLSession() as s:
+        rows = s.execute(text("""
+            SELECT r.report_key AS `key`, r.module, r.label
+            FROM reports r
+            JOIN report_permissions rp ON rp.report_id = r.id
+            WHERE rp.user_id = :uid
+            ORDER BY r.module, r.label
+        """), {"uid": uid}).mappings().all()
+    return [dict(r) for r in rows]
+
+
+def relatorios_do_usuario(uid: int) -> list:
+    """Relatórios permitidos ao usuário ({key, module, label}), ordenados por módulo/rótulo."""
+    geracao = _verificar_geracao()
+    if geracao is None:
+        return _carregar(uid)
+    agora = time.monotonic()
+    item = _cache.get(uid)
+    if item and item[0] > agora:
+        return item[1]
+    versao = _versao_local
+    rows = _carregar(uid)
+    with _lock:
+        # invalidar() durante a carga: o que lemos pode ser anterior à mudança
+        if versao == _versao_local and _geracao_atual() == geracao:
+            _cache[uid] = (agora + PERMISSIONS_CACHE_TTL, rows)
+    return rows
+
+
+def usuario_tem_relatorio(uid: int, report_key: str) -> bool:
+    return any(r["key"] == report_key for r in relatorios_do_usuario(uid))
+
+
+def invalidar(uids=None):
+    """
+    Invalida o cache dos usuários indicados (ou de todos, se None) neste
+    processo e sinaliza os demais processos via arquivo de geração.
+    """
+    global _geracao_vista, _versao_local
+    with _lock:
+        _versao_local += 1
+        if uids is None:
+            _cache.clear()
+        else:
+            for uid in uids:
+                _cache.pop(uid, None)
+    if not _diretorio_ok():
+        return  # sem cache em nenhum processo: nada a sinalizar
+    try:
+        with open(PERMISSIONS_GENERATION_FILE, "a"):
+            pass
+        agora = time.time_ns()
+        os.utime(PERMISSIONS_GENERATION_FILE, ns=(agora, agora))
+    except OSError as e:
+        log.warning("Não consegui sinalizar invalidação -> %s", e)
+        return
+    # este processo já removeu o que precisava; só descarta o resto se outro
+    # processo também tiver invalidado nesse meio tempo
+    with _lock:
+        if _geracao_atual() == agora:
+            _geracao_vista = agora
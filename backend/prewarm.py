@@ -0,0 +1,298 @@
+# backend/prewarm.py
+"""
+Pré-aquecimento dos relatórios mais pedidos.
+
+1. lista_simples e run registram a assinatura normalizada de cada pedido
+   (registrar_acesso). Os contadores ficam em memória e são gravados a cada
+   PREWARM_FLUSH_INTERVAL segundos num SQLite local, compartilhado pelos workers.
+2. Um agendador local, no horário PREWARM_AT (fora do expediente), gera as
+   PREWARM_TOP_N combinações mais pedidas nos últimos PREWARM_WINDOW_DAYS dias
+   e as grava no cache de saída (output_cache) com validade PREWARM_TTL.
+   O tempo de CPU do pré-aquecimento é limitado por PREWARM_CPU_BUDGET,
+   também dentro de uma geração (o token de gerar() é cancelado ao estourar).
+   Cada worker tem seu agendador, mas cada horário roda uma vez só: quem
+   pega o lock depois de outro worker já ter executado o horário desiste.
+3. Cada pedido atendido por uma entrada pré-aquecida é contado
+   (registrar_uso), e stats() informa quantas foram realmente usadas.
+
+Só um processo por máquina executa o pré-aquecimento (lock em arquivo).
+"""
+import datetime as dt
+import json, logging, os, sqlite3, tempfile, threading, time
+from collections import Counter
+
+import data_version, output_cache
+from cancellation import CancelToken, Cancelado, monitorar, timeout_relatorio
+from coalesce import chave_normalizada, file_lock
+from lifecycle import on_shutdown
+
+log = logging.getLogger(__name__)
+
+PREWARM_ENABLED = os.getenv("PREWARM_ENABLED", "0") in ("1", "true", "True")
+PREWARM_AT = os.getenv("PREWARM_AT", "05:30")               # HH:MM (horário local)
+PREWARM_TOP_N = int(os.getenv("PREWARM_TOP_N", "10"))
+PREWARM_WINDOW_DAYS = int(os.getenv("PREWARM_WINDOW_DAYS", "14"))
+PREWARM_CPU_BUDGET = float(os.getenv("PREWARM_CPU_BUDGET", "300"))  # segundos de CPU por execução
+PREWARM_TTL = int(os.getenv("PREWARM_TTL", str(6 * 3600)))   # validade das entradas pré-aquecidas
+PREWARM_FLUSH_INTERVAL = int(os.getenv("PREWARM_FLUSH_INTERVAL", "60"))
+PREWARM_DB = os.getenv("PREWARM_DB") or os.path.join(tempfile.gettempdir(), "relatorios_prewarm.sqlite")
+
+# namespace -> função(params, token) que gera o resultado
+_geradores = {}
+
+_lock = threading.Lock()
+_acessos = Counter()      # (chave, namespace, params_json) -> n
+_usos = Counter()         # chave -> n
+
+
+def registrar_gerador(namespace: str, fn):
+    _geradores[namespace] = fn
+
+
+# -------------------------------------------------------
+#                 REGISTRO DE ACESSOS
+# -------------------------------------------------------
+def registrar_acesso(namespace: str, params: dict) -> str:
+    """Conta um pedido (em memória). Retorna a chave normalizada."""
+    _garantir_thread()
+    chave = chave_normalizada(namespace, params)
+    with _lock:
+        _acessos[(chave, namespace, json.dumps(params, sort_keys=True, ensure_ascii=False))] += 1
+    return chave
+
+
+def registrar_uso(chave: str):
+    """Conta um pedido atendido por uma entrada pré-aquecida."""
+    with _lock:
+        _usos[chave] += 1
+
+
+def _conectar():
+    con = sqlite3.connect(PREWARM_DB, timeout=10)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.executescript("""
+        CREATE TABLE IF NOT EXISTS acessos (
+            chave TEXT NOT NULL, dia TEXT NOT NULL, namespace TEXT NOT NULL,
+            params TEXT NOT NULL, hits INTEGER NOT NULL,
+            PRIMARY KEY (chave, dia)
+        );
+        CREATE TABLE IF NOT EXISTS execucoes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            inicio TEXT NOT NULL, fim TEXT, geradas INTEGER DEFAULT 0,
+            falhas INTEGER DEFAULT 0, cpu_s REAL DEFAULT 0, interrompida_orcamento INTEGER DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS entradas (
+            execucao_id INTEGER NOT NULL, chave TEXT NOT NULL, usos INTEGER DEFAULT 0,
+            PRIMARY KEY (execucao_id, chave)
+        );
+    """)
+    return con
+
+
+def flush():
+    """Grava os contadores em memória no SQLite."""
+    with _lock:
+        acessos = dict(_acessos)
+        usos = dict(_usos)
+        _acessos.clear()
+        _usos.clear()
+    if not acessos and not usos:
+        return
+    dia = dt.date.today().isoformat()
+    try:
+        con = _conectar()
+        with con:
+            con.executemany("""
+                INSERT INTO acessos (chave, dia, namespace, params, hits) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (chave, dia) DO UPDATE SET hits = hits + excluded.hits
+            """, [(chave, dia, ns, params, n) for (chave, ns, params), n in acessos.items()])
+            # uso é atribuído à execução de pré-aquecimento mais recente daquela chave
+            con.executemany("""
+                UPDATE entradas SET usos = usos + ?
+                WHERE chave = ? AND execucao_id = (SELECT MAX(execucao_id) FROM entradas WHERE chave = ?)
+            """, [(n, chave, chave) for chave, n in usos.items()])
+        con.close()
+    except sqlite3.Error as e:
+        log.warning("Falha ao gravar contadores -> %s", e)
+
+
+def mais_pedidos(n: int = PREWARM_TOP_N, dias: int = PREWARM_WINDOW_DAYS) -> list:
+    desde = (dt.date.today() - dt.timedelta(days=dias)).isoformat()
+    con = _conectar()
+    try:
+        rows = con.execute("""
+            SELECT chave, namespace, params, SUM(hits) AS total
+            FROM acessos WHERE dia >= ?
+            GROUP BY chave, namespace, params
+            ORDER BY total DESC
+            LIMIT ?
+        """, (desde, n)).fetchall()
+    finally:
+        con.close()
+    return [{"chave": c, "namespace": ns, "params": json.loads(p), "hits": t} for c, ns, p, t in rows]
+
+
+# -------------------------------------------------------
+#                 EXECUÇÃO DO PRÉ-AQUECIMENTO
+# -------------------------------------------------------
+def executar(horario: dt.datetime | None = None) -> dict:
+    """
+    Gera as combinações mais pedidas respeitando o orçamento de CPU.
+    `horario` (agendador): a execução agendada daquele PREWARM_AT; ignorada
+    se alguma execução já começou desde então (outro worker). Manual: None.
+    """
+    flush()
+    lock_path = os.path.join(tempfile.gettempdir(), "relatorios_prewarm.lock")
+    try:
+        with file_lock(lock_path, bloqueante=False):
+            return _executar(horario)
+    except BlockingIOError:
+        return {"ignorada": "outro processo já está pré-aquecendo"}
+
+
+def _executar(horario: dt.datetime | None = None) -> dict:
+    con = _conectar()
+    if horario is not None:
+        # sob o lock: outro worker pode ter executado este horário enquanto dormíamos
+        try:
+            anterior = con.execute("SELECT id FROM execucoes WHERE inicio >= ? ORDER BY id LIMIT 1",
+                                   (horario.isoformat(timespec="seconds"),)).fetchone()
+        except sqlite3.Error:
+            anterior = None
+        if anterior:
+            con.close()
+            return {"ignorada": f"horário {horario:%Y-%m-%d %H:%M} já executado (execução {anterior[0]})"}
+    with con:
+        execucao_id = con.execute("INSERT INTO execucoes (inicio) VALUES (?)",
+                                  (dt.datetime.now().isoformat(timespec="seconds"),)).lastrowid
+    con.close()
+
+    # process_time: inclui as threads auxiliares de gerar() (renderizações em
+    # paralelo, busca particionada), que thread_time não veria. Mas conta também
+    # as requisições atendidas por este worker ao mesmo tempo: o orçamento é um
+    # teto conservador (pré-aquece menos sob carga; fora do expediente quase não há).
+    cpu_inicio = time.process_time()
+    limite_cpu = cpu_inicio + PREWARM_CPU_BUDGET
+    geradas, falhas, interrompida = 0, 0, False
+    for item in mais_pedidos():
+        if time.process_time() >= limite_cpu:
+            interrompida = True
+            break
+        gerar = _geradores.get(item["namespace"])
+        if gerar is None:
+            continue
+        token = CancelToken(timeout_relatorio(item["params"].get("report_key", item["namespace"])))
+
+        def _orcamento_esgotado(token=token):
+            # consultado pelo vigia de cancelamento a cada CANCEL_POLL_INTERVAL
+            if time.process_time() >= limite_cpu:
+                token.cancel("orcamento_cpu")
+            return False
+
+        try:
+            # versão dos dados obtida antes de gerar (se mudar no meio, a entrada só deixa de ser usada)
+            chave_cache, _ = data_version.chave_cache(item["namespace"], item["chave"], item["params"])
+            with monitorar(token, _orcamento_esgotado):
+                resultado = gerar(item["params"], token)
+            if isinstance(resultado, dict) and "error" in resultado:
+                continue
+            output_cache.put(chave_cache, resultado, PREWARM_TTL, origem="prewarm")
+            geradas += 1
+            con = _conectar()
+            with con:
+                con.execute("INSERT OR IGNORE INTO entradas (execucao_id, chave) VALUES (?, ?)",
+                            (execucao_id, item["chave"]))
+            con.close()
+        except Cancelado as e:
+            if e.motivo == "orcamento_cpu":
+                interrompida = True
+                log.info("Orçamento de CPU esgotado durante %s %s", item["namespace"], item["params"])
+                break
+            falhas += 1
+            log.warning("Geração de %s %s cancelada (%s)", item["namespace"], item["params"], e.motivo)
+        except Exception as e:
+            falhas += 1
+            log.exception("Falha ao gerar %s %s", item["namespace"], item["params"])
+
+    cpu = time.process_time() - cpu_inicio
+    con = _conectar()
+    with con:
+        con.execute("""
+            UPDATE execucoes SET fim = ?, geradas = ?, falhas = ?, cpu_s = ?, interrompida_orcamento = ?
+            WHERE id = ?
+        """, (dt.datetime.now().isoformat(timespec="seconds"), geradas, falhas, round(cpu, 2),
+              int(interrompida), execucao_id))
+    con.close()
+    output_cache.limpar()
+    log.info("%d relatórios pré-aquecidos (%d falhas, %.1fs de CPU)", geradas, falhas, cpu)
+    return {"execucao_id": execucao_id, "geradas": geradas, "falhas": falhas,
+            "cpu_s": round(cpu, 2), "interrompida_orcamento": interrompida}
+
+
+def stats() -> dict:
+    """Execuções recentes e quantas entradas pré-aquecidas foram usadas."""
+    flush()
+    con = _conectar()
+    try:
+        execucoes = con.execute("""
+            SELECT e.id, e.inicio, e.fim, e.geradas, e.falhas, e.cpu_s, e.interrompida_orcamento,
+                   COALESCE(SUM(CASE WHEN en.usos > 0 THEN 1 ELSE 0 END), 0) AS usadas,
+                   COALESCE(SUM(en.usos), 0) AS pedidos_atendidos
+            FROM execucoes e LEFT JOIN entradas en ON en.execucao_id = e.id
+            GROUP BY e.id ORDER BY e.id DESC LIMIT 10
+        """).fetchall()
+    finally:
+        con.close()
+    cols = ["id", "inicio", "fim", "geradas", "falhas", "cpu_s", "interrompida_orcamento",
+            "usadas", "pedidos_atendidos"]
+    return {
+        "habilitado": PREWARM_ENABLED,
+        "horario": PREWARM_AT,
+        "top_n": PREWARM_TOP_N,
+        "orcamento_cpu_s": PREWARM_CPU_BUDGET,
+        "execucoes": [dict(zip(cols, r)) for r in execucoes],
+        "mais_pedidos": mais_pedidos(),
+    }
+
+
+# -------------------------------------------------------
+#                       AGENDADOR
+# -------------------------------------------------------
+def _proxima_execucao(agora: dt.datetime) -> dt.datetime:
+    hora, minuto = (int(x) for x in PREWARM_AT.split(":"))
+    alvo = agora.replace(hour=hora, minute=minuto, second=0, microsecond=0)
+    return alvo if alvo > agora else alvo + dt.timedelta(days=1)
+
+
+def _loop():
+    proxima = _proxima_execucao(dt.datetime.now())
+    while True:
+        time.sleep(PREWARM_FLUSH_INTERVAL)
+        flush()
+        if PREWARM_ENABLED and dt.datetime.now() >= proxima:
+            try:
+                executar(proxima)
+            except Exception as e:
+                log.exception("Erro no pré-aquecimento")
+            proxima = _proxima_execucao(dt.datetime.now())
+
+
+_thread = None
+_thread_pid = None
+
+
+def _garantir_thread():
+    """
+    Inicia (sob demanda) a thread de gravação dos contadores e do agendamento.
+    Verifica o pid porque threads não sobrevivem ao fork dos workers.
+    """
+    global _thread, _thread_pid
+    if _thread_pid == os.getpid():
+        return
+    with _lock:
+        if _thread_pid == os.getpid():
+            return
+        _thread = threading.Thread(target=_loop, name="prewarm", daemon=True)
+        _thread.start()
+        _thread_pid = os.getpid()
+    on_shutdown(flush)
@@ -0,0 +1,39 @@
+# backend/private_dir.py
+"""
+Diretórios de trabalho privados, compartilhados pelos workers do mesmo usuário.
+
+Os caches em disco (coalesce.py, output_cache.py) guardam pickles e ficam,
+por padrão, num caminho previsível do diretório temporário. Se outro usuário
+da máquina criasse esse diretório antes, poderia plantar um pickle e executar
+código no processo ao ser lido. `garantir(path)` cria o diretório com modo
+0700 e, antes de cada uso, confere que ele é um diretório de verdade (não um
+link), do usuário do processo e sem escrita para grupo/outros; caso
+contrário levanta DiretorioInseguro e o chamador deixa de usar o disco.
+O caminho continua fixo (configurável), então os workers seguem compartilhando.
+"""
+import os, stat
+
+
+class DiretorioInseguro(PermissionError):
+    pass
+
+
+def garantir(path: str) -> str:
+    """Cria (0700) ou valida `path`; retorna o próprio caminho."""
+    try:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+    except FileExistsError:
+        pass  # existe mas não é diretório: recusado abaixo
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode):
+        raise DiretorioInseguro(f"{path} não é um diretório")
+    if not hasattr(os, "getuid"):
+        return path  # Windows: o diretório temporário já é do usuário
+    if st.st_uid != os.getuid():
+        raise DiretorioInseguro(f"{path} pertence a outro usuário (uid {st.st_uid})")
+    if st.st_mode & 0o022:
+        raise DiretorioInseguro(f"{path} permite escrita de grupo/outros")
+    if st.st_mode & 0o077:
+        # criado por uma versão anterior com a umask padrão: só leitura alheia
+        os.chmod(path, 0o700)
+    return path
@@ -1,24 +1,41 @@
-from flask import Blueprint, request, jsonify, send_file
+from __future__ import annotations
+
+from flask import Blueprint, request, jsonify, send_file, redirect, url_for
 from functools import wraps
 from sqlalchemy import text
-from db import MySQLSession, MSSQLSession, ping_mysql, ping_mssql
-from auth import verify_token
+from db import MySQLSession, MSSQLSession, mssql_query, MSSQL_POOL_SIZE
+from auth import verify_token, require_admin
+from permissions import relatorios_do_usuario, usuario_tem_relatorio
+from admission import AdmissaoRecusada, admissao, limite_exportacao, reserva as reserva_admissao, controller as admission_controller
+from coalesce import single_flight
+from cancellation import CancelToken, Cancelado, monitorar, cliente_desconectado, timeout_relatorio
+import audit, data_version, download_spool, memory_budget, output_cache, pdf_context, prewarm, snapshot, spill, stats_cube
+from health import prober as health_prober
 
 # ===== imports para geração de arquivos =====
-import io, os, zipfile, datetime as dt
-import pandas as pd
+import heapq, io, os, unicodedata, zipfile, datetime as dt
 import tempfile
-import traceback
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# pandas/reportlab/openpyxl são carregados sob demanda (ver lazy.py e warmup())
+from lazy import lazy_import, warm
+
+pd = lazy_import("pandas")
 
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4, landscape
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import (
-    SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
+# Dependências pesadas de renderização, importadas por warmup()
+MODULOS_RENDERIZACAO = (
+    "pandas",
+    "openpyxl",
+    "reportlab.lib.colors",
+    "reportlab.lib.styles",
+    "reportlab.platypus",
 )
-from reportlab.lib.units import mm
 
 bp = Blueprint("reports", __name__, url_prefix="/api/reports")
+log = logging.getLogger(__name__)
 
 
 # -------------------------------------------------------
@@ -27,14 +44,11 @@ bp = Blueprint("reports", __name__, url_prefix="/api/reports")
 @bp.get("/health/db")
 def health_db():
     """
-    Diagnóstico das conexões de banco.
-    - mysql: { ok: bool, value?: 1, error?: str }
-    - mssql: { ok: bool, value?: 1, error?: str }
+    Diagnóstico das conexões de banco (último estado da verificação em segundo plano).
+    - mysql: { ok: bool, value?: 1, error?: str, idade_s, falhas_consecutivas, janela: {...} }
+    - mssql: { ok: bool, value?: 1, error?: str, idade_s, falhas_consecutivas, janela: {...} }
     """
-    return jsonify({
-        "mysql": ping_mysql(),
-        "mssql": ping_mssql(),
-    })
+    return jsonify(health_prober.estado())
 
 
 def require_auth(f):
@@ -50,37 +64,24 @@ def require_auth(f):
 
 
 def user_has_report(uid: int, report_key: str) -> bool:
-    with MySQLSession() as s:
-        row = s.execute(text("""
-            SELECT 1
-            FROM reports r
-            JOIN report_permissions rp ON rp.report_id = r.id
-            WHERE rp.user_id = :uid AND r.report_key = :rk
-            LIMIT 1
-        """), {"uid": uid, "rk": report_key}).first()
-        return row is not None
+    return usuario_tem_relatorio(uid, report_key)
 
 
 # -------------------------------------------------------
 #                     LISTAGEM DE RELATÓRIOS
 # -------------------------------------------------------
+def relatorios_agrupados(uid: int) -> dict:
+    """Relatórios permitidos ao usuário agrupados por módulo (usa o cache de permissões)."""
+    grouped = {}
+    for r in relatorios_do_usuario(uid):
+        grouped.setdefault(r["module"], []).append({"key": r["key"], "label": r["label"]})
+    return grouped
+
+
 @bp.get("/list")
 @require_auth
 def list_reports():
-    uid = request.user["uid"]
-    with MySQLSession() as s:
-        rows = s.execute(text("""
-            SELECT r.report_key AS `key`, r.module, r.label
-            FROM reports r
-            JOIN report_permissions rp ON rp.report_id = r.id
-            WHERE rp.user_id = :uid
-            ORDER BY r.module, r.label
-        """), {"uid": uid}).mappings().all()
-
-    grouped = {}
-    for r in rows:
-        grouped.setdefault(r["module"], []).append({"key": r["key"], "label": r["label"]})
-    return jsonify(grouped)
+    return jsonify(relatorios_agrupados(request.user["uid"]))
 
 
 # -------------------------------------------------------
@@ -88,281 +89,415 @@ def list_reports():
 # -------------------------------------------------------
 @bp.post("/run/<report_key>")
 @require_auth
+@limite_exportacao
+@admissao(lambda: "json")
 def run_report(report_key):
     uid = request.user["uid"]
     if not user_has_report(uid, report_key):
         return jsonify({"error": "Sem permissão"}), 403
 
-    if report_key == "adm_usuarios":
-        with MySQLSession() as s:
-            rows = s.execute(text("""
-                SELECT id, name AS Nome, email AS Email, active AS Ativo, created_at AS CriadoEm
-                FROM users
-                ORDER BY id
-            """)).mappings().all()
-        cols = list(rows[0].keys()) if rows else []
-        return jsonify({"columns": cols, "rows": rows, "total_rows": len(rows)})
+    if report_key not in RELATORIOS_RUN:
+        return jsonify({"error": "Relatório desconhecido"}), 404
 
-    if report_key == "fin_inadimplencia_resumo":
-        with MSSQLSession() as s:
-            rows = s.execute(text("""
-                SELECT TOP 100
-                    suc.NomeSubUnidade AS Subsecao,
-                    COUNT(p.ID) AS TotalInscritos
-                FROM Pessoa p
-                LEFT JOIN SubUnidadeConselho suc ON p.SubUnidadeAtual = suc.ID
-                WHERE p.TipoCategoria = 20
-                GROUP BY suc.NomeSubUnidade
-                ORDER BY suc.NomeSubUnidade
-            """)).mappings().all()
-        cols = list(rows[0].keys()) if rows else []
-        return jsonify({"columns": cols, "rows": rows, "total_rows": len(rows)})
+    inicio = time.perf_counter()
+    try:
+        resultado, _ = _obter_resultado("run", {"report_key": report_key}, _gerar_run, report_key)
+    except Cancelado as e:
+        return _resposta_cancelado(e)
+    resp = jsonify(resultado)
+    audit.registrar_download(uid, report_key, {}, "json", resultado.get("total_rows"),
+                             resp.calculate_content_length(), time.perf_counter() - inicio, request.remote_addr)
+    return resp
+
+
+def _gerar_run(params: dict, token: CancelToken) -> dict:
+    with memory_budget.medir("json") as medicao:
+        resultado = RELATORIOS_RUN[params["report_key"]](token)
+        medicao.linhas = resultado.get("total_rows")
+        medicao.colunas = len(resultado.get("columns") or [])
+    return resultado
+
+
+def _obter_resultado(namespace: str, params: dict, gerar, timeout_key: str):
+    """
+    Caminho comum de lista_simples e run:
+    1. registra a assinatura do pedido (estatística para o pré-aquecimento);
+    2. acrescenta à chave a versão dos dados, quando o namespace tem uma
+       (data_version), e serve do cache de saída se houver entrada válida;
+    3. senão gera, coalescendo pedidos idênticos simultâneos, com prazo e
+       cancelamento por desconexão. Só a líder reserva capacidade no
+       controle de admissão (quem espera a líder não paga de novo).
+    Retorna (resultado, compartilhado).
+    """
+    chave_acesso = prewarm.registrar_acesso(namespace, params)
+    chave, versao = data_version.chave_cache(namespace, chave_acesso, params)
+
+    resultado, origem = output_cache.get(chave)
+    if resultado is not None:
+        if origem == "prewarm":
+            prewarm.registrar_uso(chave_acesso)
+        return resultado, True
 
-    return jsonify({"error": "Relatório desconhecido"}), 404
+    token = CancelToken(timeout_relatorio(timeout_key))
+
+    def _gerar():
+        with reserva_admissao():
+            novo = gerar(params, token)
+        if not (isinstance(novo, dict) and "error" in novo):
+            output_cache.put(chave, novo, output_cache.ttl_sob_demanda(versao is not None))
+        return novo
+
+    with monitorar(token, _desconectado_sem_seguidores(chave)):
+        return single_flight.do(chave, _gerar)
+
+
+def _desconectado_sem_seguidores(chave: str):
+    """
+    Detector de desconexão para o vigia de cancelamento: o trabalho só é
+    abandonado se o cliente saiu e nenhuma requisição coalescida o aguarda.
+    """
+    desconectado = cliente_desconectado(request.environ)
+    if desconectado is None:
+        return None
+    return lambda: desconectado() and single_flight.seguidores(chave) == 0
+
+
+def _resposta_cancelado(e: Cancelado):
+    if e.motivo == "timeout":
+        return jsonify({"error": "Tempo limite do relatório excedido. Tente filtrar por subseção."}), 504
+    # cliente já foi embora; a resposta não será lida
+    return jsonify({"error": "Requisição cancelada"}), 499
+
+
+def _run_adm_usuarios(token: CancelToken) -> dict:
+    token.check()
+    with MySQLSession() as s:
+        rows = s.execute(text("""
+            SELECT id, name AS Nome, email AS Email, active AS Ativo, created_at AS CriadoEm
+            FROM users
+            ORDER BY id
+        """)).mappings().all()
+    rows = [dict(r) for r in rows]
+    cols = list(rows[0].keys()) if rows else []
+    return {"columns": cols, "rows": rows, "total_rows": len(rows)}
+
+
+def _run_fin_inadimplencia_resumo(token: CancelToken) -> dict:
+    # Respondido pelo cubo local de estatísticas; consulta o SQL Server só
+    # enquanto o cubo ainda não foi preenchido
+    if stats_cube.pronto():
+        cubo = stats_cube.consultar(["subsecao"], {"categoria": 20}, limite=100)
+        rows = [{"Subsecao": r["subsecao"], "TotalInscritos": r["total"]} for r in cubo["rows"]]
+        return {"columns": ["Subsecao", "TotalInscritos"], "rows": rows, "total_rows": len(rows),
+                "refreshed_at": cubo["refreshed_at"]}
+
+    rows = mssql_query("""
+        SELECT TOP 100
+            suc.NomeSubUnidade AS Subsecao,
+            COUNT(p.ID) AS TotalInscritos
+        FROM Pessoa p
+        LEFT JOIN SubUnidadeConselho suc ON p.SubUnidadeAtual = suc.ID
+        WHERE p.TipoCategoria = 20
+        GROUP BY suc.NomeSubUnidade
+        ORDER BY suc.NomeSubUnidade
+    """, token=token)
+    rows = [dict(r) for r in rows]
+    cols = list(rows[0].keys()) if rows else []
+    return {"columns": cols, "rows": rows, "total_rows": len(rows),
+            "refreshed_at": dt.datetime.now().isoformat(timespec="seconds")}
+
+
+# Registro dos relatórios executáveis via /run/<report_key>
+RELATORIOS_RUN = {
+    "adm_usuarios": _run_adm_usuarios,
+    "fin_inadimplencia_resumo": _run_fin_inadimplencia_resumo,
+}
+
+prewarm.registrar_gerador("run", _gerar_run)
 
 
 # -------------------------------------------------------
 #                RELATÓRIO: LISTA SIMPLES
 # -------------------------------------------------------
-def _consulta_lista_simples(subsecao_like: str | None) -> pd.DataFrame:
-    """Consulta base (MSSQL) com filtro opcional de subseção."""
+# Partes da consulta da lista simples (compartilhadas com a prévia)
+_SQL_LISTA_SIMPLES_COLUNAS = """
+    p.RegistroConselhoAtual AS OAB,
+    p.Nome,
+    p.CPFCNPJ,
+    s.Descricao AS Situacao,
+    FORMAT(p.DataNascimentoFundacao, 'dd/MM/yyyy') AS DataNascimento,
+    FORMAT(p.DataCompromisso, 'dd/MM/yyyy') AS DataCompromisso,
+    p.TelefoneCelular,
+    COALESCE(p.EmailCorreio, p.EmailComercial) AS Email,
+    suc.NomeSubUnidade AS Subsecao
+"""
+_SQL_LISTA_SIMPLES_ORIGEM = """
+    FROM Pessoa p
+    JOIN SubUnidadeConselho suc ON p.SubUnidadeAtual = suc.ID
+    JOIN Situacao s ON p.SituacaoAtual = s.ID
+    WHERE p.TipoCategoria = 20
+      AND p.SituacaoAtual = 14
+"""
+
+
+def _filtro_lista_simples(subsecao_like: str | None):
+    """Retorna (trecho WHERE adicional, parâmetros) para o filtro de subseção."""
+    if subsecao_like:
+        return "AND suc.NomeSubUnidade LIKE :sub", {"sub": f"%{subsecao_like}%"}
+    return "", {}
+
+
+def _chave_nome(nome: str) -> str:
+    """Aproxima a ordenação do SQL Server (collation CI/AI): sem acentos e sem caixa."""
+    decomposto = unicodedata.normalize("NFKD", nome or "")
+    return "".join(c for c in decomposto if not unicodedata.combining(c)).casefold()
+
+
+def _filtro_snapshot_lista_simples(subsecao_like: str | None):
+    """
+    Mesmo filtro, para a tabela lista_simples do snapshot local (SQLite).
+    Compara as formas normalizadas (_chave_nome) de ambos os lados, como a
+    collation CI/AI do SQL Server; % e _ continuam curingas, como no LIKE de lá.
+    """
+    if subsecao_like:
+        return "_subsecao_chave LIKE ?", (f"%{_chave_nome(subsecao_like)}%",)
+    return "", ()
+
+
+def _versao_lista_simples(params: dict) -> str | None:
+    """Versão dos dados usados pela lista simples (snapshot local ou subseções no SQL Server)."""
+    versao_snapshot = snapshot.versao("lista_simples")
+    if versao_snapshot:
+        return f"s{versao_snapshot}"
+    return data_version.versao_subsecoes(params["subsecao"] or None)
+
+
+data_version.registrar("lista_simples", _versao_lista_simples)
+
+# Fonte do snapshot local: mesmas colunas e linhas da consulta geral
+snapshot.registrar_fonte("lista_simples", f"""
+    SELECT {_SQL_LISTA_SIMPLES_COLUNAS}
+    {_SQL_LISTA_SIMPLES_ORIGEM}
+    ORDER BY p.Nome
+""", derivadas={"_subsecao_chave": ("Subsecao", _chave_nome)})
+
+
+def _linhas_como_texto(rows) -> list:
+    """Converte as linhas garantindo que todos os valores são strings ("" para None)."""
+    return [{k: "" if v is None else str(v) for k, v in row.items()} for row in rows]
+
+
+# Busca "Geral" particionada por subseção: N consultas em paralelo (uma por
+# subseção), cada uma já ordenada por nome no SQL Server, unidas por merge.
+# 0 = desligado (uma única consulta). Limitado a MSSQL_POOL_SIZE por processo,
+# para não esgotar o pool das demais requisições.
+LISTA_SIMPLES_PARALELO = min(int(os.getenv("LISTA_SIMPLES_PARALELO", "0")), MSSQL_POOL_SIZE)
+_paralelo_sem = threading.BoundedSemaphore(max(LISTA_SIMPLES_PARALELO, 1))
+
+
+def _consulta_lista_simples_particionada(token: CancelToken | None) -> list | None:
+    """
+    Busca geral dividida por subseção, em paralelo.
+    Retorna [(subsecao, linhas ordenadas por nome), ...] ou None quando não se
+    aplica (desligada ou sem a lista de subseções) — o chamador usa a consulta única.
+    """
+    if LISTA_SIMPLES_PARALELO <= 1:
+        return None
+    # subseções (e o tamanho de cada uma) vêm da sonda de versão, já memorizada
+    subs = data_version.assinaturas()
+    if not subs:
+        return None
+    subs = sorted((a for a in subs if a["sub_id"] is not None), key=lambda a: -a["linhas"])
+
+    sql = f"""
+        SELECT {_SQL_LISTA_SIMPLES_COLUNAS}
+        {_SQL_LISTA_SIMPLES_ORIGEM}
+          AND p.SubUnidadeAtual = :sub_id
+        ORDER BY p.Nome
+    """
+
+    def _buscar(sub_id):
+        with _paralelo_sem:
+            if token is not None:
+                token.check()
+            return _linhas_como_texto(mssql_query(sql, {"sub_id": sub_id}, token=token))
+
+    # maiores primeiro: o tempo total fica perto do da maior subseção
+    with ThreadPoolExecutor(max_workers=LISTA_SIMPLES_PARALELO, thread_name_prefix="lista-particao") as pool:
+        futuros = [(a["subsecao"], pool.submit(_buscar, a["sub_id"])) for a in subs]
+        try:
+            particoes = [(nome, f.result()) for nome, f in futuros]
+        except BaseException:
+            for _, f in futuros:
+                f.cancel()
+            raise
+    return [(nome, linhas) for nome, linhas in particoes if linhas]
+
+
+def _unir_particoes(particoes: list, por_subsecao: bool) -> pd.DataFrame:
+    """
+    Monta o DataFrame a partir das partições.
+    - por_subsecao=False: k-way merge (heapq.merge) pela chave do nome, mantendo
+      a ordem global da consulta única;
+    - por_subsecao=True (PDF multi): subseções em ordem alfabética, uma após a
+      outra; df.attrs["particoes"] = [(subsecao, inicio, fim)] evita que a
+      renderização precise separar o DataFrame de novo.
+    """
+    grupos = {}
+    for nome, linhas in particoes:
+        grupos.setdefault(nome, []).append(linhas)
+
+    def _merge(listas):
+        if len(listas) == 1:
+            return listas[0]
+        return list(heapq.merge(*listas, key=lambda r: _chave_nome(r["Nome"])))
+
+    if not por_subsecao:
+        df = pd.DataFrame(_merge([l for listas in grupos.values() for l in listas]))
+        return df
+
+    linhas, limites = [], []
+    for nome in sorted(grupos):
+        bloco = _merge(grupos[nome])
+        limites.append((nome, len(linhas), len(linhas) + len(bloco)))
+        linhas.extend(bloco)
+    df = pd.DataFrame(linhas)
+    df.attrs["particoes"] = limites
+    return df
+
+
+def _consulta_lista_simples(subsecao_like: str | None, token: CancelToken | None = None,
+                            por_subsecao: bool = False) -> pd.DataFrame:
+    """
+    Consulta base com filtro opcional de subseção: do snapshot local quando
+    habilitado e dentro da tolerância, senão do SQL Server (a geral, em
+    paralelo por subseção quando LISTA_SIMPLES_PARALELO > 1).
+    df.attrs["dados_em"] traz a data do snapshot usado (None = ao vivo).
+    """
     try:
-        filtro = ""
-        params = {}
-        if subsecao_like:
-            filtro = "AND suc.NomeSubUnidade LIKE :sub"
-            params["sub"] = f"%{subsecao_like}%"
+        rows, atual = snapshot.consultar("lista_simples", "lista_simples", *_filtro_snapshot_lista_simples(subsecao_like))
+        if rows is not None:
+            df = pd.DataFrame(_linhas_como_texto(rows))
+            df.attrs["dados_em"] = atual["gerado_em"]
+            return df
 
+        if not subsecao_like:
+            inicio = time.perf_counter()
+            particoes = _consulta_lista_simples_particionada(token)
+            if particoes is not None:
+                df = _unir_particoes(particoes, por_subsecao)
+                memory_budget.registrar_consulta(len(df), time.perf_counter() - inicio)
+                return df
+
+        filtro, params = _filtro_lista_simples(subsecao_like)
         sql = f"""
-            SELECT 
-                p.RegistroConselhoAtual AS OAB, 
-                p.Nome,
-                p.CPFCNPJ,
-                s.Descricao AS Situacao,
-                FORMAT(p.DataNascimentoFundacao, 'dd/MM/yyyy') AS DataNascimento,
-                FORMAT(p.DataCompromisso, 'dd/MM/yyyy') AS DataCompromisso,
-                p.TelefoneCelular, 
-                COALESCE(p.EmailCorreio, p.EmailComercial) AS Email,
-                suc.NomeSubUnidade AS Subsecao
-            FROM Pessoa p
-            JOIN SubUnidadeConselho suc ON p.SubUnidadeAtual = suc.ID
-            JOIN Situacao s ON p.SituacaoAtual = s.ID
-            WHERE p.TipoCategoria = 20
-              AND p.SituacaoAtual = 14
+            SELECT {_SQL_LISTA_SIMPLES_COLUNAS}
+            {_SQL_LISTA_SIMPLES_ORIGEM}
               {filtro}
             ORDER BY p.Nome
         """
-        
-        with MSSQLSession() as s:
-            rows = s.execute(text(sql), params).mappings().all()
-        
-        # Converte para DataFrame garantindo que todos os valores são strings ou None
-        data = []
-        for row in rows:
-            row_dict = {}
-            for key, value in row.items():
-                if value is None:
-                    row_dict[key] = ""
-                else:
-                    row_dict[key] = str(value)
-            data.append(row_dict)
-        
-        return pd.DataFrame(data)
-        
+
+        inicio = time.perf_counter()
+        rows = mssql_query(sql, params, token=token)
+        memory_budget.registrar_consulta(len(rows), time.perf_counter() - inicio)
+
+        return pd.DataFrame(_linhas_como_texto(rows))
+
+    except Cancelado:
+        raise
     except Exception as e:
-        print(f"Erro na consulta: {e}")
-        traceback.print_exc()
+        log.exception("Erro na consulta")
         return pd.DataFrame()
 
 
+def preload():
+    """
+    Pré-carrega o estado somente-leitura barato (caminho da logo) e valida o
+    registro de relatórios. Chamado por create_app quando PRELOAD está ativo.
+    Não importa as bibliotecas de renderização; para isso use warmup().
+    """
+    pdf_context.caminho_logo()
+    log.info("Preload concluído (%d relatórios registrados em /run)", len(RELATORIOS_RUN))
+
+
+def warmup() -> dict:
+    """
+    Importa antecipadamente pandas/reportlab/openpyxl, monta o contexto de PDF
+    (estilos, logo, layouts) e aquece as métricas de fonte, para que a
+    primeira exportação não pague esse custo. Chamado por
+    create_app quando WARMUP está ativo (útil com gunicorn --preload, em que o
+    master importa uma vez e os workers herdam as páginas).
+    """
+    tempos = warm(*MODULOS_RENDERIZACAO)
+    from reportlab.platypus import Paragraph
+    from reportlab.lib.units import mm
+    inicio = time.perf_counter()
+    ctx = pdf_context.contexto()
+    tempos["pdf_context"] = time.perf_counter() - inicio
+    Paragraph("pré-carga", ctx.estilos["Normal"]).wrap(100 * mm, 20 * mm)
+    return tempos
+
+
 # ---------- PDF: Com suporte a orientação retrato/paisagem ----------
-def _pdf_from_df(df: pd.DataFrame, titulo: str, subsecao: str, campos_selecionados: list = None, orientacao: str = "paisagem") -> io.BytesIO:
-    buf = io.BytesIO()
+# Verificação de cancelamento a cada N linhas nos laços de renderização
+CANCEL_CHECK_ROWS = 500
 
-    # Definir orientação da página baseada no parâmetro
-    if orientacao == "retrato":
-        page_size = A4  # A4 retrato
-        left_margin = right_margin = 20 * mm
-        top_margin = 30 * mm
-        bottom_margin = 25 * mm
-    else:
-        page_size = landscape(A4)  # A4 paisagem (padrão)
-        left_margin = right_margin = 12 * mm
-        top_margin = 24 * mm
-        bottom_margin = 20 * mm
 
+def _pdf_from_df(df: pd.DataFrame, titulo: str, subsecao: str, campos_selecionados: list = None, orientacao: str = "paisagem", token: CancelToken | None = None) -> io.BytesIO:
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table
+
+    # Estilos, logo, TableStyle e colunas vêm prontos do contexto do processo (pdf_context.py)
+    ctx = pdf_context.contexto()
+    layout = ctx.layout(orientacao)
+
+    buf = io.BytesIO()
     doc = SimpleDocTemplate(
         buf,
-        pagesize=page_size,
-        leftMargin=left_margin,
-        rightMargin=right_margin,
-        topMargin=top_margin,
-        bottomMargin=bottom_margin,
+        pagesize=layout.page_size,
+        leftMargin=layout.left_margin,
+        rightMargin=layout.right_margin,
+        topMargin=layout.top_margin,
+        bottomMargin=layout.bottom_margin,
     )
 
-    styles = getSampleStyleSheet()
-    styles.add(ParagraphStyle(name="Tiny", fontSize=8, leading=10))
-    styles.add(ParagraphStyle(name="TitleCenter", parent=styles["Heading1"], alignment=1))
-
-    # tenta 2 nomes de arquivo para a logo
-    base_dir = os.path.dirname(__file__)
-    logo_candidates = [
-        os.path.join(base_dir, "static", "logos", "logo_oabms.png"),
-        os.path.join(base_dir, "static", "logos", "logo-oab.png"),
-        os.path.join(base_dir, "static", "logo_oabms.png"),
-        os.path.join(base_dir, "static", "logo-oab.png"),
-    ]
-    logo_path = next((p for p in logo_candidates if os.path.exists(p)), None)
+    # Mesma data em todas as páginas do documento
+    info = f"Subseção: {subsecao or 'Geral'}  |  Gerado em: {dt.datetime.now().strftime('%d/%m/%Y %H:%M')}"
 
     def _header_footer(canv, _doc):
-        canv.saveState()
-        W, H = page_size
-
-        # --- Cabeçalho ---
-        # Logo à esquerda
-        if logo_path:
-            try:
-                img_w, img_h = 28*mm, 14*mm
-                canv.drawImage(
-                    logo_path,
-                    left_margin,
-                    H - img_h - 6*mm,
-                    width=img_w,
-                    height=img_h,
-                    preserveAspectRatio=True,
-                    mask='auto'
-                )
-            except Exception:
-                pass
-
-        # Título centralizado
-        canv.setFont("Helvetica-Bold", 14)
-        canv.drawCentredString(W/2, H - 12*mm, titulo)
-
-        # Texto à direita: Subseção + data
-        info = f"Subseção: {subsecao or 'Geral'}  |  Gerado em: {dt.datetime.now().strftime('%d/%m/%Y %H:%M')}"
-        canv.setFont("Helvetica", 9)
-        canv.drawRightString(W - right_margin, H - 17*mm, info)
-
-        # --- Rodapé (LGPD) em TODAS as páginas ---
-        lgpd_txt = (
-            "LGPD – Aviso: Este relatório contém dados pessoais destinados exclusivamente às atividades "
-            "institucionais da OAB/MS. É vedado o uso para fins distintos, devendo o destinatário adotar "
-            "medidas de segurança compatíveis com a Lei nº 13.709/2018."
-        )
-        p = Paragraph(lgpd_txt, styles["Tiny"])
-        avail_w = W - left_margin - right_margin
-        w, h = p.wrap(avail_w, 30*mm)
-        p.drawOn(canv, left_margin, bottom_margin - h + 2)
-
-        canv.restoreState()
+        # chamado a cada página: interrompe o build se a requisição foi cancelada
+        if token is not None:
+            token.check()
+        ctx.moldura(canv, layout, titulo, info)
 
     # -------- Story (tabela) --------
     story = []
 
     if df is None or df.empty:
-        story.append(Paragraph("Nenhum registro encontrado.", styles["Normal"]))
+        story.append(Paragraph("Nenhum registro encontrado.", ctx.estilos["Normal"]))
         doc.build(story, onFirstPage=_header_footer, onLaterPages=_header_footer)
         buf.seek(0)
         return buf
 
-    # NOVO: Configurar colunas e larguras dinamicamente baseado nos campos selecionados
-    if campos_selecionados:
-        # Configurações diferentes para retrato vs paisagem
-        if orientacao == "retrato":
-            campo_config = {
-                "OAB": {"col": "OAB", "width": 20*mm, "display": "OAB"},
-                "Nome": {"col": "Nome", "width": 80*mm, "display": "Nome"},
-                "CPF/CNPJ": {"col": "CPFCNPJ", "width": 30*mm, "display": "CPF/CNPJ"},
-                "Situacao": {"col": "Situacao", "width": 25*mm, "display": "Situação"},
-                "DataNascimento": {"col": "DataNascimento", "width": 28*mm, "display": "Data Nasc."},
-                "DataCompromisso": {"col": "DataCompromisso", "width": 28*mm, "display": "Compromisso"},
-                "TelefoneCelular": {"col": "TelefoneCelular", "width": 32*mm, "display": "Celular"},
-                "Email": {"col": "Email", "width": 65*mm, "display": "E-mail"},
-                "Subsecao": {"col": "Subsecao", "width": 35*mm, "display": "Subseção"}
-            }
-        else:  # paisagem
-            campo_config = {
-                "OAB": {"col": "OAB", "width": 16*mm, "display": "OAB"},
-                "Nome": {"col": "Nome", "width": 65*mm, "display": "Nome"},
-                "CPF/CNPJ": {"col": "CPFCNPJ", "width": 27*mm, "display": "CPF/CNPJ"},
-                "Situacao": {"col": "Situacao", "width": 20*mm, "display": "Situação"},
-                "DataNascimento": {"col": "DataNascimento", "width": 22*mm, "display": "Data Nasc."},
-                "DataCompromisso": {"col": "DataCompromisso", "width": 25*mm, "display": "Compromisso"},
-                "TelefoneCelular": {"col": "TelefoneCelular", "width": 25*mm, "display": "Celular"},
-                "Email": {"col": "Email", "width": 62*mm, "display": "E-mail"},
-                "Subsecao": {"col": "Subsecao", "width": 27*mm, "display": "Subseção"}
-            }
-        
-        # Construir listas de colunas e larguras apenas para campos selecionados
-        columns = []
-        col_widths = []
-        df_columns = []
-        
-        for campo in campos_selecionados:
-            if campo in campo_config and campo_config[campo]["col"] in df.columns:
-                config = campo_config[campo]
-                columns.append(config["display"])
-                col_widths.append(config["width"])
-                df_columns.append(config["col"])
-        
-        # Filtrar DataFrame para incluir apenas as colunas selecionadas
-        if df_columns:
-            df = df[df_columns]
-            
-        # Renomear colunas para display
-        rename_dict = {}
-        for campo in campos_selecionados:
-            if campo in campo_config and campo_config[campo]["col"] in df.columns:
-                old_name = campo_config[campo]["col"]
-                new_name = campo_config[campo]["display"]
-                rename_dict[old_name] = new_name
-        
-        if rename_dict:
-            df = df.rename(columns=rename_dict)
-    else:
-        # Configuração padrão - ajustar baseado na orientação
-        df = df.rename(columns={
-            "Situacao": "Situação",
-            "DataNascimento": "Data Nasc.",
-            "DataCompromisso": "Compromisso",
-            "TelefoneCelular": "Celular",
-            "Subsecao": "Subseção",
-            "CPFCNPJ": "CPF/CNPJ"
-        })
-        
-        columns = ["OAB","Nome","CPF/CNPJ","Situação","Data Nasc.","Compromisso","Celular","E-mail","Subseção"]
-        
-        if orientacao == "retrato":
-            col_widths = [20*mm, 80*mm, 30*mm, 25*mm, 28*mm, 28*mm, 32*mm, 65*mm, 35*mm]
-        else:  # paisagem
-            col_widths = [16*mm, 65*mm, 27*mm, 20*mm, 22*mm, 25*mm, 25*mm, 62*mm, 27*mm]
+    # Colunas e larguras dos campos selecionados (ou o layout padrão da orientação)
+    columns, col_widths, df_columns = layout.colunas(campos_selecionados, df.columns)
+    if df_columns:
+        df = df[list(df_columns)]
+    # (os rótulos de exibição ficam em `columns`; o DataFrame não é renomeado)
+
+    estilo_celula = ctx.estilo_celula
 
     def P(text):
-        return Paragraph((str(text) if text is not None else "").replace("&", "&amp;"), styles["Tiny"])
-
-    data = [columns]
-    for _, r in df.iterrows():
-        row_data = []
-        for col in df.columns:
-            row_data.append(P(r.get(col, "")))
-        data.append(row_data)
-
-    tbl = Table(data, colWidths=col_widths, repeatRows=1)
-    tbl.setStyle(TableStyle([
-        ("BACKGROUND", (0,0), (-1,0), colors.HexColor("#23364B")),
-        ("TEXTCOLOR",  (0,0), (-1,0), colors.white),
-        ("ALIGN",      (0,0), (-1,0), "CENTER"),
-        ("FONTNAME",   (0,0), (-1,0), "Helvetica-Bold"),
-        ("FONTSIZE",   (0,0), (-1,0), 9),
-        ("BOTTOMPADDING", (0,0), (-1,0), 6),
-
-        ("FONTNAME", (0,1), (-1,-1), "Helvetica"),
-        ("FONTSIZE", (0,1), (-1,-1), 8),
-        ("VALIGN",   (0,1), (-1,-1), "TOP"),
-        ("ROWBACKGROUNDS", (0,1), (-1,-1), [colors.whitesmoke, colors.HexColor("#F7F9FC")]),
-        ("GRID", (0,0), (-1,-1), 0.25, colors.HexColor("#B6C2CF")),
-    ]))
+        return Paragraph((str(text) if text is not None else "").replace("&", "&amp;"), estilo_celula)
+
+    data = [list(columns)]
+    # itertuples não cria uma Series por linha (iterrows criava)
+    for i, linha in enumerate(df.itertuples(index=False, name=None)):
+        if token is not None and i % CANCEL_CHECK_ROWS == 0:
+            token.check()
+        data.append([P(v) for v in linha])
+
+    tbl = Table(data, colWidths=list(col_widths), repeatRows=1)
+    tbl.setStyle(ctx.estilo_tabela)
 
     story.append(tbl)
     story.append(Spacer(1, 6))  # respiro final
@@ -372,7 +507,7 @@ def _pdf_from_df(df: pd.DataFrame, titulo: str, subsecao: str, campos_selecionad
     return buf
 
 
-def _excel_from_df(df: pd.DataFrame, titulo: str, subsecao: str, campos_selecionados: list = None) -> io.BytesIO:
+def _excel_from_df(df: pd.DataFrame, titulo: str, subsecao: str, campos_selecionados: list = None, token: CancelToken | None = None) -> io.BytesIO:
     """Gera arquivo Excel com formatação melhorada."""
     try:
         bio = io.BytesIO()
@@ -380,26 +515,16 @@ def _excel_from_df(df: pd.DataFrame, titulo: str, subsecao: str, campos_selecion
         # Prepara os dados
         if df.empty:
             df_export = pd.DataFrame({"Mensagem": ["Nenhum registro encontrado"]})
+            cabecalho = True
         else:
-            df_export = df.copy()
-            # Renomeia colunas para português apenas se elas existirem
-            rename_map = {
-                "Situacao": "Situação",
-                "DataNascimento": "Data Nascimento",
-                "DataCompromisso": "Data Compromisso",
-                "TelefoneCelular": "Telefone Celular",
-                "Subsecao": "Subseção",
-                "CPFCNPJ": "CPF/CNPJ"
-            }
-            # Aplicar apenas as renomeações para colunas que existem
-            rename_dict = {k: v for k, v in rename_map.items() if k in df_export.columns}
-            if rename_dict:
-                df_export = df_export.rename(columns=rename_dict)
+            # Sem cópia/rename do DataFrame: os rótulos em português vão só no cabeçalho
+            df_export = df
+            cabecalho = [ROTULOS_COLUNAS.get(c, c) for c in df.columns]
         
         # Cria o arquivo Excel
         with pd.ExcelWriter(bio, engine="openpyxl") as writer:
             # Escreve os dados
-            df_export.to_excel(writer, index=False, sheet_name="Lista de Inscritos", startrow=3)
+            df_export.to_excel(writer, index=False, sheet_name="Lista de Inscritos", startrow=3, header=cabecalho)
             
             # Acessa o workbook e worksheet
             workbook = writer.book
@@ -438,6 +563,8 @@ def _excel_from_df(df: pd.DataFrame, titulo: str, subsecao: str, campos_selecion
                 
                 # Aplica bordas aos dados
                 for row in range(4, len(df_export) + 5):
+                    if token is not None and row % CANCEL_CHECK_ROWS == 0:
+                        token.check()
                     for col in range(1, len(df_export.columns) + 1):
                         worksheet.cell(row=row, column=col).border = thin_border
                 
@@ -457,9 +584,10 @@ def _excel_from_df(df: pd.DataFrame, titulo: str, subsecao: str, campos_selecion
         bio.seek(0)
         return bio
         
+    except Cancelado:
+        raise
     except Exception as e:
-        print(f"Erro ao gerar Excel: {e}")
-        traceback.print_exc()
+        log.exception("Erro ao gerar Excel")
         # Fallback simples
         bio = io.BytesIO()
         with pd.ExcelWriter(bio, engine="openpyxl") as writer:
@@ -468,7 +596,68 @@ def _excel_from_df(df: pd.DataFrame, titulo: str, subsecao: str, campos_selecion
         return bio
 
 
-def _csv_from_df(df: pd.DataFrame, titulo: str, subsecao: str, campos_selecionados: list = None) -> io.BytesIO:
+# Rótulos das colunas nas planilhas/CSV (apenas as que existirem no DataFrame)
+ROTULOS_COLUNAS = {
+    "Situacao": "Situação",
+    "DataNascimento": "Data Nascimento",
+    "DataCompromisso": "Data Compromisso",
+    "TelefoneCelular": "Telefone Celular",
+    "Subsecao": "Subseção",
+    "CPFCNPJ": "CPF/CNPJ",
+}
+
+
+def _excel_streaming_from_df(df: pd.DataFrame, titulo: str, subsecao: str, token: CancelToken | None = None) -> io.BytesIO:
+    """
+    Excel em modo write_only do openpyxl: as linhas são gravadas uma a uma,
+    sem manter as células em memória. Usado quando _excel_from_df não cabe no
+    orçamento de memória; a formatação é reduzida (sem bordas por célula).
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, Alignment, PatternFill
+    from openpyxl.utils import get_column_letter
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Lista de Inscritos")
+    colunas = [ROTULOS_COLUNAS.get(c, c) for c in df.columns]
+
+    # No modo write_only as larguras precisam ser definidas antes das linhas
+    for i, (original, rotulo) in enumerate(zip(df.columns, colunas), 1):
+        maior = df[original].astype(str).str.len().max() if len(df) else 0
+        ws.column_dimensions[get_column_letter(i)].width = min(max(len(rotulo), int(maior or 0)) + 2, 50)
+
+    def _celula(valor, **estilo):
+        c = WriteOnlyCell(ws, value=valor)
+        for k, v in estilo.items():
+            setattr(c, k, v)
+        return c
+
+    ws.append([_celula(titulo, font=Font(bold=True, size=14))])
+    ws.append([_celula(
+        f"Subseção: {subsecao or 'Geral'} | Gerado em: {dt.datetime.now().strftime('%d/%m/%Y %H:%M')}",
+        font=Font(size=10),
+    )])
+    ws.append([])
+    cabecalho_font = Font(bold=True, color="FFFFFF")
+    cabecalho_fill = PatternFill(start_color="23364B", end_color="23364B", fill_type="solid")
+    ws.append([
+        _celula(c, font=cabecalho_font, fill=cabecalho_fill, alignment=Alignment(horizontal="center"))
+        for c in colunas
+    ])
+
+    for i, linha in enumerate(df.itertuples(index=False, name=None)):
+        if token is not None and i % CANCEL_CHECK_ROWS == 0:
+            token.check()
+        ws.append(linha)
+
+    bio = io.BytesIO()
+    wb.save(bio)
+    bio.seek(0)
+    return bio
+
+
+def _csv_from_df(df: pd.DataFrame, titulo: str, subsecao: str, campos_selecionados: list = None, token: CancelToken | None = None) -> io.BytesIO:
     """Gera arquivo CSV limpo para importações - apenas dados, sem cabeçalhos informativos."""
     try:
         bio = io.BytesIO()
@@ -478,31 +667,27 @@ def _csv_from_df(df: pd.DataFrame, titulo: str, subsecao: str, campos_selecionad
             csv_content = "Nenhum registro encontrado\n"
             bio.write(csv_content.encode('utf-8-sig'))
         else:
-            # Renomeia colunas para português apenas se elas existirem
-            rename_map = {
-                "Situacao": "Situação",
-                "DataNascimento": "Data Nascimento", 
-                "DataCompromisso": "Data Compromisso",
-                "TelefoneCelular": "Telefone Celular",
-                "Subsecao": "Subseção",
-                "CPFCNPJ": "CPF/CNPJ"
-            }
-            # Aplicar apenas as renomeações para colunas que existem
-            rename_dict = {k: v for k, v in rename_map.items() if k in df.columns}
-            if rename_dict:
-                df_export = df.rename(columns=rename_dict)
-            else:
-                df_export = df.copy()
+            # Rótulos em português só no cabeçalho (sem copiar/renomear o DataFrame)
+            cabecalho = [ROTULOS_COLUNAS.get(c, c) for c in df.columns]
             
-            # Gera CSV limpo - apenas cabeçalho das colunas + dados
-            df_export.to_csv(bio, index=False, sep=";", encoding="utf-8-sig")
+            # Gera CSV limpo - apenas cabeçalho das colunas + dados.
+            # Escrito em blocos (BOM uma única vez) para checar cancelamento.
+            bio.write("\ufeff".encode("utf-8"))
+            bloco = CANCEL_CHECK_ROWS * 20
+            for inicio in range(0, len(df), bloco):
+                if token is not None:
+                    token.check()
+                df.iloc[inicio:inicio + bloco].to_csv(
+                    bio, index=False, sep=";", encoding="utf-8", header=cabecalho if inicio == 0 else False
+                )
         
         bio.seek(0)
         return bio
         
+    except Cancelado:
+        raise
     except Exception as e:
-        print(f"Erro ao gerar CSV: {e}")
-        traceback.print_exc()
+        log.exception("Erro ao gerar CSV")
         # Fallback simples
         bio = io.BytesIO()
         (df or pd.DataFrame()).to_csv(bio, index=False, sep=";", encoding="utf-8-sig")
@@ -513,14 +698,17 @@ def _csv_from_df(df: pd.DataFrame, titulo: str, subsecao: str, campos_selecionad
 # -------------------------------------------------------
 #                SUPORTE: SUBSEÇÕES PARA UI
 # -------------------------------------------------------
-@bp.get("/subsecoes")
-@require_auth
-def subsecoes():
-    """
-    Endpoint para buscar lista de subseções disponíveis.
-    Retorna apenas subseções com TipoSubUnidade = 2 (subseções ativas).
-    """
-    try:
+# A lista de subseções quase nunca muda: memorizada por processo
+SUBSECOES_CACHE_TTL = int(os.getenv("SUBSECOES_CACHE_TTL", "600"))
+_subsecoes_cache = {"em": 0.0, "items": None}
+_subsecoes_lock = threading.Lock()
+
+
+def listar_subsecoes() -> list:
+    """Subseções ativas (TipoSubUnidade = 2): [{"id", "nome"}], ordenadas por nome."""
+    with _subsecoes_lock:  # uma consulta por vez; as demais aguardam e reaproveitam
+        if _subsecoes_cache["items"] is not None and time.monotonic() - _subsecoes_cache["em"] < SUBSECOES_CACHE_TTL:
+            return _subsecoes_cache["items"]
         with MSSQLSession() as s:
             rows = s.execute(text("""
                 SELECT ID, NomeSubUnidade
@@ -528,150 +716,653 @@ def subsecoes():
                 WHERE TipoSubUnidade = 2
                 ORDER BY NomeSubUnidade
             """)).mappings().all()
-        
-        items = [
-            {"id": r["ID"], "nome": r["NomeSubUnidade"]} 
+        _subsecoes_cache["items"] = [
+            {"id": r["ID"], "nome": r["NomeSubUnidade"]}
             for r in rows if r["NomeSubUnidade"]
         ]
-        
-        return jsonify({"items": items})
+        _subsecoes_cache["em"] = time.monotonic()
+        return _subsecoes_cache["items"]
+
+
+@bp.get("/subsecoes")
+@require_auth
+def subsecoes():
+    """
+    Endpoint para buscar lista de subseções disponíveis.
+    Retorna apenas subseções com TipoSubUnidade = 2 (subseções ativas).
+    """
+    try:
+        return jsonify({"items": listar_subsecoes()})
     except Exception as e:
-        print(f"Erro ao buscar subseções: {e}")
-        traceback.print_exc()
+        log.exception("Erro ao buscar subseções")
         return jsonify({"error": "Erro ao buscar subseções", "items": []}), 500
 
 
 # -------------------------------------------------------
 #            ENDPOINT PRINCIPAL: LISTA SIMPLES
 # -------------------------------------------------------
-# Correção do endpoint lista_simples no arquivo reports.py
-# Substituir a função lista_simples existente por esta versão corrigida:
+FORMATOS_LISTA_SIMPLES = ["pdf", "xlsx", "csv"]
+TITULO_LISTA_SIMPLES = "Relatório simples de Inscritos"
+
+# Mapear nomes do frontend para nomes do DataFrame
+CAMPO_MAP_LISTA_SIMPLES = {
+    "OAB": "OAB",
+    "Nome": "Nome",
+    "CPF/CNPJ": "CPFCNPJ",
+    "Situacao": "Situacao",
+    "DataNascimento": "DataNascimento",
+    "DataCompromisso": "DataCompromisso",
+    "TelefoneCelular": "TelefoneCelular",
+    "Email": "Email",
+    "Subsecao": "Subsecao"
+}
+
+
+def _parametros_lista_simples(args) -> dict:
+    """
+    Lê e normaliza os parâmetros da lista simples.
+    Parâmetros que não afetam o resultado são descartados, para que
+    requisições equivalentes gerem a mesma chave de coalescência.
+    `formato` pode listar vários formatos (pacote ZIP, ex.: "pdf,xlsx,csv");
+    a lista é normalizada na ordem de FORMATOS_LISTA_SIMPLES, sem repetição.
+    """
+    pedidos = {f.strip() for f in (args.get("formato") or "pdf").lower().split(",") if f.strip()} or {"pdf"}
+    ordem = {f: i for i, f in enumerate(FORMATOS_LISTA_SIMPLES)}
+    formato = ",".join(sorted(pedidos, key=lambda f: (ordem.get(f, len(ordem)), f)))
+    tem_pdf = "pdf" in pedidos
+    subsecao = (args.get("subsecao") or "").strip()
+    modo = (args.get("modo") or "").lower()  # "multi" => zip por subseção
+
+    # Receber campos selecionados e orientação
+    campos_param = args.get("campos", "")
+    campos_selecionados = [c.strip() for c in campos_param.split(",") if c.strip()] if campos_param else []
+    orientacao = args.get("orientacao", "paisagem")  # padrão: paisagem
+
+    # Validação da orientação para PDFs
+    if tem_pdf and orientacao not in ["retrato", "paisagem"]:
+        log.warning("Orientação '%s' inválida, usando 'paisagem' como padrão", orientacao)
+        orientacao = "paisagem"
+
+    return {
+        "formato": formato,
+        "subsecao": subsecao,
+        "modo": "multi" if (tem_pdf and not subsecao and modo == "multi") else "",
+        "campos": campos_selecionados,
+        "orientacao": orientacao if tem_pdf else "",
+    }
+
+
+def _formatos(params: dict) -> list:
+    """Formatos pedidos (mais de um = pacote ZIP)."""
+    return params["formato"].split(",")
+
+
+def _filtrar_campos(df: pd.DataFrame, campos_selecionados: list) -> pd.DataFrame:
+    """Filtra o DataFrame para as colunas escolhidas no frontend (na ordem escolhida)."""
+    if not campos_selecionados or df.empty:
+        return df
+
+    colunas_filtradas = []
+    for campo in campos_selecionados:
+        if campo in CAMPO_MAP_LISTA_SIMPLES and CAMPO_MAP_LISTA_SIMPLES[campo] in df.columns:
+            colunas_filtradas.append(CAMPO_MAP_LISTA_SIMPLES[campo])
+
+    if colunas_filtradas:
+        df = df[colunas_filtradas]
+    return df
+
+
+def _nome_seguro(nome: str) -> str:
+    """Nome de arquivo seguro (remove caracteres especiais)."""
+    return "".join(c for c in nome if c.isalnum() or c in (' ', '-', '_')).rstrip()
+
+
+def _gerar_lista_simples(params: dict, token: CancelToken | None = None) -> dict:
+    """
+    Executa a consulta e renderiza o arquivo da lista simples (ou, com
+    vários formatos, o pacote ZIP, a partir da mesma consulta).
+    Retorna {"conteudo", "mimetype", "download_name", "linhas", "dados_em"} ou {"error", "status"}.
+    O resultado é serializável (bytes), para poder ser compartilhado entre
+    requisições coalescidas e entre processos.
+    """
+    subsecao = params["subsecao"]
+    campos_selecionados = params["campos"]
+
+    # Busca os dados
+    escopo = subsecao or "Geral"
+    df = _consulta_lista_simples(subsecao or None, token, por_subsecao=params["modo"] == "multi")
+    dados_em = df.attrs.get("dados_em")
+    particoes = df.attrs.get("particoes")
+    df = _filtrar_campos(df, campos_selecionados)
+    df.attrs["particoes"] = particoes
+
+    # Orçamento de memória: estima antes de renderizar e, se não couber,
+    # troca para a variante em streaming ou recusa (em vez de derrubar o worker)
+    planos = {}
+    for formato in _formatos(params):
+        multi = formato == "pdf" and params["modo"] == "multi" and not df.empty and "Subsecao" in df.columns
+        linhas_render = int(df["Subsecao"].value_counts().max()) if multi else len(df)
+        plano, estimativa = memory_budget.planejar(formato, linhas_render, len(df.columns))
+        if plano is None:
+            return {
+                "error": (
+                    f"Relatório grande demais para {formato.upper()} ({len(df)} linhas, "
+                    f"~{estimativa // 2**20} MB estimados; limite {memory_budget.EXPORT_MEMORY_BUDGET_MB} MB). "
+                    "Filtre por subseção, reduza os campos ou use CSV."
+                ),
+                "status": 413,
+            }
+        planos[formato] = (plano, linhas_render)
+
+    if len(planos) > 1:
+        # Pacote: o despejo é compartilhado pelas renderizações (cada uma segura uma referência)
+        despejo = spill.despejar(df)
+        del df
+        try:
+            resultado = _renderizar_pacote(despejo, params, escopo, planos, token)
+        finally:
+            despejo.liberar()
+        resultado["dados_em"] = dados_em
+        return resultado
+
+    (plano, linhas_render), = planos.values()
+    with memory_budget.medir(plano, linhas_render, len(df.columns)) as medicao:
+        # Resultado grande vai para um arquivo Arrow mapeado; o DataFrame em memória é descartado
+        with spill.despejar(df) as df:
+            resultado = _renderizar_lista_simples(df, params, escopo, plano, token)
+        medicao.saida_bytes = len(resultado.get("conteudo") or b"")
+    resultado["dados_em"] = dados_em
+    return resultado
+
+
+def _renderizar_pacote(despejo: spill.Despejo, params: dict, escopo: str, planos: dict,
+                       token: CancelToken | None = None) -> dict:
+    """
+    Pacote ZIP com um arquivo por formato, todos a partir do mesmo resultado.
+    As renderizações rodam ao mesmo tempo (uma thread por formato) quando a
+    soma das estimativas de memória cabe no orçamento; senão, uma de cada vez.
+    Se uma falha, as demais são interrompidas pelo token compartilhado.
+    """
+    colunas = len(despejo.df.columns)
+    linhas = len(despejo.df)
+    estimativa = sum(memory_budget.estimar(plano, n, colunas) for plano, n in planos.values())
+    paralelo = (memory_budget.EXPORT_MEMORY_BUDGET_MB <= 0
+                or estimativa <= memory_budget.EXPORT_MEMORY_BUDGET_MB * 2**20)
+
+    # token próprio: segue o da requisição e é cancelado quando um formato falha
+    interno = CancelToken(token.restante() if token is not None else None)
+    desfazer = token.on_cancel(lambda: interno.cancel(token.motivo)) if token is not None else (lambda: None)
+
+    def _renderizar(formato: str) -> dict:
+        plano, linhas_render = planos[formato]
+        with despejo.adquirir() as df, memory_budget.medir(plano, linhas_render, colunas) as medicao:
+            resultado = _renderizar_lista_simples(df, {**params, "formato": formato}, escopo, plano, interno)
+            medicao.saida_bytes = len(resultado.get("conteudo") or b"")
+        return resultado
+
+    try:
+        if paralelo:
+            with ThreadPoolExecutor(max_workers=len(planos), thread_name_prefix="lista-pacote") as pool:
+                futuros = {pool.submit(_renderizar, f): f for f in planos}
+                resultados, falha = {}, None
+                # na ordem de término: a primeira falha é a causa; as seguintes são o cancelamento
+                for futuro in as_completed(futuros):
+                    try:
+                        resultados[futuros[futuro]] = futuro.result()
+                    except BaseException as e:
+                        if falha is None:
+                            falha = e
+                            interno.cancel("erro")
+                if falha is not None:
+                    raise falha
+                resultados = {f: resultados[f] for f in planos}
+        else:
+            log.info("Pacote %s com ~%d MB estimados; renderizando um formato por vez",
+                     ",".join(planos), estimativa // 2**20)
+            resultados = {f: _renderizar(f) for f in planos}
+    finally:
+        desfazer()
+    if token is not None:
+        token.check()
+
+    for resultado in resultados.values():
+        if "error" in resultado:
+            return resultado
+
+    memzip = io.BytesIO()
+    with zipfile.ZipFile(memzip, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for formato, resultado in resultados.items():
+            # PDF e XLSX já são comprimidos: vão sem recompressão
+            compressao = zipfile.ZIP_DEFLATED if formato == "csv" else zipfile.ZIP_STORED
+            if resultado["mimetype"] == "application/zip":
+                # PDF modo=multi: os PDFs por subseção vão para uma pasta do pacote
+                with zipfile.ZipFile(io.BytesIO(resultado["conteudo"])) as interno_zip:
+                    for info in interno_zip.infolist():
+                        zf.writestr(f"PDF_por_Subsecao/{info.filename}", interno_zip.read(info),
+                                    compress_type=zipfile.ZIP_STORED)
+            else:
+                zf.writestr(resultado["download_name"], resultado["conteudo"], compress_type=compressao)
+    return {
+        "conteudo": memzip.getvalue(),
+        "mimetype": "application/zip",
+        "download_name": f"Relatorio_Lista_Simples_{escopo}_pacote.zip",
+        "linhas": linhas,
+    }
+
+
+def _renderizar_lista_simples(df: pd.DataFrame, params: dict, escopo: str, plano: str,
+                              token: CancelToken | None = None) -> dict:
+    formato = params["formato"]
+    campos_selecionados = params["campos"]
+    orientacao = params["orientacao"]
+
+    # ---- PDF ----
+    if formato == "pdf":
+        # Quando geral + modo=multi => gera 1 PDF por subseção dentro de um ZIP
+        if params["modo"] == "multi" and not df.empty and "Subsecao" in df.columns:
+            # busca particionada: as fatias já vêm prontas (subseções contíguas)
+            particoes = df.attrs.get("particoes")
+            if particoes:
+                fatias = [(s, inicio, fim) for s, inicio, fim in particoes if s]
+            else:
+                fatias = [(s, None, None) for s in sorted(s for s in df["Subsecao"].dropna().unique().tolist() if s)]
+            if not fatias:
+                return {"error": "Nenhuma subseção encontrada", "status": 404}
+
+            memzip = io.BytesIO()
+            with zipfile.ZipFile(memzip, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
+                for s, inicio, fim in fatias:
+                    if token is not None:
+                        token.check()
+                    if inicio is None:
+                        dfi = df[df["Subsecao"] == s].reset_index(drop=True)
+                    else:
+                        dfi = df.iloc[inicio:fim].reset_index(drop=True)
+                    pdf = _pdf_from_df(dfi, TITULO_LISTA_SIMPLES, s, campos_selecionados, orientacao, token)
+                    zf.writestr(f"Relatorio_Lista_Simples_{_nome_seguro(s)}.pdf", pdf.getvalue())
+            return {
+                "conteudo": memzip.getvalue(),
+                "mimetype": "application/zip",
+                "download_name": "Relatorio_Lista_Simples_por_Subsecao.zip",
+                "linhas": len(df),
+            }
+
+        pdf = _pdf_from_df(df, TITULO_LISTA_SIMPLES, escopo, campos_selecionados, orientacao, token)
+
+        # Nome do arquivo inclui orientação para melhor identificação
+        orientacao_suffix = f"_{orientacao}" if orientacao == "retrato" else ""
+        return {
+            "conteudo": pdf.getvalue(),
+            "mimetype": "application/pdf",
+            "download_name": f"Relatorio_Lista_Simples_{escopo}{orientacao_suffix}.pdf",
+            "linhas": len(df),
+        }
+
+    # ---- XLSX ----
+    if formato == "xlsx":
+        if plano == "xlsx_streaming":
+            excel_file = _excel_streaming_from_df(df, TITULO_LISTA_SIMPLES, escopo, token)
+        else:
+            excel_file = _excel_from_df(df, TITULO_LISTA_SIMPLES, escopo, campos_selecionados, token)
+        return {
+            "conteudo": excel_file.getvalue(),
+            "mimetype": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            "download_name": f"Relatorio_Lista_Simples_{escopo}.xlsx",
+            "linhas": len(df),
+        }
+
+    # ---- CSV ----
+    csv_file = _csv_from_df(df, TITULO_LISTA_SIMPLES, escopo, campos_selecionados, token)
+    return {
+        "conteudo": csv_file.getvalue(),
+        "mimetype": "text/csv; charset=utf-8",
+        "download_name": f"Relatorio_Lista_Simples_{escopo}.csv",
+        "linhas": len(df),
+    }
+
+
+prewarm.registrar_gerador("lista_simples", _gerar_lista_simples)
+
+
+def _classe_lista_simples() -> str:
+    """Classe de custo da requisição atual para o controle de admissão."""
+    params = _parametros_lista_simples(request.args)
+    formatos = _formatos(params)
+    if len(formatos) > 1:
+        return "pacote"
+    if params["modo"] == "multi":
+        return "pdf_multi"
+    return formatos[0] if formatos[0] in FORMATOS_LISTA_SIMPLES else "json"
+
 
 @bp.get("/lista_simples")
 @require_auth
+@limite_exportacao
+@admissao(_classe_lista_simples)
 def lista_simples():
+    inicio = time.perf_counter()
     try:
-        # CORREÇÃO: Aceitar apenas formatos válidos
-        formato = (request.args.get("formato") or "pdf").lower()
-        subsecao = (request.args.get("subsecao") or "").strip()
-        modo = (request.args.get("modo") or "").lower()  # "multi" => zip por subseção
-        
-        # NOVO: Receber campos selecionados e orientação
-        campos_param = request.args.get("campos", "")
-        campos_selecionados = [c.strip() for c in campos_param.split(",") if c.strip()] if campos_param else []
-        orientacao = request.args.get("orientacao", "paisagem")  # padrão: paisagem
-        
-        # Debug: Log dos parâmetros recebidos
-        print(f"DEBUG - Parâmetros recebidos:")
-        print(f"  - formato: {formato}")
-        print(f"  - subsecao: {subsecao}")
-        print(f"  - orientacao: {orientacao}")
-        print(f"  - campos_selecionados: {campos_selecionados}")
-
-        # CORREÇÃO: Validação do formato - aceitar apenas pdf, xlsx, csv
-        if formato not in ["pdf", "xlsx", "csv"]:
+        params = _parametros_lista_simples(request.args)
+
+        log.debug("lista_simples: parâmetros recebidos", extra={"params": params})
+
+        # Validação do formato - aceitar apenas pdf, xlsx, csv (um ou vários, separados por vírgula)
+        invalidos = [f for f in _formatos(params) if f not in FORMATOS_LISTA_SIMPLES]
+        if invalidos:
             return jsonify({
-                "error": f"Formato inválido '{formato}'. Use: pdf, xlsx ou csv"
+                "error": f"Formato inválido '{','.join(invalidos)}'. Use: pdf, xlsx ou csv (ou vários, ex.: pdf,xlsx)"
             }), 400
+        formato_auditoria = params["formato"] if len(_formatos(params)) == 1 else "zip"
 
-        # CORREÇÃO: Validação da orientação para PDFs
-        if formato == "pdf" and orientacao not in ["retrato", "paisagem"]:
-            print(f"AVISO: Orientação '{orientacao}' inválida, usando 'paisagem' como padrão")
-            orientacao = "paisagem"
+        # Cache/pré-aquecimento; senão, requisições idênticas e simultâneas
+        # aguardam a mesma geração. A geração é abandonada se o prazo vencer
+        # ou se o cliente desconectar (sem outra requisição esperando).
+        resultado, compartilhado = _obter_resultado("lista_simples", params, _gerar_lista_simples, "lista_simples")
+        if compartilhado:
+            log.debug("lista_simples atendida por resultado compartilhado/cache")
 
-        # Busca os dados
-        if subsecao:
-            df = _consulta_lista_simples(subsecao)
-            escopo = subsecao
-        else:
-            df = _consulta_lista_simples(None)
-            escopo = "Geral"
-
-        # NOVO: Filtrar colunas se campos foram especificados
-        if campos_selecionados and not df.empty:
-            # Mapear nomes do frontend para nomes do DataFrame
-            campo_map = {
-                "OAB": "OAB",
-                "Nome": "Nome", 
-                "CPF/CNPJ": "CPFCNPJ",
-                "Situacao": "Situacao",
-                "DataNascimento": "DataNascimento", 
-                "DataCompromisso": "DataCompromisso",
-                "TelefoneCelular": "TelefoneCelular",
-                "Email": "Email",
-                "Subsecao": "Subsecao"
-            }
-            
-            # Converter campos selecionados para nomes de colunas do DataFrame
-            colunas_filtradas = []
-            for campo in campos_selecionados:
-                if campo in campo_map and campo_map[campo] in df.columns:
-                    colunas_filtradas.append(campo_map[campo])
-            
-            # Filtrar DataFrame apenas com as colunas selecionadas
-            if colunas_filtradas:
-                df = df[colunas_filtradas]
-
-        # ---- PDF ----
-        if formato == "pdf":
-            # Quando geral + modo=multi => gera 1 PDF por subseção dentro de um ZIP
-            if not subsecao and modo == "multi" and not df.empty and "Subsecao" in df.columns:
-                subs = sorted([s for s in df["Subsecao"].dropna().unique().tolist() if s])
-                if not subs:
-                    return jsonify({"error": "Nenhuma subseção encontrada"}), 404
-                    
-                memzip = io.BytesIO()
-                with zipfile.ZipFile(memzip, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
-                    for s in subs:
-                        dfi = df[df["Subsecao"] == s].reset_index(drop=True)
-                        pdf = _pdf_from_df(dfi, "Relatório simples de Inscritos", s, campos_selecionados, orientacao)
-                        # Nome de arquivo seguro (remove caracteres especiais)
-                        safe_name = "".join(c for c in s if c.isalnum() or c in (' ', '-', '_')).rstrip()
-                        zf.writestr(f"Relatorio_Lista_Simples_{safe_name}.pdf", pdf.getvalue())
-                memzip.seek(0)
-                return send_file(
-                    memzip,
-                    mimetype="application/zip",
-                    as_attachment=True,
-                    download_name="Relatorio_Lista_Simples_por_Subsecao.zip",
-                )
+        if "error" in resultado:
+            return jsonify({"error": resultado["error"]}), resultado["status"]
 
-            pdf = _pdf_from_df(df, "Relatório simples de Inscritos", escopo, campos_selecionados, orientacao)
-            
-            # CORREÇÃO: Nome do arquivo deve incluir orientação para melhor identificação
-            orientacao_suffix = f"_{orientacao}" if orientacao == "retrato" else ""
-            return send_file(
-                pdf,
-                mimetype="application/pdf",
-                as_attachment=True,
-                download_name=f"Relatorio_Lista_Simples_{escopo}{orientacao_suffix}.pdf",
-            )
+        # Auditoria LGPD: só enfileira (gravação em lote numa thread de fundo)
+        audit.registrar_download(
+            request.user["uid"], "lista_simples", params, formato_auditoria, resultado.get("linhas"),
+            len(resultado["conteudo"]), time.perf_counter() - inicio, request.remote_addr,
+        )
 
-        # ---- XLSX ----
-        elif formato == "xlsx":
-            excel_file = _excel_from_df(df, "Relatório simples de Inscritos", escopo, campos_selecionados)
-            return send_file(
-                excel_file,
-                mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                as_attachment=True,
-                download_name=f"Relatorio_Lista_Simples_{escopo}.xlsx",
+        if download_spool.deve_gravar(len(resultado["conteudo"])):
+            # Arquivo grande: vai para disco e é baixado por URL assinada (Range, retomada, sendfile)
+            link = download_spool.gravar(
+                resultado["conteudo"], resultado["download_name"], resultado["mimetype"],
+                resultado.get("dados_em"),
             )
+            url = url_for("reports.download", token=link["token"])
+            if request.args.get("entrega") == "link":
+                return jsonify({
+                    "url": url,
+                    "expira_em": link["expira_em"],
+                    "tamanho": link["tamanho"],
+                    "download_name": resultado["download_name"],
+                })
+            return redirect(url, code=303)
 
-        # ---- CSV ----
-        elif formato == "csv":
-            csv_file = _csv_from_df(df, "Relatório simples de Inscritos", escopo, campos_selecionados)
-            return send_file(
-                csv_file,
-                mimetype="text/csv; charset=utf-8",
-                as_attachment=True,
-                download_name=f"Relatorio_Lista_Simples_{escopo}.csv",
-            )
+        resp = send_file(
+            io.BytesIO(resultado["conteudo"]),
+            mimetype=resultado["mimetype"],
+            as_attachment=True,
+            download_name=resultado["download_name"],
+        )
+        if resultado.get("dados_em"):
+            # gerado a partir do snapshot local: informa a data dos dados
+            resp.headers["X-Dados-Em"] = resultado["dados_em"]
+        return resp
 
+    except Cancelado as e:
+        log.info("lista_simples cancelada (%s)", e.motivo)
+        return _resposta_cancelado(e)
+    except AdmissaoRecusada:
+        raise  # vira 429/503 em @admissao
     except Exception as e:
-        print(f"Erro no endpoint lista_simples: {e}")
-        traceback.print_exc()
+        log.exception("Erro no endpoint lista_simples")
         return jsonify({"error": f"Erro interno do servidor: {str(e)}"}), 500
 
+
+@bp.get("/download/<token>")
+def download(token):
+    """
+    Exportação grande gravada em disco (download_spool.py). A URL assinada
+    é a credencial (vale DOWNLOAD_URL_TTL segundos), para o navegador poder
+    baixar e retomar sem o cabeçalho Authorization.
+    Suporta Range/If-Range (206), If-None-Match/If-Modified-Since (304) e HEAD.
+    """
+    try:
+        path, meta = download_spool.abrir(token)
+    except download_spool.DownloadIndisponivel as e:
+        if e.motivo == "expirado":
+            return jsonify({"error": "Link de download expirado. Gere o relatório novamente."}), 410
+        return jsonify({"error": "Link de download inválido"}), 403
+
+    resp = send_file(
+        path,
+        mimetype=meta["mimetype"],
+        as_attachment=True,
+        download_name=meta["download_name"],
+        conditional=True,
+        etag=True,
+        last_modified=meta.get("criado_em"),
+        max_age=0,
+    )
+    # no-transform: a compressão de respostas não mexe (preserva Range e sendfile)
+    resp.headers["Cache-Control"] = "private, max-age=0, no-transform"
+    if meta.get("dados_em"):
+        resp.headers["X-Dados-Em"] = meta["dados_em"]
+    return resp
+
+# -------------------------------------------------------
+#                CUBO DE ESTATÍSTICAS
+# -------------------------------------------------------
+# Relatório cujo acesso libera o cubo (os números são os mesmos, mais detalhados)
+CUBE_REPORT_KEY = "fin_inadimplencia_resumo"
+
+_cube_refresh_lock = threading.Lock()
+
+
+@bp.get("/cube")
+@require_auth
+def cube():
+    """
+    Contagens de inscritos a partir do cubo local (exige permissão em CUBE_REPORT_KEY).
+    - dims: dimensões de agrupamento, separadas por vírgula (subsecao, situacao, categoria, ano);
+      vazio = total geral (roll-up completo)
+    - filtros: ?subsecao=...&situacao=...&categoria=20&ano=2020 (drill-down)
+    Retorna {columns, rows, refreshed_at, idade_s}.
+    """
+    if not user_has_report(request.user["uid"], CUBE_REPORT_KEY):
+        return jsonify({"error": "Sem permissão"}), 403
+
+    dims = [d.strip() for d in (request.args.get("dims") or "").split(",") if d.strip()]
+    filtros = {}
+    for d in stats_cube.DIMENSOES:
+        if d in request.args:
+            valor = request.args.get(d)
+            if d in ("categoria", "ano") and valor:
+                try:
+                    valor = int(valor)
+                except ValueError:
+                    return jsonify({"error": f"{d} deve ser numérico"}), 400
+            filtros[d] = valor or None
+    try:
+        if not stats_cube.pronto():
+            return jsonify({"error": "Cubo de estatísticas ainda não foi preenchido"}), 503
+        resultado = stats_cube.consultar(dims, filtros)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    refreshed_at = resultado["refreshed_at"]
+    resultado["idade_s"] = (
+        round((dt.datetime.now() - dt.datetime.fromisoformat(refreshed_at)).total_seconds())
+        if refreshed_at else None
+    )
+    return jsonify(resultado)
+
+
+@bp.get("/snapshot")
+@require_admin
+def snapshot_info():
+    """Versão atual do snapshot local (data, idade, linhas por fonte) e tolerâncias."""
+    return jsonify({
+        "habilitado": snapshot.SNAPSHOT_ENABLED,
+        "atual": snapshot.info(),
+        "intervalo_s": snapshot.SNAPSHOT_REFRESH_INTERVAL,
+        "tolerancia_s": {k: snapshot.tolerancia(k) for k in snapshot.SNAPSHOT_MAX_AGE},
+    })
+
+
+@bp.post("/snapshot/refresh")
+@require_admin
+def snapshot_refresh():
+    """Gera uma nova versão do snapshot agora (em segundo plano)."""
+    threading.Thread(target=snapshot.atualizar, name="snapshot-manual", daemon=True).start()
+    return jsonify({"status": "iniciado"}), 202
+
+
+@bp.post("/cube/refresh")
+@require_admin
+def cube_refresh():
+    """
+    Dispara a atualização do cubo agora (em segundo plano). ?completa=1 recalcula tudo.
+    Uma por vez neste processo: enquanto a anterior roda, responde 409.
+    """
+    completa = request.args.get("completa") in ("1", "true")
+    if not _cube_refresh_lock.acquire(blocking=False):
+        return jsonify({"status": "em_andamento"}), 409
+
+    def _atualizar():
+        try:
+            stats_cube.atualizar(completa)
+        except Exception:
+            log.exception("Erro na atualização manual do cubo")
+        finally:
+            _cube_refresh_lock.release()
+
+    threading.Thread(target=_atualizar, name="cube-manual", daemon=True).start()
+    return jsonify({"status": "iniciado", "completa": completa}), 202
+
+# -------------------------------------------------------
+#                PRÉVIA DA LISTA SIMPLES
+# -------------------------------------------------------
+PREVIEW_MAX_ROWS = 100
+# Prazo (s) das consultas da prévia; se o COUNT não terminar a tempo,
+# usa-se a última contagem conhecida ou, sem ela, as linhas por subseção da
+# sonda de versão (estimadas)
+PREVIEW_TIMEOUT = float(os.getenv("PREVIEW_TIMEOUT", "2"))
+
+_contagens_lista_simples = {}  # subseção -> total da última contagem exata
+
+
+def _contar_lista_simples(subsecao: str, token: CancelToken):
+    """
+    Retorna (total, exato). Em caso de prazo vencido usa a última contagem
+    conhecida ou a soma das subseções na sonda de versão (total None se
+    nenhuma das duas existir).
+    """
+    filtro, params = _filtro_lista_simples(subsecao or None)
+    try:
+        rows = mssql_query(f"SELECT COUNT(*) AS total {_SQL_LISTA_SIMPLES_ORIGEM} {filtro}", params, token=token)
+    except Cancelado:
+        anterior = _contagens_lista_simples.get(subsecao)
+        if anterior is None:
+            anterior = data_version.linhas_subsecoes(subsecao or None)
+        return anterior, False
+    total = int(rows[0]["total"]) if rows else 0
+    _contagens_lista_simples[subsecao] = total
+    return total, True
+
+
+@bp.get("/lista_simples/preview")
+@require_auth
+def lista_simples_preview():
+    """
+    Prévia da lista simples com os mesmos parâmetros de /lista_simples:
+    total de linhas (COUNT), as N primeiras linhas (TOP N, sem a busca completa)
+    e, por formato, tamanho, tempo e memória estimados e se seria
+    gerado em streaming (plano) ou recusado (plano null).
+    """
+    inicio = time.perf_counter()
+    params = _parametros_lista_simples(request.args)
+    try:
+        n = max(1, min(int(request.args.get("n", 20)), PREVIEW_MAX_ROWS))
+    except ValueError:
+        return jsonify({"error": "n inválido"}), 400
+
+    # Snapshot local, quando disponível para a lista simples
+    where, args = _filtro_snapshot_lista_simples(params["subsecao"] or None)
+    rows, atual = snapshot.consultar("lista_simples", "lista_simples", where, args, limite=n)
+    if rows is not None:
+        total, _ = snapshot.contar("lista_simples", "lista_simples", where, args)
+        exato = total is not None
+    else:
+        filtro, sql_params = _filtro_lista_simples(params["subsecao"] or None)
+        token = CancelToken(PREVIEW_TIMEOUT)
+        try:
+            with monitorar(token):
+                rows = mssql_query(f"""
+                    SELECT TOP ({n}) {_SQL_LISTA_SIMPLES_COLUNAS}
+                    {_SQL_LISTA_SIMPLES_ORIGEM}
+                      {filtro}
+                    ORDER BY p.Nome
+                """, sql_params, token=token)
+                total, exato = _contar_lista_simples(params["subsecao"], token)
+        except Cancelado as e:
+            return _resposta_cancelado(e)
+
+    df = _filtrar_campos(pd.DataFrame(_linhas_como_texto(rows)), params["campos"])
+    colunas = len(df.columns) or len(CAMPO_MAP_LISTA_SIMPLES)
+
+    # Para PDF multi a memória depende da maior subseção; sem a busca completa
+    # usa-se o total (estimativa conservadora). Sem total nenhum, não há
+    # estimativa: as N linhas da prévia não dizem nada sobre o arquivo.
+    estimativas = None
+    if total is not None:
+        estimativas = {f: memory_budget.previsao(f, total, colunas) for f in FORMATOS_LISTA_SIMPLES}
+
+    return jsonify({
+        "total": total,
+        "exato": exato,
+        "columns": list(df.columns),
+        "rows": df.to_dict(orient="records"),
+        "estimativas": estimativas,
+        "orcamento_mb": memory_budget.EXPORT_MEMORY_BUDGET_MB,
+        "dados_em": atual["gerado_em"] if atual else None,
+        "tempo_ms": round((time.perf_counter() - inicio) * 1000, 1),
+    })
+
+# -------------------------------------------------------
+#                MÉTRICAS DE ADMISSÃO
+# -------------------------------------------------------
+@bp.get("/admission/metrics")
+@require_admin
+def admission_metrics():
+    """Ocupação, fila e recusas do controle de admissão (deste processo)."""
+    return jsonify(admission_controller.metricas())
+
+@bp.get("/memory/metrics")
+@require_admin
+def memory_metrics():
+    """Picos de memória recentes, estimativas por formato, trocas para streaming, recusas, despejos e downloads em disco."""
+    return jsonify({**memory_budget.metricas(), "spill": spill.metricas(), "downloads": download_spool.metricas()})
+
+
+@bp.get("/data_version")
+@require_admin
+def data_version_metrics():
+    """Sondas de versão dos dados (consultas, memorizações, falhas, idade)."""
+    return jsonify(data_version.metricas())
+
+
+@bp.get("/audit/metrics")
+@require_admin
+def audit_metrics():
+    """Fila e gravação da auditoria de downloads (deste processo)."""
+    return jsonify(audit.metricas())
+
+# -------------------------------------------------------
+#                PRÉ-AQUECIMENTO
+# -------------------------------------------------------
+@bp.get("/prewarm/stats")
+@require_admin
+def prewarm_stats():
+    """Combinações mais pedidas, execuções do pré-aquecimento e quantas entradas foram usadas."""
+    return jsonify(prewarm.stats())
+
+
+@bp.post("/prewarm/run")
+@require_admin
+def prewarm_run():
+    """Dispara o pré-aquecimento agora (em segundo plano)."""
+    threading.Thread(target=prewarm.executar, name="prewarm-manual", daemon=True).start()
+    return jsonify({"status": "iniciado"}), 202
+
 # -------------------------------------------------------
 #                ENDPOINT DE TESTE
 # -------------------------------------------------------
@@ -0,0 +1,79 @@
+# backend/serve.py — ponto de entrada de produção
+#
+#   python serve.py
+#
+# - Windows: waitress (multi-thread, um processo). É o que o NSSM/agendador
+#   deve executar no lugar de "python app.py" (servidor de desenvolvimento).
+# - Linux: gunicorn (multi-processo + threads) com a configuração de
+#   gunicorn.conf.py, incluindo preload e reciclagem de workers.
+import logging, os, signal, sys
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+log = logging.getLogger("serve")
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "5055"))
+WEB_THREADS = int(os.getenv("WEB_THREADS", "8"))
+# Tempo máximo (segundos) aguardando requisições em curso no desligamento
+WEB_GRACEFUL_TIMEOUT = int(os.getenv("WEB_GRACEFUL_TIMEOUT", "60"))
+
+
+def _serve_gunicorn():
+    from gunicorn.app.wsgiapp import WSGIApplication
+
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    sys.argv = [
+        "gunicorn",
+        "-c", os.path.join(base_dir, "gunicorn.conf.py"),
+        "--chdir", base_dir,
+        "app:create_app()",
+    ]
+    WSGIApplication("%(prog)s [OPTIONS] [APP_MODULE]").run()
+
+
+def _serve_waitress():
+    from waitress.server import create_server
+    from app import create_app
+    from lifecycle import run_shutdown_hooks
+
+    app = create_app()
+    server = create_server(
+        app,
+        host=HOST,
+        port=PORT,
+        threads=WEB_THREADS,
+        # permite detectar cliente desconectado durante a requisição
+        channel_request_lookahead=1,
+        cleanup_interval=30,
+    )
+
+    def _parar(signum, _frame):
+        log.info("Sinal %s recebido, encerrando...", signum)
+        server.close()
+
+    signal.signal(signal.SIGINT, _parar)
+    signal.signal(signal.SIGTERM, _parar)
+    if hasattr(signal, "SIGBREAK"):  # Ctrl+Break / NSSM no Windows
+        signal.signal(signal.SIGBREAK, _parar)
+
+    log.info("waitress em http://%s:%s (%d threads)", HOST, PORT, WEB_THREADS)
+    try:
+        server.run()
+    finally:
+        # Aguarda as threads de trabalho terminarem as requisições em curso
+        server.task_dispatcher.shutdown(timeout=WEB_GRACEFUL_TIMEOUT)
+        run_shutdown_hooks()
+
+
+if __name__ == "__main__":
+    if os.name != "nt":
+        try:
+            import gunicorn  # noqa: F401
+            _serve_gunicorn()
+            sys.exit(0)
+        except ImportError:
+            log.warning("gunicorn não instalado, usando waitress")
+    _serve_waitress()
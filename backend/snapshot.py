@@ -0,0 +1,279 @@
+# backend/snapshot.py
+"""
+Snapshot local (SQLite) dos dados de origem dos relatórios.
+
+Modo opcional (SNAPSHOT_ENABLED=1) para tirar as exportações pesadas do SQL
+Server de produção:
+- os relatórios registram suas "fontes" (registrar_fonte): uma consulta de
+  extração com as colunas de que precisam;
+- um job agendado extrai todas as fontes para um arquivo novo e versionado
+  (snapshot-<AAAAMMDDHHMMSS>.sqlite) e só então troca o ponteiro `atual.json`
+  com os.replace — a troca é atômica; quem já abriu a versão anterior
+  continua lendo-a até o fim;
+- `consultar()`/`contar()` respondem a partir do snapshot quando ele não é
+  mais antigo que a tolerância do relatório (SNAPSHOT_MAX_AGE_<CHAVE>);
+  caso contrário retornam None e o chamador consulta o SQL Server.
+
+Só um processo por máquina gera o snapshot (lock em arquivo).
+
+SNAPSHOT_DIR guarda dados pessoais de todos os inscritos: antes de qualquer
+leitura ou gravação ele passa por private_dir.garantir (0700, do usuário do
+processo). Se não for privado, o snapshot fica indisponível e os relatórios
+consultam o SQL Server.
+"""
+import datetime as dt
+import glob, json, logging, os, sqlite3, tempfile, threading, time
+
+import private_dir
+from cancellation import CancelToken
+from coalesce import file_lock
+from db import mssql_query
+
+log = logging.getLogger(__name__)
+
+SNAPSHOT_ENABLED = os.getenv("SNAPSHOT_ENABLED", "0") in ("1", "true", "True")
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR") or os.path.join(tempfile.gettempdir(), "relatorios_snapshot")
+SNAPSHOT_REFRESH_INTERVAL = int(os.getenv("SNAPSHOT_REFRESH_INTERVAL", "3600"))
+SNAPSHOT_EXTRACT_TIMEOUT = int(os.getenv("SNAPSHOT_EXTRACT_TIMEOUT", "1800"))
+SNAPSHOT_MAX_AGE_DEFAULT = int(os.getenv("SNAPSHOT_MAX_AGE_DEFAULT", "7200"))
+# Versões antigas mantidas em disco (leitores em andamento ainda podem usá-las)
+SNAPSHOT_KEEP = 2
+
+# Tolerância (s) a dados desatualizados por relatório; 0 = sempre ao vivo.
+# Sobrescreva com SNAPSHOT_MAX_AGE_<CHAVE> (ex.: SNAPSHOT_MAX_AGE_LISTA_SIMPLES=14400)
+SNAPSHOT_MAX_AGE = {
+    "lista_simples": 7200,
+}
+
+_PONTEIRO = os.path.join(SNAPSHOT_DIR, "atual.json")
+
+# fonte -> {"sql": extração no SQL Server, "indices": [colunas], "derivadas": {coluna: (origem, fn)}}
+_fontes = {}
+
+
+def registrar_fonte(nome: str, sql: str, indices: tuple = (), derivadas: dict | None = None):
+    """
+    Registra uma fonte do snapshot. `sql` deve retornar as colunas usadas
+    pelo relatório; a ordem das linhas é preservada na coluna _ordem.
+    `derivadas` ({"_coluna": (coluna_origem, fn)}) grava colunas calculadas
+    na extração, para filtrar no SQLite (ex.: nome sem acento/caixa, como a
+    collation CI/AI do SQL Server). Começam com "_" e, como _ordem, não
+    voltam em consultar().
+    """
+    derivadas = dict(derivadas or {})
+    if any(not c.startswith("_") for c in derivadas):
+        raise ValueError("colunas derivadas devem começar com '_'")
+    _fontes[nome] = {"sql": sql, "indices": tuple(indices), "derivadas": derivadas}
+
+
+def tolerancia(report_key: str) -> int:
+    env = os.getenv(f"SNAPSHOT_MAX_AGE_{report_key.upper()}")
+    if env:
+        return int(env)
+    return SNAPSHOT_MAX_AGE.get(report_key, SNAPSHOT_MAX_AGE_DEFAULT)
+
+
+def _diretorio_ok() -> bool:
+    try:
+        private_dir.garantir(SNAPSHOT_DIR)
+        return True
+    except OSError as e:
+        log.warning("Snapshot indisponível -> %s", e)
+        return False
+
+
+def info() -> dict | None:
+    """Versão atual: {"arquivo", "gerado_em", "fontes": {nome: linhas}, "idade_s"} ou None."""
+    if not _diretorio_ok():
+        return None
+    try:
+        with open(_PONTEIRO, encoding="utf-8") as fh:
+            atual = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    atual["idade_s"] = round(time.time() - atual["gerado_em_ts"])
+    return atual
+
+
+# -------------------------------------------------------
+#                     EXTRAÇÃO
+# -------------------------------------------------------
+def atualizar() -> dict:
+    """Gera uma nova versão do snapshot. Ignorada se outro processo já estiver gerando."""
+    if not _diretorio_ok():
+        return {"ignorada": "diretório do snapshot não é privado"}
+    try:
+        with file_lock(os.path.join(SNAPSHOT_DIR, "snapshot.lock"), bloqueante=False):
+            return _atualizar()
+    except BlockingIOError:
+        return {"ignorada": "outro processo já está gerando o snapshot"}
+
+
+def _atualizar() -> dict:
+    inicio = time.perf_counter()
+    token = CancelToken(SNAPSHOT_EXTRACT_TIMEOUT)
+    agora = dt.datetime.now()
+    destino = os.path.join(SNAPSHOT_DIR, f"snapshot-{agora.strftime('%Y%m%d%H%M%S')}.sqlite")
+    tmp = f"{destino}.tmp"
+
+    linhas_por_fonte = {}
+    con = sqlite3.connect(tmp)
+    try:
+        for nome, fonte in _fontes.items():
+            rows = mssql_query(fonte["sql"], token=token)
+            derivadas = fonte["derivadas"]
+            colunas = list(rows[0].keys()) if rows else []
+            if not colunas:
+                con.execute(f'CREATE TABLE "{nome}" (_ordem INTEGER)')
+            else:
+                defs = ", ".join(f'"{c}"' for c in [*colunas, *derivadas])
+                con.execute(f'CREATE TABLE "{nome}" (_ordem INTEGER PRIMARY KEY, {defs})')
+                marcadores = ", ".join("?" for _ in range(len(colunas) + len(derivadas) + 1))
+                con.executemany(
+                    f'INSERT INTO "{nome}" VALUES ({marcadores})',
+                    ((i, *r.values(), *(fn(r[origem]) for origem, fn in derivadas.values()))
+                     for i, r in enumerate(rows)),
+                )
+                for col in fonte["indices"]:
+                    con.execute(f'CREATE INDEX "ix_{nome}_{col}" ON "{nome}" ("{col}")')
+            linhas_por_fonte[nome] = len(rows)
+            del rows
+        con.commit()
+    except BaseException:
+        con.close()
+        os.remove(tmp)
+        raise
+    con.close()
+
+    # Publica: arquivo completo primeiro, depois o ponteiro (os.replace é atômico)
+    os.replace(tmp, destino)
+    ponteiro = {
+        "arquivo": os.path.basename(destino),
+        "gerado_em": agora.isoformat(timespec="seconds"),
+        "gerado_em_ts": agora.timestamp(),
+        "fontes": linhas_por_fonte,
+    }
+    tmp_ponteiro = f"{_PONTEIRO}.{os.getpid()}.tmp"
+    with open(tmp_ponteiro, "w", encoding="utf-8") as fh:
+        json.dump(ponteiro, fh)
+    os.replace(tmp_ponteiro, _PONTEIRO)
+    _remover_antigos(ponteiro["arquivo"])
+
+    resumo = {**ponteiro, "duracao_s": round(time.perf_counter() - inicio, 1)}
+    log.info("Nova versão %s: %s (%ss)", ponteiro["arquivo"], linhas_por_fonte, resumo["duracao_s"])
+    return resumo
+
+
+def _remover_antigos(atual: str):
+    versoes = sorted(glob.glob(os.path.join(SNAPSHOT_DIR, "snapshot-*.sqlite")))
+    for path in versoes[:-SNAPSHOT_KEEP]:
+        if os.path.basename(path) == atual:
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            pass  # Windows: ainda aberto por algum leitor; sai na próxima rodada
+
+
+# -------------------------------------------------------
+#                      LEITURA
+# -------------------------------------------------------
+def versao(report_key: str) -> str | None:
+    """Versão do snapshot que `consultar()` usaria agora para o relatório (None = ao vivo)."""
+    if not SNAPSHOT_ENABLED:
+        return None
+    limite = tolerancia(report_key)
+    atual = info()
+    if limite <= 0 or atual is None or atual["idade_s"] > limite:
+        return None
+    return atual["arquivo"].removeprefix("snapshot-").removesuffix(".sqlite")
+
+
+def _abrir(report_key: str):
+    """Conexão somente leitura com a versão atual, se dentro da tolerância do relatório."""
+    if not SNAPSHOT_ENABLED:
+        return None, None
+    _garantir_thread()
+    limite = tolerancia(report_key)
+    atual = info()
+    if limite <= 0 or atual is None or atual["idade_s"] > limite:
+        return None, None
+    path = os.path.join(SNAPSHOT_DIR, atual["arquivo"])
+    try:
+        con = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    except sqlite3.Error:
+        return None, None
+    return con, atual
+
+
+def consultar(fonte: str, report_key: str, where: str = "", params: tuple = (),
+              limite: int | None = None):
+    """
+    Linhas da fonte (dicts, na ordem original) com o filtro `where` (SQL do
+    SQLite, parâmetros "?"). Retorna (linhas, info) ou (None, None) se o
+    snapshot não puder ser usado para este relatório.
+    """
+    con, atual = _abrir(report_key)
+    if con is None:
+        return None, None
+    try:
+        sql = f'SELECT * FROM "{fonte}"'
+        if where:
+            sql += f" WHERE {where}"
+        sql += " ORDER BY _ordem"
+        if limite:
+            sql += f" LIMIT {int(limite)}"
+        cur = con.execute(sql, params)
+        nomes = [c[0] for c in cur.description]
+        rows = [{k: v for k, v in zip(nomes, r) if not k.startswith("_")} for r in cur]
+    except sqlite3.Error as e:
+        log.warning("Leitura de %s falhou, usando o SQL Server -> %s", fonte, e)
+        return None, None
+    finally:
+        con.close()
+    return rows, atual
+
+
+def contar(fonte: str, report_key: str, where: str = "", params: tuple = ()):
+    """COUNT(*) da fonte no snapshot; (total, info) ou (None, None)."""
+    con, atual = _abrir(report_key)
+    if con is None:
+        return None, None
+    try:
+        sql = f'SELECT COUNT(*) FROM "{fonte}"' + (f" WHERE {where}" if where else "")
+        total = con.execute(sql, params).fetchone()[0]
+    except sqlite3.Error:
+        return None, None
+    finally:
+        con.close()
+    return total, atual
+
+
+# -------------------------------------------------------
+#                       AGENDADOR
+# -------------------------------------------------------
+def _loop():
+    while True:
+        try:
+            atual = info()
+            if atual is None or atual["idade_s"] >= SNAPSHOT_REFRESH_INTERVAL:
+                atualizar()
+        except Exception as e:
+            log.exception("Erro ao gerar snapshot")
+        time.sleep(min(60, SNAPSHOT_REFRESH_INTERVAL))
+
+
+_lock = threading.Lock()
+_thread_pid = None
+
+
+def _garantir_thread():
+    """Inicia (sob demanda) o agendamento; threads não sobrevivem ao fork."""
+    global _thread_pid
+    if not SNAPSHOT_ENABLED or _thread_pid == os.getpid():
+        return
+    with _lock:
+        if _thread_pid == os.getpid():
+            return
+        threading.Thread(target=_loop, name="snapshot", daemon=True).start()
+        _thread_pid = os.getpid()
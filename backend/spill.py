@@ -0,0 +1,202 @@
+# backend/spill.py
+"""
+Despejo em disco (Arrow IPC mapeado em memória) dos resultados grandes.
+
+Um DataFrame acima de SPILL_THRESHOLD_MB é escrito uma única vez num arquivo
+Arrow IPC em SPILL_DIR e relido com memory_map: as colunas passam a ser
+ArrowDtype apoiadas nas páginas do arquivo. Fatias (iloc), seleção de
+colunas e "cópias" não duplicam os dados, e sob pressão de memória o
+sistema operacional descarta páginas em vez de crescer o RSS (o arquivo é a
+cópia de apoio). Outro processo abre o mesmo arquivo pelo caminho (`abrir`,
+ou pickle de um Despejo) em vez de receber o DataFrame serializado.
+
+Contagem de referências: `despejar()` devolve um Despejo com 1 referência;
+cada consumidor adicional (ex.: renderizações simultâneas) chama
+`adquirir()` e depois `liberar()` (ou usa `with`). Na última liberação o
+arquivo é removido; arquivos esquecidos (processo encerrado no meio) saem
+na limpeza por idade (SPILL_MAX_AGE).
+
+pyarrow é opcional: sem ele, ou abaixo do limite, o Despejo apenas embrulha
+o DataFrame em memória, com a mesma interface. O mesmo vale quando SPILL_DIR
+não pode ser privado do usuário do processo (private_dir.py): os arquivos
+trazem CPF, e-mail e telefone, então nada é escrito num diretório alheio.
+
+Limite: o despejo acontece depois da busca, com as linhas e o DataFrame já
+em memória. Ele reduz a memória retida durante a renderização (e entre
+renderizações simultâneas), não o pico da própria busca.
+"""
+import glob, logging, os, tempfile, threading, time, uuid
+
+import private_dir
+from lazy import lazy_import
+
+pd = lazy_import("pandas")
+log = logging.getLogger(__name__)
+
+# Tamanho (MB, medido com memory_usage(deep=True)) a partir do qual o DataFrame vai para disco; 0 = nunca
+SPILL_THRESHOLD_MB = int(os.getenv("SPILL_THRESHOLD_MB", "64"))
+SPILL_DIR = os.getenv("SPILL_DIR") or os.path.join(tempfile.gettempdir(), "relatorios_spill")
+# Idade (s) a partir da qual um arquivo esquecido é removido
+SPILL_MAX_AGE = int(os.getenv("SPILL_MAX_AGE", "3600"))
+
+_lock = threading.Lock()
+_stats = {"despejos": 0, "bytes_escritos": 0, "ativos": 0, "removidos_por_idade": 0, "diretorio_inseguro": 0,
+          "ultima_duracao_s": None}
+_ultima_limpeza = 0.0
+_pyarrow = None
+
+
+def _carregar_pyarrow():
+    """pyarrow (com pyarrow.ipc) ou None, se não estiver instalado."""
+    global _pyarrow
+    if _pyarrow is None:
+        try:
+            import pyarrow
+            import pyarrow.ipc  # noqa: F401
+            _pyarrow = pyarrow
+        except ImportError:
+            _pyarrow = False
+    return _pyarrow or None
+
+
+class Despejo:
+    """DataFrame (em memória ou mapeado de um arquivo Arrow) com contagem de referências."""
+
+    def __init__(self, df, path: str | None = None, dono: bool = True):
+        self._df = df
+        self.path = path
+        self._dono = dono  # só quem escreveu o arquivo o remove
+        self._refs = 1
+        self._lock = threading.Lock()
+
+    @property
+    def em_disco(self) -> bool:
+        return self.path is not None
+
+    @property
+    def df(self):
+        if self._df is None:
+            raise RuntimeError("despejo já liberado")
+        return self._df
+
+    def adquirir(self) -> "Despejo":
+        with self._lock:
+            if self._refs <= 0:
+                raise RuntimeError("despejo já liberado")
+            self._refs += 1
+        return self
+
+    def liberar(self):
+        with self._lock:
+            self._refs -= 1
+            ultimo = self._refs == 0
+        if not ultimo:
+            return
+        self._df = None
+        if self.path and self._dono:
+            with _lock:
+                _stats["ativos"] -= 1
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass  # Windows: ainda mapeado por algum leitor; sai na limpeza por idade
+
+    def __enter__(self):
+        return self.df
+
+    def __exit__(self, *exc):
+        self.liberar()
+        return False
+
+    def __reduce__(self):
+        # Para outro processo: reabre o arquivo pelo caminho (sem serializar os dados)
+        if self.path is None:
+            return (Despejo, (self.df,))
+        return (abrir, (self.path,))
+
+
+def _mapear(path: str):
+    """DataFrame (ArrowDtype) apoiado no arquivo mapeado em memória, sem cópia dos dados."""
+    pa = _carregar_pyarrow()
+    tabela = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+    return tabela.to_pandas(types_mapper=pd.ArrowDtype)
+
+
+def abrir(path: str) -> Despejo:
+    """Abre (somente leitura) um arquivo despejado por outro processo."""
+    return Despejo(_mapear(path), path, dono=False)
+
+
+def despejar(df) -> Despejo:
+    """
+    Escreve `df` em disco e devolve o Despejo mapeado, se for grande o
+    bastante e o pyarrow estiver disponível; senão embrulha o próprio `df`.
+    df.attrs é preservado.
+    """
+    pa = _carregar_pyarrow()
+    if pa is None or SPILL_THRESHOLD_MB <= 0 or df.empty:
+        return Despejo(df)
+    tamanho = int(df.memory_usage(index=False, deep=True).sum())
+    if tamanho < SPILL_THRESHOLD_MB * 2**20:
+        return Despejo(df)
+
+    inicio = time.perf_counter()
+    try:
+        private_dir.garantir(SPILL_DIR)
+    except OSError as e:
+        log.warning("Despejo em disco desligado, mantendo em memória -> %s", e)
+        with _lock:
+            _stats["diretorio_inseguro"] += 1
+        return Despejo(df)
+    _limpar_antigos()
+    path = os.path.join(SPILL_DIR, f"{os.getpid()}-{uuid.uuid4().hex}.arrow")
+    tmp = f"{path}.tmp"
+    try:
+        tabela = pa.Table.from_pandas(df, preserve_index=False)
+        with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, tabela.schema) as writer:
+            writer.write_table(tabela)
+        del tabela
+        os.replace(tmp, path)
+        mapeado = _mapear(path)
+    except Exception as e:
+        log.warning("Não foi possível despejar em disco, mantendo em memória -> %s", e)
+        for p in (tmp, path):
+            try:
+                os.remove(p)
+            except OSError:
+                pass
+        return Despejo(df)
+
+    mapeado.attrs.update(df.attrs)
+    with _lock:
+        _stats["despejos"] += 1
+        _stats["ativos"] += 1
+        _stats["bytes_escritos"] += os.path.getsize(path)
+        _stats["ultima_duracao_s"] = round(time.perf_counter() - inicio, 3)
+    return Despejo(mapeado, path)
+
+
+def _limpar_antigos():
+    """Remove arquivos mais velhos que SPILL_MAX_AGE (no máximo uma varredura por minuto)."""
+    global _ultima_limpeza
+    agora = time.time()
+    if agora - _ultima_limpeza < 60:
+        return
+    _ultima_limpeza = agora
+    for path in glob.glob(os.path.join(SPILL_DIR, "*.arrow*")):
+        try:
+            if agora - os.path.getmtime(path) > SPILL_MAX_AGE:
+                os.remove(path)
+                with _lock:
+                    _stats["removidos_por_idade"] += 1
+        except OSError:
+            pass
+
+
+def metricas() -> dict:
+    with _lock:
+        return {
+            **_stats,
+            "pyarrow": _carregar_pyarrow() is not None,
+            "limite_mb": SPILL_THRESHOLD_MB,
+        }
@@ -0,0 +1,18 @@
+-- Auditoria (LGPD) dos downloads de relatórios (MySQL, base relatorios_auth).
+-- Executar uma vez:  mysql -u root relatorios_auth < sql/download_audit.sql
+-- Gravada em lotes por audit.py (fila em memória + thread de fundo).
+
+CREATE TABLE IF NOT EXISTS download_audit (
+    id          BIGINT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    user_id     INT NOT NULL,
+    report_key  VARCHAR(100) NOT NULL,
+    params      JSON NULL,
+    formato     VARCHAR(10) NOT NULL,
+    linhas      INT NULL,
+    bytes       BIGINT NULL,
+    duracao_ms  INT NULL,
+    ip          VARCHAR(45) NULL,
+    criado_em   DATETIME NOT NULL,
+    KEY ix_download_audit_user_data (user_id, criado_em),
+    KEY ix_download_audit_report_data (report_key, criado_em)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,17 @@
+-- Refresh tokens (MySQL, base relatorios_auth). Guarda apenas o hash SHA-256 do token.
+-- Executar uma vez:  mysql -u root relatorios_auth < sql/refresh_tokens.sql
+
+CREATE TABLE IF NOT EXISTS refresh_tokens (
+    id          BIGINT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    user_id     INT NOT NULL,
+    token_hash  CHAR(64) NOT NULL,
+    created_at  DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    expires_at  DATETIME NOT NULL,
+    revoked_at  DATETIME NULL,
+    user_agent  VARCHAR(255) NULL,
+    UNIQUE KEY ux_refresh_tokens_hash (token_hash),
+    KEY ix_refresh_tokens_user (user_id, revoked_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Limpeza periódica (opcional):
+-- DELETE FROM refresh_tokens WHERE expires_at < NOW() - INTERVAL 7 DAY;
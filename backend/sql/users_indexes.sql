@@ -0,0 +1,17 @@
+-- backend/sql/users_indexes.sql
+-- Índices para a listagem paginada de /api/auth/users (MySQL, base relatorios_auth).
+-- Executar uma vez:  mysql -u root relatorios_auth < sql/users_indexes.sql
+
+-- Keyset (ORDER BY created_at DESC, id DESC) e filtro por período
+CREATE INDEX ix_users_created_id ON users (created_at, id);
+
+-- Filtro por status mantendo a ordem da paginação
+CREATE INDEX ix_users_active_created ON users (active, created_at, id);
+
+-- Busca por prefixo (LIKE 'texto%') em nome e e-mail
+CREATE INDEX ix_users_name ON users (name);
+-- (se a coluna email já tiver UNIQUE, este índice é dispensável)
+CREATE INDEX ix_users_email ON users (email);
+
+-- Papel do usuário (subconsulta/EXISTS por user_id)
+CREATE INDEX ix_user_roles_user_role ON user_roles (user_id, role_id);
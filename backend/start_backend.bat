@@ -6,4 +6,4 @@ set "LOGDIR=E:\xampp\htdocs\relatorios-unificados\backend\logs"
 if not exist "%LOGDIR%" mkdir "%LOGDIR%"
 
 echo [%date% %time%] starting backend via scheduler >> "%LOGDIR%\scheduler_boot.log"
-"%PY%" app.py >> "%LOGDIR%\backend_out.log" 2>> "%LOGDIR%\backend_err.log"
+"%PY%" serve.py >> "%LOGDIR%\backend_out.log" 2>> "%LOGDIR%\backend_err.log"
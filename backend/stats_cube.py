@@ -0,0 +1,268 @@
+# backend/stats_cube.py
+"""
+Cubo local de estatísticas de inscritos (SQLite).
+
+Guarda contagens de Pessoa por subseção × situação × categoria × ano do
+compromisso, para que os cards do Gerencial (ex.: fin_inadimplencia_resumo)
+sejam respondidos em milissegundos, com roll-up (menos dimensões) e
+drill-down (mais dimensões + filtros) sem ir ao SQL Server.
+
+Atualização incremental, a cada CUBE_REFRESH_INTERVAL segundos:
+1. a sonda de versão (data_version) calcula, por subseção, COUNT e
+   CHECKSUM_AGG das colunas de Pessoa, do nome da subseção e das situações;
+2. só as subseções cuja assinatura mudou são reagregadas e substituídas
+   (numa transação: leitores veem o estado anterior ou o novo, nunca metade);
+   renomear uma situação muda a assinatura de todas;
+3. a cada CUBE_FULL_REFRESH_HOURS horas tudo é recalculado (rede de
+   segurança para o que a assinatura não cobre).
+
+Só um processo por máquina atualiza (lock em arquivo); os demais leem o
+mesmo arquivo. `refreshed_at` informa quando os números foram atualizados.
+"""
+import datetime as dt
+import logging, os, sqlite3, tempfile, threading, time, unicodedata
+
+from cancellation import CancelToken
+from coalesce import file_lock
+import data_version
+from db import mssql_query
+
+log = logging.getLogger(__name__)
+
+CUBE_ENABLED = os.getenv("CUBE_ENABLED", "1") not in ("0", "false", "False")
+CUBE_DB = os.getenv("CUBE_DB") or os.path.join(tempfile.gettempdir(), "relatorios_cube.sqlite")
+CUBE_REFRESH_INTERVAL = int(os.getenv("CUBE_REFRESH_INTERVAL", "900"))
+CUBE_FULL_REFRESH_HOURS = float(os.getenv("CUBE_FULL_REFRESH_HOURS", "24"))
+CUBE_REFRESH_TIMEOUT = int(os.getenv("CUBE_REFRESH_TIMEOUT", "600"))
+
+# dimensão pública -> coluna na tabela fatos
+DIMENSOES = {
+    "subsecao": "subsecao",
+    "situacao": "situacao",
+    "categoria": "categoria",
+    "ano": "ano_compromisso",
+}
+
+_SQL_AGREGADO = """
+    SELECT p.SubUnidadeAtual AS sub_id,
+           suc.NomeSubUnidade AS subsecao,
+           s.Descricao AS situacao,
+           p.TipoCategoria AS categoria,
+           YEAR(p.DataCompromisso) AS ano_compromisso,
+           COUNT(p.ID) AS total
+    FROM Pessoa p
+    LEFT JOIN SubUnidadeConselho suc ON p.SubUnidadeAtual = suc.ID
+    LEFT JOIN Situacao s ON p.SituacaoAtual = s.ID
+    {filtro}
+    GROUP BY p.SubUnidadeAtual, suc.NomeSubUnidade, s.Descricao, p.TipoCategoria, YEAR(p.DataCompromisso)
+"""
+
+
+def _chave_ci_ai(valor: str) -> str:
+    decomposto = unicodedata.normalize("NFKD", valor)
+    return "".join(c for c in decomposto if not unicodedata.combining(c)).casefold()
+
+
+def _comparar_ci_ai(a: str, b: str) -> int:
+    """Collation CI_AI: ordena como o SQL Server (sem caixa e sem acentos); empate pelo texto."""
+    ka, kb = (_chave_ci_ai(a), a), (_chave_ci_ai(b), b)
+    return (ka > kb) - (ka < kb)
+
+
+def _conectar():
+    con = sqlite3.connect(CUBE_DB, timeout=30)
+    con.create_collation("CI_AI", _comparar_ci_ai)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.executescript("""
+        CREATE TABLE IF NOT EXISTS fatos (
+            sub_id INTEGER, subsecao TEXT, situacao TEXT, categoria INTEGER,
+            ano_compromisso INTEGER, total INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS ix_fatos_sub ON fatos (sub_id);
+        CREATE INDEX IF NOT EXISTS ix_fatos_categoria ON fatos (categoria, subsecao);
+        -- sub_id pode ser NULL (pessoas sem subseção), por isso não é PRIMARY KEY
+        CREATE TABLE IF NOT EXISTS assinaturas (
+            sub_id INTEGER UNIQUE, linhas INTEGER, assinatura INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS meta (chave TEXT PRIMARY KEY, valor TEXT);
+    """)
+    return con
+
+
+def _meta(con, chave: str):
+    row = con.execute("SELECT valor FROM meta WHERE chave = ?", (chave,)).fetchone()
+    return row[0] if row else None
+
+
+# -------------------------------------------------------
+#                     ATUALIZAÇÃO
+# -------------------------------------------------------
+def atualizar(completa: bool = False) -> dict:
+    """Atualiza o cubo (incremental, ou completa). Ignorada se outro processo já estiver atualizando."""
+    lock_path = os.path.join(tempfile.gettempdir(), "relatorios_cube.lock")
+    try:
+        with file_lock(lock_path, bloqueante=False):
+            return _atualizar(completa)
+    except BlockingIOError:
+        return {"ignorada": "outro processo já está atualizando"}
+
+
+def _atualizar(completa: bool) -> dict:
+    inicio = time.perf_counter()
+    token = CancelToken(CUBE_REFRESH_TIMEOUT)
+    con = _conectar()
+    try:
+        ultima_completa = _meta(con, "ultima_completa")
+        if ultima_completa is None or (
+            dt.datetime.now() - dt.datetime.fromisoformat(ultima_completa)
+        ).total_seconds() >= CUBE_FULL_REFRESH_HOURS * 3600:
+            completa = True
+
+        assinaturas = data_version.assinaturas(max_idade=0)
+        if assinaturas is None:
+            raise RuntimeError("sonda de versão dos dados indisponível")
+        novas = {a["sub_id"]: (a["linhas"], a["assinatura"]) for a in assinaturas}
+        if completa:
+            alteradas = set(novas)
+        else:
+            atuais = {sub_id: (linhas, assinatura)
+                      for sub_id, linhas, assinatura in con.execute("SELECT sub_id, linhas, assinatura FROM assinaturas")}
+            alteradas = {k for k, v in novas.items() if atuais.get(k) != v}
+            removidas = set(atuais) - set(novas)
+            alteradas |= removidas
+
+        linhas = []
+        if completa:
+            linhas = mssql_query(_SQL_AGREGADO.format(filtro=""), token=token)
+        else:
+            # NULL (sem subseção) não entra no IN; é tratado à parte
+            ids = [k for k in alteradas if k is not None]
+            if ids:
+                marcadores = ", ".join(f":s{i}" for i in range(len(ids)))
+                linhas += mssql_query(
+                    _SQL_AGREGADO.format(filtro=f"WHERE p.SubUnidadeAtual IN ({marcadores})"),
+                    {f"s{i}": v for i, v in enumerate(ids)}, token=token,
+                )
+            if None in alteradas:
+                linhas += mssql_query(_SQL_AGREGADO.format(filtro="WHERE p.SubUnidadeAtual IS NULL"), token=token)
+
+        agora = dt.datetime.now().isoformat(timespec="seconds")
+        with con:
+            if completa:
+                con.execute("DELETE FROM fatos")
+                con.execute("DELETE FROM assinaturas")
+            else:
+                for sub_id in alteradas:
+                    if sub_id is None:
+                        con.execute("DELETE FROM fatos WHERE sub_id IS NULL")
+                    else:
+                        con.execute("DELETE FROM fatos WHERE sub_id = ?", (sub_id,))
+                    con.execute("DELETE FROM assinaturas WHERE sub_id IS ?", (sub_id,))
+            con.executemany(
+                "INSERT INTO fatos (sub_id, subsecao, situacao, categoria, ano_compromisso, total) VALUES (?, ?, ?, ?, ?, ?)",
+                [(r["sub_id"], r["subsecao"], r["situacao"], r["categoria"], r["ano_compromisso"], int(r["total"]))
+                 for r in linhas],
+            )
+            con.executemany(
+                "INSERT INTO assinaturas (sub_id, linhas, assinatura) VALUES (?, ?, ?)",
+                [(k, *novas[k]) for k in alteradas if k in novas],
+            )
+            con.execute("INSERT OR REPLACE INTO meta (chave, valor) VALUES ('refreshed_at', ?)", (agora,))
+            if completa:
+                con.execute("INSERT OR REPLACE INTO meta (chave, valor) VALUES ('ultima_completa', ?)", (agora,))
+    finally:
+        con.close()
+
+    resumo = {
+        "completa": completa,
+        "subsecoes_atualizadas": len(alteradas),
+        "linhas_agregadas": len(linhas),
+        "duracao_s": round(time.perf_counter() - inicio, 2),
+        "refreshed_at": agora,
+    }
+    log.info("Atualizado: %s", resumo)
+    return resumo
+
+
+# -------------------------------------------------------
+#                      CONSULTA
+# -------------------------------------------------------
+def pronto() -> bool:
+    """True se o cubo já foi preenchido ao menos uma vez."""
+    _garantir_thread()
+    if not CUBE_ENABLED or not os.path.exists(CUBE_DB):
+        return False
+    con = _conectar()
+    try:
+        return _meta(con, "refreshed_at") is not None
+    finally:
+        con.close()
+
+
+def consultar(dimensoes: list, filtros: dict | None = None, ordem: list | None = None,
+              limite: int | None = None) -> dict:
+    """
+    Soma `total` agrupando pelas `dimensoes` (roll-up/drill-down) com
+    filtros de igualdade (None filtra valores nulos).
+    Retorna {"columns", "rows", "refreshed_at"}.
+    """
+    _garantir_thread()
+    invalidas = [d for d in list(dimensoes) + list(filtros or {}) if d not in DIMENSOES]
+    if invalidas:
+        raise ValueError(f"Dimensão inválida: {', '.join(invalidas)}. Use: {', '.join(DIMENSOES)}")
+
+    colunas = [f"{DIMENSOES[d]} AS {d}" for d in dimensoes]
+    where, params = [], []
+    for d, valor in (filtros or {}).items():
+        if valor is None:
+            where.append(f"{DIMENSOES[d]} IS NULL")
+        else:
+            where.append(f"{DIMENSOES[d]} = ?")
+            params.append(valor)
+    sql = f"SELECT {', '.join(colunas + ['SUM(total) AS total'])} FROM fatos"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    if dimensoes:
+        sql += " GROUP BY " + ", ".join(DIMENSOES[d] for d in dimensoes)
+        # CI_AI: a ordem (e o corte do LIMIT) bate com a dos relatórios no SQL Server
+        sql += " ORDER BY " + ", ".join(f"{DIMENSOES[d]} COLLATE CI_AI" for d in (ordem or dimensoes))
+    if limite:
+        sql += f" LIMIT {int(limite)}"
+
+    con = _conectar()
+    try:
+        cur = con.execute(sql, params)
+        nomes = [c[0] for c in cur.description]
+        rows = [dict(zip(nomes, r)) for r in cur.fetchall()]
+        refreshed_at = _meta(con, "refreshed_at")
+    finally:
+        con.close()
+    return {"columns": nomes, "rows": rows, "refreshed_at": refreshed_at}
+
+
+# -------------------------------------------------------
+#                       AGENDADOR
+# -------------------------------------------------------
+def _loop():
+    while True:
+        try:
+            atualizar()
+        except Exception as e:
+            log.exception("Erro na atualização")
+        time.sleep(CUBE_REFRESH_INTERVAL)
+
+
+_lock = threading.Lock()
+_thread_pid = None
+
+
+def _garantir_thread():
+    """Inicia (sob demanda) a atualização periódica; threads não sobrevivem ao fork."""
+    global _thread_pid
+    if not CUBE_ENABLED or _thread_pid == os.getpid():
+        return
+    with _lock:
+        if _thread_pid == os.getpid():
+            return
+        threading.Thread(target=_loop, name="stats-cube", daemon=True).start()
+        _thread_pid = os.getpid()
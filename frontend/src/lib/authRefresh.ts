@@ -0,0 +1,96 @@
+// frontend/src/lib/authRefresh.ts
+//
+// Renovação automática do token de acesso.
+// O backend emite um token de acesso curto (authToken) e um refresh token
+// longo (authRefresh). Este interceptor do fetch:
+// - ao receber 401 numa chamada autenticada, chama /api/auth/refresh uma
+//   única vez (chamadas simultâneas aguardam a mesma renovação) e repete a
+//   requisição com o novo token;
+// - guarda o novo refresh token devolvido por /api/auth/change_password.
+// Se a renovação falhar, a resposta 401 original segue para a página.
+// `logout()` revoga o refresh token no backend antes de limpar a sessão.
+
+import { limparBootstrap } from "./bootstrap";
+
+const API_BASE = "http://192.168.0.64:5055";
+
+let renovacao: Promise<string | null> | null = null;
+
+function urlDe(input: RequestInfo | URL): string {
+  if (typeof input === "string") return input;
+  if (input instanceof URL) return input.href;
+  return input.url;
+}
+
+async function renovar(fetchOriginal: typeof fetch): Promise<string | null> {
+  const refreshToken = localStorage.getItem("authRefresh");
+  if (!refreshToken) return null;
+  try {
+    const res = await fetchOriginal(`${API_BASE}/api/auth/refresh`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ refresh_token: refreshToken }),
+    });
+    if (!res.ok) {
+      localStorage.removeItem("authRefresh");
+      return null;
+    }
+    const data = await res.json();
+    localStorage.setItem("authToken", data.token);
+    return data.token as string;
+  } catch {
+    return null;
+  }
+}
+
+export function installAuthRefresh() {
+  const fetchOriginal = window.fetch.bind(window);
+
+  window.fetch = async (input: RequestInfo | URL, init?: RequestInit) => {
+    const res = await fetchOriginal(input, init);
+    const url = urlDe(input);
+
+    if (res.ok && url.includes("/api/auth/change_password")) {
+      const data = await res.clone().json().catch(() => null);
+      if (data?.refresh_token) localStorage.setItem("authRefresh", data.refresh_token);
+      return res;
+    }
+
+    if (res.status !== 401 || url.includes("/api/auth/refresh") || url.includes("/api/auth/login")) {
+      return res;
+    }
+    const headers = new Headers(init?.headers ?? (input instanceof Request ? input.headers : undefined));
+    if (!headers.has("Authorization")) return res;
+
+    if (!renovacao) {
+      renovacao = renovar(fetchOriginal).finally(() => {
+        renovacao = null;
+      });
+    }
+    const novoToken = await renovacao;
+    if (!novoToken) return res;
+
+    headers.set("Authorization", `Bearer ${novoToken}`);
+    return fetchOriginal(input, { ...init, headers });
+  };
+}
+
+/** Revoga o refresh token (POST /api/auth/logout) e limpa a sessão local. */
+export async function logout() {
+  const refreshToken = localStorage.getItem("authRefresh");
+  if (refreshToken) {
+    try {
+      // keepalive: a revogação não é cancelada pela navegação para /login
+      await fetch(`${API_BASE}/api/auth/logout`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ refresh_token: refreshToken }),
+        keepalive: true,
+      });
+    } catch {
+      // sem rede: o token expira sozinho (REFRESH_TOKEN_TTL)
+    }
+  }
+  localStorage.clear();
+  limparBootstrap();
+}
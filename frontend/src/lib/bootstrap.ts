@@ -0,0 +1,68 @@
+// frontend/src/lib/bootstrap.ts
+//
+// Dados iniciais (usuário, relatórios, subseções e mural) numa única
+// requisição a /api/bootstrap. Cada seção vem com uma ETag; as seções já
+// guardadas nesta sessão (sessionStorage) são informadas em `have=` e o
+// backend só devolve as que mudaram.
+// Chamadas simultâneas (ex.: Home e Relatórios montando juntas) compartilham
+// a mesma requisição.
+
+const API_BASE = "http://192.168.0.64:5055";
+const STORAGE_KEY = "bootstrapCache";
+
+export type Secao = "me" | "reports" | "subsecoes" | "mural";
+
+type Entrada = { etag: string; data: any };
+type Cache = Partial<Record<Secao, Entrada>>;
+
+let emAndamento: Promise<Cache> | null = null;
+
+function lerCache(): Cache {
+  try {
+    return JSON.parse(sessionStorage.getItem(STORAGE_KEY) || "{}");
+  } catch {
+    return {};
+  }
+}
+
+async function buscar(): Promise<Cache> {
+  const cache = lerCache();
+  const have = Object.entries(cache)
+    .map(([secao, e]) => `${secao}:${(e as Entrada).etag}`)
+    .join(",");
+  const qs = have ? `?have=${encodeURIComponent(have)}` : "";
+
+  const res = await fetch(`${API_BASE}/api/bootstrap${qs}`, {
+    headers: { Authorization: `Bearer ${localStorage.getItem("authToken")}` },
+  });
+  if (!res.ok) throw new Error(`Falha ao carregar dados iniciais (${res.status})`);
+  const { secoes } = await res.json();
+
+  for (const [secao, s] of Object.entries<any>(secoes || {})) {
+    if (s.error) {
+      delete cache[secao as Secao];
+    } else if (!s.nao_modificado) {
+      cache[secao as Secao] = { etag: s.etag, data: s.data };
+    }
+  }
+  sessionStorage.setItem(STORAGE_KEY, JSON.stringify(cache));
+  return cache;
+}
+
+/** Dados de uma seção (requisição única compartilhada; lança erro se a seção falhou). */
+export async function carregarSecao<T = any>(secao: Secao): Promise<T> {
+  if (!emAndamento) {
+    emAndamento = buscar().finally(() => {
+      emAndamento = null;
+    });
+  }
+  const cache = await emAndamento;
+  const entrada = cache[secao];
+  if (!entrada) throw new Error(`Seção ${secao} indisponível`);
+  return entrada.data as T;
+}
+
+/** Descarta o cache (ex.: no logout). */
+export function limparBootstrap() {
+  sessionStorage.removeItem(STORAGE_KEY);
+}
@@ -2,8 +2,11 @@ import React from 'react'
 import { createRoot } from 'react-dom/client'
 import { BrowserRouter } from 'react-router-dom'
 import App from './App'
+import { installAuthRefresh } from './lib/authRefresh'
 import './styles/global.css'
 
+installAuthRefresh()
+
 createRoot(document.getElementById('root')!).render(
   <React.StrictMode>
     <BrowserRouter>
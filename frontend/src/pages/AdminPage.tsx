@@ -11,6 +11,7 @@ import {
   Info,
 } from "lucide-react";
 import AdminUsersPanel from "./AdminUsersPanel";
+import { logout } from "../lib/authRefresh";
 
 const API_BASE = "http://192.168.0.64:5055";
 
@@ -58,8 +59,8 @@ export default function AdminPage() {
     // setUnreadAlerts(...); setPendingTasks(...);
   }, []);
 
-  function handleLogout() {
-    localStorage.clear();
+  async function handleLogout() {
+    await logout();
     window.location.href = "/login";
   }
 
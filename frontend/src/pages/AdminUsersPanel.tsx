@@ -2,6 +2,7 @@ import { useEffect, useMemo, useState } from "react";
 import { Users, Edit, Trash2, RotateCcw, Plus, Maximize2, Minimize2, Square, Move, X } from "lucide-react";
 
 const API_BASE = "http://192.168.0.64:5055";
+const PAGE_SIZE = 50;
 
 type UserRole =
   | "admin"
@@ -77,51 +78,93 @@ export default function AdminUsersPanel() {
     []
   );
 
+  // filtros aplicados no servidor (a API é paginada por keyset)
+  const [filtros, setFiltros] = useState({ q: "", role: "", active: "" });
+  const [cursor, setCursor] = useState<string | null>(null);
+  const [total, setTotal] = useState<number | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+
   useEffect(() => {
-    fetchUsers();
+    // busca digitada: espera o usuário parar de digitar
+    const t = setTimeout(() => fetchUsers(), filtros.q ? 300 : 0);
+    return () => clearTimeout(t);
     // eslint-disable-next-line react-hooks/exhaustive-deps
-  }, []);
+  }, [filtros]);
+
+  function normalizar(u: any): User {
+    return {
+      id: u.id,
+      name: u.name,
+      email: u.email,
+      role: u.role,
+      status:
+        u.status === "Ativo" ||
+        u.active === 1 ||
+        u.active === true
+          ? "Ativo"
+          : "Inativo",
+      created_at: u.created_at ?? u.createdAt ?? null,
+    };
+  }
+
+  async function fetchPage(after: string | null) {
+    const qs = new URLSearchParams({ limit: String(PAGE_SIZE) });
+    if (filtros.q.trim()) qs.set("q", filtros.q.trim());
+    if (filtros.role) qs.set("role", filtros.role);
+    if (filtros.active) qs.set("active", filtros.active);
+    if (after) qs.set("cursor", after);
+    const res = await fetch(`${API_BASE}/api/auth/users?${qs.toString()}`, { headers });
+    if (!res.ok) throw new Error(`HTTP ${res.status}`);
+
+    const data = await res.json();
+    const page: any[] = Array.isArray(data)
+      ? data
+      : Array.isArray(data?.users)
+      ? data.users
+      : Array.isArray(data?.results)
+      ? data.results
+      : [];
+    return {
+      users: page.map(normalizar),
+      next: (data?.next_cursor ?? null) as string | null,
+      total: typeof data?.total === "number" ? data.total : null,
+    };
+  }
 
+  // primeira página com os filtros atuais (recarrega a lista)
   async function fetchUsers() {
     setLoading(true);
     setError(null);
     try {
-      const res = await fetch(`${API_BASE}/api/auth/users`, { headers });
-      if (!res.ok) throw new Error(`HTTP ${res.status}`);
-
-      const data = await res.json();
-
-      const raw: any[] = Array.isArray(data)
-        ? data
-        : Array.isArray(data?.users)
-        ? data.users
-        : Array.isArray(data?.results)
-        ? data.results
-        : [];
-
-      const normalized: User[] = raw.map((u: any) => ({
-        id: u.id,
-        name: u.name,
-        email: u.email,
-        role: u.role,
-        status:
-          u.status === "Ativo" ||
-          u.active === 1 ||
-          u.active === true
-            ? "Ativo"
-            : "Inativo",
-        created_at: u.created_at ?? u.createdAt ?? null,
-      }));
-
-      setList(normalized);
+      const { users, next, total } = await fetchPage(null);
+      setList(users);
+      setCursor(next);
+      setTotal(total);
     } catch (e: any) {
       setError(e?.message || "Falha ao carregar usuários");
       setList([]);
+      setCursor(null);
+      setTotal(null);
     } finally {
       setLoading(false);
     }
   }
 
+  // próxima página, só quando pedida
+  async function fetchMore() {
+    if (!cursor) return;
+    setLoadingMore(true);
+    try {
+      const { users, next } = await fetchPage(cursor);
+      setList((prev) => [...prev, ...users]);
+      setCursor(next);
+    } catch (e: any) {
+      alert("Erro ao carregar mais usuários: " + (e?.message || "desconhecido"));
+    } finally {
+      setLoadingMore(false);
+    }
+  }
+
   function openCreate() {
     setEditing(null);
     setForm({ name: "", email: "", role: "usuario" });
@@ -274,6 +317,43 @@ export default function AdminUsersPanel() {
         </button>
       </div>
 
+      {/* Filtros */}
+      <div style={{ display: "flex", gap: 8, marginBottom: 12, alignItems: "center", flexWrap: "wrap" }}>
+        <input
+          type="search"
+          value={filtros.q}
+          onChange={(e) => setFiltros((f) => ({ ...f, q: e.target.value }))}
+          placeholder="Buscar por nome ou e-mail"
+          style={{ ...input, width: 260 }}
+        />
+        <select
+          value={filtros.role}
+          onChange={(e) => setFiltros((f) => ({ ...f, role: e.target.value }))}
+          style={{ ...input, width: 170 }}
+        >
+          <option value="">Todos os perfis</option>
+          {Object.entries(ROLE_LABELS).map(([value, text]) => (
+            <option key={value} value={value}>
+              {text}
+            </option>
+          ))}
+        </select>
+        <select
+          value={filtros.active}
+          onChange={(e) => setFiltros((f) => ({ ...f, active: e.target.value }))}
+          style={{ ...input, width: 140 }}
+        >
+          <option value="">Todos</option>
+          <option value="1">Ativos</option>
+          <option value="0">Inativos</option>
+        </select>
+        {total !== null && (
+          <span style={{ fontSize: 12, color: "#6b7280" }}>
+            {list.length} de {total} usuário(s)
+          </span>
+        )}
+      </div>
+
       {/* Lista */}
       <div
         style={{
@@ -384,6 +464,13 @@ export default function AdminUsersPanel() {
             </tbody>
           </table>
         )}
+        {!loading && !error && cursor && (
+          <div style={{ padding: 12, textAlign: "center", borderTop: "1px solid #f3f4f6" }}>
+            <button onClick={fetchMore} disabled={loadingMore} style={btnBlue}>
+              {loadingMore ? "Carregando..." : "Carregar mais"}
+            </button>
+          </div>
+        )}
       </div>
 
       {/* Modal Redimensionável */}
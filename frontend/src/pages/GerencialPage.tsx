@@ -12,6 +12,7 @@ import {
   Lock,
 } from "lucide-react";
 import AdminUsersPanel from "./AdminUsersPanel";
+import { logout } from "../lib/authRefresh";
 
 const API_BASE = "http://192.168.0.64:5055";
 
@@ -67,8 +68,8 @@ export default function GerencialPage() {
   if (!user) return null;
   const isAdmin = user.role === "admin";
 
-  function handleLogout() {
-    localStorage.clear();
+  async function handleLogout() {
+    await logout();
     navigate("/login");
   }
 
@@ -11,6 +11,8 @@ import {
   Pencil,
   Info,
 } from "lucide-react";
+import { carregarSecao } from "../lib/bootstrap";
+import { logout } from "../lib/authRefresh";
 
 const API_BASE = "http://192.168.0.64:5055";
 
@@ -104,9 +106,7 @@ export default function HomePage() {
     setLoadingAvisos(true);
     setErrorAvisos(null);
     try {
-      const resp = await fetchWithAuth(`${API_BASE}/api/mural/`);
-      if (!resp.ok) throw new Error("Falha ao carregar avisos");
-      const data = await resp.json();
+      const data = await carregarSecao<Aviso[]>("mural");
       setAvisos(Array.isArray(data) ? data : []);
     } catch (e: any) {
       setErrorAvisos(e.message || "Erro ao carregar avisos");
@@ -115,8 +115,8 @@ export default function HomePage() {
     }
   }
 
-  function handleLogout() {
-    localStorage.clear();
+  async function handleLogout() {
+    await logout();
     navigate("/login");
   }
 
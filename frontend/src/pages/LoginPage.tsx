@@ -4,6 +4,7 @@ const API_BASE = "http://192.168.0.64:5055";
 
 type LoginResponse = {
   token: string;
+  refresh_token: string;
   user: { id: number; name: string; email: string; role: string };
   reports: unknown[];
 };
@@ -36,8 +37,9 @@ export default function LoginPage() {
         setError(data?.error || "Falha no login.");
         return;
       }
-      const { token, user } = data as LoginResponse;
+      const { token, refresh_token, user } = data as LoginResponse;
       localStorage.setItem("authToken", token);
+      localStorage.setItem("authRefresh", refresh_token);
       localStorage.setItem("authUser", JSON.stringify(user));
       window.location.href = "/";
     } catch {
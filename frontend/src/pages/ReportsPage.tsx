@@ -15,11 +15,13 @@ import {
   ChevronDown,
 } from "lucide-react";
 import { downloadRelatorio } from "../utils/relatorioDownloader";
+import { carregarSecao } from "../lib/bootstrap";
+import { logout } from "../lib/authRefresh";
 
 const API_BASE = "http://192.168.0.64:5055";
 
 type UserRole = "admin" | "tecnico" | "usuario" | "gerente" | "coordenador" | "diretor";
-type FormatoSaida = "pdf-retrato" | "pdf-paisagem" | "xlsx" | "csv";
+type FormatoSaida = "pdf-retrato" | "pdf-paisagem" | "xlsx" | "csv" | "pacote";
 
 type UserType = {
   id: number;
@@ -93,19 +95,8 @@ function ModalRelatorioSimples({
   const carregarSubsecoes = async () => {
     setLoadingSubsecoes(true);
     try {
-      const response = await fetch(`${API_BASE}/api/reports/subsecoes`, {
-        headers: {
-          Authorization: `Bearer ${localStorage.getItem("authToken")}`,
-        },
-      });
-      const data = await response.json();
-      
-      if (data.error) {
-        console.error("Erro ao carregar subseções:", data.error);
-        setSubsecoes([]);
-      } else {
-        setSubsecoes(data.items || []);
-      }
+      const data = await carregarSecao<{ items: SubsecaoType[] }>("subsecoes");
+      setSubsecoes(data.items || []);
     } catch (error) {
       console.error("Erro ao carregar subseções:", error);
       setSubsecoes([]);
@@ -337,6 +328,7 @@ function ModalRelatorioSimples({
                     <option value="pdf-paisagem">📰 PDF - Paisagem (ideal para muitos campos)</option>
                     <option value="xlsx">📊 Excel (.xlsx) - Planilha com formatação</option>
                     <option value="csv">📋 CSV - Dados puros para importação</option>
+                    <option value="pacote">🗂️ Pacote ZIP - PDF + Excel + CSV (uma única consulta)</option>
                   </select>
                 </div>
               </div>
@@ -520,8 +512,8 @@ export default function ReportsPage() {
     setUser(currentUser);
   }, [navigate]);
 
-  function handleLogout() {
-    localStorage.clear();
+  async function handleLogout() {
+    await logout();
     navigate("/login");
   }
 
@@ -1536,6 +1528,9 @@ export default function ReportsPage() {
             } else if (params.formato === "pdf-paisagem") {
               formato = "pdf";
               orientacao = "paisagem";
+            } else if (params.formato === "pacote") {
+              // vários formatos de uma vez: o backend devolve um ZIP
+              formato = "pdf,xlsx,csv";
             }
             // xlsx e csv permanecem inalterados
             
@@ -1550,11 +1545,12 @@ export default function ReportsPage() {
               baseUrl: API_BASE,
               path: "/api/reports/lista_simples",
               params: {
-                formato: formato, // Agora será apenas "pdf", "xlsx" ou "csv"
+                formato: formato, // "pdf", "xlsx", "csv" ou o pacote "pdf,xlsx,csv"
                 subsecao: params.subsecao,
                 campos: params.campos.join(','),
                 orientacao: orientacao, // Novo parâmetro específico
                 ...(formato === "pdf" && !params.subsecao ? { modo: "multi" } : {}),
+                entrega: "link", // arquivos grandes chegam por URL de download (retomável)
               },
               filenamePrefix: "Relatorio_Lista_Simples",
               escopoKey: "subsecao",
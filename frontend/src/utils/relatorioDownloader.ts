@@ -57,6 +57,22 @@ export async function downloadRelatorio(opts: {
     throw new Error(msg);
   }
 
+  // Arquivo grande (params.entrega = "link"): o backend devolve uma URL assinada e
+  // de curta duração; o próprio navegador baixa, mostra o progresso e retoma se cair
+  const contentTypeResp = res.headers.get("content-type") || "";
+  if (contentTypeResp.startsWith("application/json")) {
+    const data = await res.json();
+    if (data?.url) {
+      const a = document.createElement("a");
+      a.href = new URL(data.url, baseUrl).toString();
+      a.download = data.download_name || "";
+      document.body.appendChild(a);
+      a.click();
+      a.remove();
+      return;
+    }
+  }
+
   // Extrai nome sugerido
   const dispo = res.headers.get("content-disposition");
   const extByType: Record<string, string> = {